@@ -0,0 +1,246 @@
+"""In-process mock of the LLDAP REST endpoints used by provision_users.py.
+
+MockLLDAP serves /auth/simple/login, /auth/refresh, /api/server/version, the user and
+group list endpoints and the user/group create, update, delete and
+membership endpoints from in-memory state. It keeps HTTP/1.1 connections
+alive like the real server, counts requests per endpoint, and can inject
+latency and 503 errors so retry and concurrency behaviour can be measured
+offline. GraphQL is not mocked.
+
+    python mock_lldap.py --port 17170 --latency-ms 20 --error-rate 0.01
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockLLDAP:
+    """Thread-safe in-memory LLDAP served on a background thread
+
+    Args:
+        latency: Seconds added to every response
+        jitter: Upper bound of extra random latency in seconds
+        error_rate: Probability that a request is answered with 503 before it is processed
+        seed: Seed for the latency and error injection
+        token_ttl: Lifetime in seconds of the JWTs it issues
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0, host="127.0.0.1", port=0, token_ttl=86400):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.token_ttl = token_ttl
+        self.host = host
+        self.port = port
+        self.users = {}
+        self.groups = {}
+        self.next_group_id = 1
+        self.counts = {}
+        self.injected_errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self._server.server_address[1]}"
+
+    @property
+    def total_requests(self):
+        return sum(self.counts.values())
+
+    def start(self):
+        """Start serving and return the base URL"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = {}
+            self.injected_errors = 0
+
+    def preload(self, model):
+        """Fill the directory from a compiled ldap_model.DirectoryModel, bypassing HTTP"""
+        with self._lock:
+            for user in model.users.values():
+                self.users[user.username] = {
+                    "username": user.username,
+                    "email": user.email,
+                    "display_name": user.display_name,
+                    "first_name": user.first_name,
+                    "last_name": user.last_name,
+                }
+            members = {}
+            for group_name, username in model.memberships:
+                members.setdefault(group_name, []).append(username)
+            for group in model.groups.values():
+                self._create_group(group.name, group.description, members.get(group.name, []))
+
+    def _create_group(self, name, description, usernames=()):
+        group = {"id": self.next_group_id, "display_name": name, "description": description,
+                 "users": [{"username": u} for u in usernames]}
+        self.groups[group["id"]] = group
+        self.next_group_id += 1
+        return group
+
+    def issue_token(self):
+        """Return an unsigned JWT-shaped token carrying an exp claim"""
+        claims = json.dumps({"sub": "admin", "exp": int(time.time() + self.token_ttl)}).encode("utf-8")
+        return "mock." + base64.urlsafe_b64encode(claims).decode("ascii").rstrip("=") + ".signature"
+
+    def _delay(self):
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate and self._rng.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def _count(self, method, path):
+        key = f"{method} {path}"
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def handle(self, method, path, body, headers=None):
+        """Apply one request to the directory and return (status, response body)"""
+        with self._lock:
+            if path == "/auth/refresh":
+                if "refresh_token=mock-refresh" not in (headers or {}).get("Cookie", ""):
+                    return 401, {"error": "invalid refresh token"}
+                return 200, {"token": self.issue_token()}
+            if path == "/auth/simple/login" and method == "POST":
+                return 200, {"token": self.issue_token(), "refreshToken": "mock-refresh"}
+            if path == "/api/server/version":
+                return 200, {"version": "mock"}
+            if path == "/api/user/list":
+                return 200, {"users": list(self.users.values())}
+            if path == "/api/group/list":
+                return 200, {"groups": [dict(g, users=list(g["users"])) for g in self.groups.values()]}
+            if method != "POST":
+                return 404, {"error": "not found"}
+
+            if path == "/api/user/create":
+                username = body.get("username")
+                if not username or username in self.users:
+                    return 409, {"error": f"user {username} already exists"}
+                self.users[username] = {k: v for k, v in body.items() if k != "password"}
+                return 201, {}
+            if path == "/api/user/update":
+                user = self.users.get(body.get("username"))
+                if user is None:
+                    return 404, {"error": "user not found"}
+                user.update({k: v for k, v in body.items() if k != "password"})
+                return 200, {}
+            if path == "/api/user/delete":
+                if self.users.pop(body.get("username"), None) is None:
+                    return 404, {"error": "user not found"}
+                for group in self.groups.values():
+                    group["users"] = [m for m in group["users"] if m["username"] != body["username"]]
+                return 200, {}
+            if path == "/api/group/create":
+                name = body.get("display_name")
+                if not name or any(g["display_name"] == name for g in self.groups.values()):
+                    return 409, {"error": f"group {name} already exists"}
+                group = self._create_group(name, body.get("description"))
+                return 201, {"id": group["id"], "display_name": name}
+
+            group = self.groups.get(body.get("group_id"))
+            if group is None:
+                return 404, {"error": "group not found"}
+            if path == "/api/group/update":
+                group.update({k: v for k, v in body.items() if k != "group_id"})
+                return 200, {}
+            if path == "/api/group/delete":
+                del self.groups[group["id"]]
+                return 200, {}
+            if path == "/api/group/add_member":
+                if body.get("username") not in self.users:
+                    return 404, {"error": "user not found"}
+                if all(m["username"] != body["username"] for m in group["users"]):
+                    group["users"].append({"username": body["username"]})
+                return 204, None
+            if path == "/api/group/remove_member":
+                group["users"] = [m for m in group["users"] if m["username"] != body.get("username")]
+                return 204, None
+            return 404, {"error": "not found"}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections open so client connection pooling behaves as in production
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; avoid Nagle/delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def _respond(self, status, body):
+                data = b"" if body is None else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                mock._count(method, self.path)
+                if mock._delay():
+                    return self._respond(503, {"error": "injected failure"})
+                if self.path.startswith("/api/") and not self.headers.get("Authorization", "").startswith("Bearer "):
+                    return self._respond(401, {"error": "missing token"})
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    return self._respond(400, {"error": "invalid JSON"})
+                self._respond(*mock.handle(method, self.path, body, self.headers))
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a mock LLDAP REST API")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=17170, help="Port to listen on (default: 17170)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Upper bound of extra random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of answering 503")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mock = MockLLDAP(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, host=args.host, port=args.port)
+    print(f"🧪 Mock LLDAP listening on {mock.start()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Offline benchmarks for generate_ldif.py and provision_users.py.
+
+For each requested size a synthetic ldap.yaml is generated and every
+scenario runs in its own Python process against it, so peak RSS is
+per-scenario and module state never leaks between runs. Provisioning
+scenarios talk to the in-process MockLLDAP, so nothing leaves the machine.
+
+Scenarios:
+    generate         full LDIF from a cold configuration (no model cache)
+    generate_cached  full LDIF with a warm compiled-model cache
+    provision        provision everything into an empty mock LLDAP
+    plan             snapshot a fully provisioned mock LLDAP and plan no changes
+
+Results are printed as a table and can be saved as JSON. Given a baseline
+file from an earlier commit, the run fails when a scenario got slower or
+bigger than --max-regression allows, which is how CI gates regressions:
+
+    python run_benchmark.py --sizes 1000,10000 --output bench.json
+    python run_benchmark.py --sizes 1000,10000 --baseline bench.json --max-regression 0.25
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+CONFIG_DIR = BENCHMARK_DIR.parent / "config"
+sys.path.insert(0, str(CONFIG_DIR))
+
+import synth_config  # noqa: E402
+from mock_lldap import MockLLDAP  # noqa: E402
+
+RESULTS_VERSION = 1
+SCENARIOS = ("generate", "generate_cached", "provision", "plan")
+DEFAULT_SIZES = "1000,10000"
+DEFAULT_MAX_REGRESSION = 0.25
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def count_entries(path):
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.startswith(b"dn: "))
+
+
+def bench_generate(args, cached):
+    import generate_ldif
+
+    output = os.path.join(args.workdir, "bench.ldif")
+    argv = ["--config", args.config, "--output", output]
+    if cached:
+        argv += ["--model-cache-dir", os.path.join(args.workdir, "model-cache")]
+        # Untimed run to populate the compiled-model cache
+        generate_ldif.main(argv)
+    else:
+        argv.append("--no-model-cache")
+
+    started = time.perf_counter()
+    ok = generate_ldif.main(argv) == 0
+    wall = time.perf_counter() - started
+    return {"ok": ok, "wall_seconds": wall, "items": count_entries(output) if ok else 0, "requests": 0}
+
+
+def bench_provision(args, command):
+    # Keep endpoint discovery results and tokens out of the user's cache
+    os.environ["LLDAP_ENDPOINT_CACHE"] = os.path.join(args.workdir, "endpoint.json")
+    os.environ["LLDAP_TOKEN_CACHE"] = os.path.join(args.workdir, "token.json")
+    import provision_users
+    from ldap_model import load_model
+
+    mock = MockLLDAP(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate)
+    provision_users.POSSIBLE_LLDAP_URLS[:] = [mock.start()]
+    if command == "plan":
+        mock.preload(load_model(args.config, None))
+    mock.reset_counts()
+
+    started = time.perf_counter()
+    try:
+        provision_users.main([command, "--config", args.config, "--no-model-cache",
+                              "--concurrency", str(args.concurrency)])
+        ok = True
+    except SystemExit as e:
+        ok = not e.code
+    wall = time.perf_counter() - started
+    mock.stop()
+
+    memberships = sum(len(g["users"]) for g in mock.groups.values())
+    return {
+        "ok": ok,
+        "wall_seconds": wall,
+        # Directory entries written or compared: users, groups and memberships
+        "items": len(mock.users) + len(mock.groups) + memberships,
+        "requests": mock.total_requests,
+        "requests_by_endpoint": dict(sorted(mock.counts.items())),
+        "injected_errors": mock.injected_errors,
+    }
+
+
+def run_child(args):
+    """Run one scenario in this process and print its result as JSON"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if args.child in ("generate", "generate_cached"):
+            result = bench_generate(args, cached=args.child == "generate_cached")
+        else:
+            result = bench_provision(args, "provision" if args.child == "provision" else "plan")
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    print(json.dumps(result))
+    return 0
+
+
+def spawn(scenario, config, workdir, args):
+    """Run a scenario in a fresh interpreter and return its result"""
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()), "--child", scenario,
+        "--config", config, "--workdir", workdir,
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--concurrency", str(args.concurrency),
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{scenario} benchmark crashed:\n{proc.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    scenarios = args.scenarios.split(",")
+    results = []
+    root = tempfile.mkdtemp(prefix="ldap-bench-")
+    try:
+        for size in sizes:
+            config = os.path.join(root, f"ldap-{size}.yaml")
+            synth_config.write_config(synth_config.generate(size, skew=args.skew, seed=args.seed), config)
+            for scenario in scenarios:
+                workdir = tempfile.mkdtemp(dir=root)
+                print(f"⏱️  {scenario} with {size} users...", flush=True)
+                result = spawn(scenario, config, workdir, args)
+                wall = result["wall_seconds"]
+                results.append({
+                    "scenario": scenario,
+                    "users": size,
+                    **result,
+                    "wall_seconds": round(wall, 4),
+                    "throughput_per_second": round(result["items"] / wall, 1) if wall else None,
+                    "requests_per_second": round(result["requests"] / wall, 1) if wall else None,
+                })
+    finally:
+        if args.keep:
+            print(f"📁 Benchmark files kept in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "concurrency": args.concurrency,
+            "skew": args.skew,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def print_results(report):
+    print(f"\n📊 Benchmark results ({report['commit'] or 'unknown commit'}, Python {report['python']})")
+    print(f"  {'scenario':<16} {'users':>8} {'wall s':>9} {'items/s':>10} {'requests':>9} {'req/s':>9} {'RSS MB':>8}")
+    for r in report["results"]:
+        marker = "" if r["ok"] else "  ✗ failed"
+        print(f"  {r['scenario']:<16} {r['users']:>8} {r['wall_seconds']:>9.3f} "
+              f"{r['throughput_per_second'] or 0:>10.0f} {r['requests']:>9} "
+              f"{r['requests_per_second'] or 0:>9.0f} {r['peak_rss_mb']:>8.1f}{marker}")
+
+
+def compare(report, baseline, max_regression):
+    """Return a description of every result that regressed against the baseline"""
+    previous = {(r["scenario"], r["users"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in report["results"]:
+        base = previous.get((r["scenario"], r["users"]))
+        if base is None:
+            continue
+        for metric in ("wall_seconds", "peak_rss_mb"):
+            if base[metric] and r[metric] > base[metric] * (1 + max_regression):
+                regressions.append(f"{r['scenario']} with {r['users']} users: {metric} "
+                                   f"{base[metric]} -> {r[metric]} (+{r[metric] / base[metric] - 1:.0%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark LDIF generation and LLDAP provisioning offline")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"Comma-separated user counts to benchmark (default: {DEFAULT_SIZES})")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mock LLDAP latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Mock LLDAP random extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a mock 503 response")
+    parser.add_argument("--concurrency", type=int, default=8, help="Provisioning concurrency (default: 8)")
+    parser.add_argument("--skew", type=float, default=1.2, help="Group popularity skew (default: 1.2)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed (default: 0)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION,
+                        help=f"Allowed slowdown or memory growth as a fraction (default: {DEFAULT_MAX_REGRESSION})")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated configs and outputs")
+    # Internal: run a single scenario in this process
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--config", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        return run_child(args)
+
+    report = run_suite(args)
+    print_results(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+    failed = [r for r in report["results"] if not r["ok"]]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions beyond {args.max_regression:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+        else:
+            print(f"\n✅ No regressions beyond {args.max_regression:.0%} against {args.baseline}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
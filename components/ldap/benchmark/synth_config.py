@@ -0,0 +1,104 @@
+"""Generate synthetic ldap.yaml files for benchmarking.
+
+Group fan-out is skewed like real directories: group popularity follows a
+Zipf-like distribution, so a few groups hold most users while the long tail
+has only a handful of members each.
+
+    python synth_config.py --users 10000 --output /tmp/ldap-10k.yaml
+"""
+import argparse
+import random
+import sys
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeDumper
+
+BASE_DN = "dc=bench,dc=local"
+
+
+def default_group_count(users):
+    return max(10, users // 100)
+
+
+def default_service_count(users):
+    return max(1, users // 1000)
+
+
+def generate(users, groups=None, service_users=None, max_groups_per_user=5, skew=1.2, seed=0):
+    """Return a synthetic ldap.yaml document as a dict.
+
+    Each user joins 1..max_groups_per_user groups drawn with weight
+    1/rank**skew, so a higher skew concentrates members in fewer groups.
+    """
+    rng = random.Random(seed)
+    group_count = groups or default_group_count(users)
+    service_count = default_service_count(users) if service_users is None else service_users
+    names = [f"group_{i:05d}" for i in range(group_count)]
+    weights = [1.0 / (rank ** skew) for rank in range(1, group_count + 1)]
+
+    def pick_groups():
+        return sorted(set(rng.choices(names, weights, k=rng.randint(1, max_groups_per_user))))
+
+    return {
+        "base_config": {"domain": "bench.local", "base_dn": BASE_DN},
+        "service_users": [
+            {
+                "username": f"svc{i:04d}",
+                "display_name": f"Service {i}",
+                "password": f"service-password-{i}",
+                "email": f"svc{i:04d}@bench.local",
+                "groups": ["service_accounts"],
+            }
+            for i in range(service_count)
+        ],
+        "users": [
+            {
+                "username": f"user{i:06d}",
+                "display_name": f"User {i}",
+                "first_name": "User",
+                "last_name": str(i),
+                "email": f"user{i:06d}@bench.local",
+                "password": f"user-password-{i}",
+                "groups": pick_groups(),
+            }
+            for i in range(users)
+        ],
+        "groups": [{"name": "service_accounts", "description": "Service accounts"}]
+        + [{"name": name, "description": f"Synthetic group {name}"} for name in names],
+    }
+
+
+def write_config(config, path):
+    with open(path, "w") as f:
+        yaml.dump(config, f, Dumper=SafeDumper, sort_keys=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic ldap.yaml for benchmarks")
+    parser.add_argument("--users", type=int, required=True, help="Number of regular users")
+    parser.add_argument("--groups", type=int, help="Number of groups (default: users / 100, at least 10)")
+    parser.add_argument("--service-users", type=int, help="Number of service users (default: users / 1000, at least 1)")
+    parser.add_argument("--max-groups-per-user", type=int, default=5,
+                        help="Upper bound of groups per user (default: 5)")
+    parser.add_argument("--skew", type=float, default=1.2,
+                        help="Zipf exponent of group popularity; 0 is uniform (default: 1.2)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--output", required=True, help="Path of the ldap.yaml to write")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = generate(args.users, args.groups, args.service_users, args.max_groups_per_user, args.skew, args.seed)
+    write_config(config, args.output)
+    print(f"✓ Wrote {len(config['service_users']) + len(config['users'])} users and "
+          f"{len(config['groups'])} groups to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -38,6 +38,14 @@ fi
 LLDAP_API_URL="http://localhost:$LLDAP_PORT"
 echo "$INFO LLDAP API URL: $LLDAP_API_URL"
 
+# Validate the bootstrap records before handing them to LLDAP
+if command -v python3 >/dev/null 2>&1 && python3 -c "import yaml" 2>/dev/null; then
+  echo "$INFO Validating bootstrap files..."
+  python3 "$SCRIPT_DIR/../config/bootstrap_loader.py" \
+    --user-configs "$SCRIPT_DIR/user-configs" \
+    --group-configs "$SCRIPT_DIR/group-configs"
+fi
+
 # Copy bootstrap files to container
 echo "$INFO Copying bootstrap files to container..."
 
@@ -0,0 +1,346 @@
+"""Parallel loader for the LLDAP bootstrap user and group JSON trees.
+
+bootstrap-lldap.sh hands components/ldap/bootstrap/user-configs and
+group-configs to LLDAP's bootstrap script, one JSON file per user or group.
+This module reads those trees on a thread pool, validates every record
+against the attribute schemas in user-schemas/default.json and
+group-schemas/default.json, and merges the result with ldap.yaml into one
+DirectoryModel. A newline-delimited JSON bundle, one record per line tagged
+with "kind": "user" or "group", can be read instead of the directories.
+
+Custom schema attributes are validated but only the standard fields
+(id, email, password, names and groups) become part of the model.
+
+Run directly to validate the trees or to pack them into a bundle:
+
+    python bootstrap_loader.py --write-bundle bootstrap.ndjson
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ldap_model import DEFAULT_CACHE_DIR, compile_model, load_config, load_model
+
+BOOTSTRAP_DIR = Path(__file__).resolve().parent.parent / "bootstrap"
+DEFAULT_USER_CONFIGS = str(BOOTSTRAP_DIR / "user-configs")
+DEFAULT_GROUP_CONFIGS = str(BOOTSTRAP_DIR / "group-configs")
+DEFAULT_USER_SCHEMA = str(BOOTSTRAP_DIR / "user-schemas" / "default.json")
+DEFAULT_GROUP_SCHEMA = str(BOOTSTRAP_DIR / "group-schemas" / "default.json")
+
+# Files read per worker task; per-file tasks would be dominated by scheduling
+CHUNK_SIZE = 128
+MAX_REPORTED_ERRORS = 20
+
+# Top-level keys of LLDAP bootstrap records as (JSON type, is list)
+USER_FIELDS = {
+    "id": (str, False),
+    "email": (str, False),
+    "password": (str, False),
+    "displayName": (str, False),
+    "firstName": (str, False),
+    "lastName": (str, False),
+    "avatar_file": (str, False),
+    "avatar_url": (str, False),
+    "gravatar_avatar": (bool, False),
+    "weser_avatar": (bool, False),
+    "groups": (str, True),
+}
+GROUP_FIELDS = {"name": (str, False)}
+REQUIRED_USER_FIELDS = ("id", "email")
+REQUIRED_GROUP_FIELDS = ("name",)
+
+# LLDAP attributeType -> JSON type
+ATTRIBUTE_TYPES = {"STRING": str, "INTEGER": int, "JPEG_PHOTO": str, "DATE_TIME": str}
+
+# Bootstrap user keys and their ldap.yaml equivalents
+USER_KEYS = {
+    "id": "username",
+    "email": "email",
+    "password": "password",
+    "displayName": "display_name",
+    "firstName": "first_name",
+    "lastName": "last_name",
+    "groups": "groups",
+}
+GROUP_KEYS = ("display_name", "description")
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+class BootstrapError(ValueError):
+    """Raised when bootstrap records fail validation"""
+
+    def __init__(self, errors):
+        shown = errors[:MAX_REPORTED_ERRORS]
+        more = f"\n  ... and {len(errors) - len(shown)} more" if len(errors) > len(shown) else ""
+        super().__init__(f"{len(errors)} bootstrap validation errors:\n  " + "\n  ".join(shown) + more)
+        self.errors = errors
+
+
+def load_schema(path):
+    """Return {attribute: (JSON type, is list)} from an LLDAP attribute schema file, or {} if it is missing"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        attributes = json.load(f)
+    return {
+        a["name"]: (ATTRIBUTE_TYPES.get(a.get("attributeType"), str), bool(a.get("isList")))
+        for a in attributes
+    }
+
+
+def _is_type(value, kind):
+    # bool is an int subclass but never a valid INTEGER attribute
+    return isinstance(value, kind) and not (kind is int and isinstance(value, bool))
+
+
+def validate(record, fields, required, source):
+    """Return the validation errors of one record"""
+    if not isinstance(record, dict):
+        return [f"{source}: expected a JSON object"]
+    errors = [f"{source}: missing required field {name!r}" for name in required if not record.get(name)]
+    for key, value in record.items():
+        spec = fields.get(key)
+        if spec is None:
+            errors.append(f"{source}: unknown field {key!r}")
+            continue
+        kind, is_list = spec
+        if is_list:
+            ok = isinstance(value, list) and all(_is_type(v, kind) for v in value)
+        else:
+            ok = _is_type(value, kind)
+        if not ok:
+            errors.append(f"{source}: field {key!r} must be {'a list of ' if is_list else ''}{kind.__name__}")
+    return errors
+
+
+def parse_documents(data):
+    """Decode one JSON object, an array of objects or several concatenated objects"""
+    text = data.decode("utf-8")
+    decoder = json.JSONDecoder()
+    records = []
+    pos = _WHITESPACE.match(text).end()
+    while pos < len(text):
+        value, pos = decoder.raw_decode(text, pos)
+        records.extend(value if isinstance(value, list) else [value])
+        pos = _WHITESPACE.match(text, pos).end()
+    return records
+
+
+def _read_chunk(job):
+    """Worker: read, parse and validate a chunk of files"""
+    paths, fields, required = job
+    records = []
+    errors = []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                documents = parse_documents(f.read())
+        except (OSError, ValueError) as e:
+            errors.append(f"{path}: {e}")
+            continue
+        for i, record in enumerate(documents):
+            source = path if len(documents) == 1 else f"{path}[{i}]"
+            problems = validate(record, fields, required, source)
+            if problems:
+                errors.extend(problems)
+            else:
+                records.append((source, record))
+    return records, errors
+
+
+def read_tree(directory, fields, required, workers=None):
+    """Read every *.json file in directory in parallel, in file name order.
+
+    Returns the valid (source, record) pairs and the validation errors.
+    """
+    paths = sorted(entry.path for entry in os.scandir(directory)
+                   if entry.is_file() and entry.name.endswith(".json"))
+    jobs = [(paths[i:i + CHUNK_SIZE], fields, required) for i in range(0, len(paths), CHUNK_SIZE)]
+    records = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk_records, chunk_errors in pool.map(_read_chunk, jobs):
+            records.extend(chunk_records)
+            errors.extend(chunk_errors)
+    return records, errors
+
+
+def read_bundle(path, user_fields, group_fields):
+    """Read a newline-delimited JSON bundle of "kind"-tagged user and group records"""
+    users = []
+    groups = []
+    errors = []
+    with open(path, "rb") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            source = f"{path}:{lineno}"
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                errors.append(f"{source}: {e}")
+                continue
+            kind = record.pop("kind", None) if isinstance(record, dict) else None
+            if kind == "user":
+                problems = validate(record, user_fields, REQUIRED_USER_FIELDS, source)
+                target = users
+            elif kind == "group":
+                problems = validate(record, group_fields, REQUIRED_GROUP_FIELDS, source)
+                target = groups
+            else:
+                problems = [f"{source}: \"kind\" must be \"user\" or \"group\""]
+            if problems:
+                errors.extend(problems)
+            else:
+                target.append((source, record))
+    return users, groups, errors
+
+
+def _find_duplicates(records, key, kind):
+    seen = {}
+    errors = []
+    for source, record in records:
+        first = seen.setdefault(record[key], source)
+        if first != source:
+            errors.append(f"{source}: {kind} {record[key]!r} is already defined in {first}")
+    return errors
+
+
+def load_bootstrap(user_configs=None, group_configs=None, bundle=None,
+                   user_schema=DEFAULT_USER_SCHEMA, group_schema=DEFAULT_GROUP_SCHEMA, workers=None):
+    """Read and validate bootstrap users and groups from the JSON trees and/or a bundle.
+
+    Returns (users, groups) as lists of bootstrap records. Raises
+    BootstrapError listing every invalid or duplicate record.
+    """
+    # Schema attributes extend the standard fields without redefining them
+    user_fields = {**load_schema(user_schema), **USER_FIELDS}
+    group_fields = {**load_schema(group_schema), **GROUP_FIELDS}
+    users = []
+    groups = []
+    errors = []
+    if user_configs:
+        records, problems = read_tree(user_configs, user_fields, REQUIRED_USER_FIELDS, workers)
+        users.extend(records)
+        errors.extend(problems)
+    if group_configs:
+        records, problems = read_tree(group_configs, group_fields, REQUIRED_GROUP_FIELDS, workers)
+        groups.extend(records)
+        errors.extend(problems)
+    if bundle:
+        bundle_users, bundle_groups, problems = read_bundle(bundle, user_fields, group_fields)
+        users.extend(bundle_users)
+        groups.extend(bundle_groups)
+        errors.extend(problems)
+    errors.extend(_find_duplicates(users, "id", "user"))
+    errors.extend(_find_duplicates(groups, "name", "group"))
+    if errors:
+        raise BootstrapError(errors)
+    return [record for _, record in users], [record for _, record in groups]
+
+
+def merge_config(config, users, groups):
+    """Return a copy of the ldap.yaml config with bootstrap users and groups merged in.
+
+    Entries defined in both keep the values ldap.yaml sets, take any other
+    fields from the bootstrap record, and combine their group lists.
+    """
+    merged = dict(config)
+    service_key = "service_accounts" if "service_users" not in config and "service_accounts" in config else "service_users"
+    sections = {key: [dict(entry) for entry in config.get(key) or []] for key in (service_key, "users")}
+    existing = {entry.get("username"): entry for section in sections.values() for entry in section}
+
+    for record in users:
+        user = {USER_KEYS[key]: value for key, value in record.items() if key in USER_KEYS}
+        entry = existing.get(user["username"])
+        if entry is None:
+            sections["users"].append(user)
+            existing[user["username"]] = user
+            continue
+        combined = list(dict.fromkeys(list(entry.get("groups") or []) + user.get("groups", [])))
+        for key, value in user.items():
+            entry.setdefault(key, value)
+        if combined:
+            entry["groups"] = combined
+    merged.update(sections)
+
+    merged_groups = [dict(entry) for entry in config.get("groups") or []]
+    by_name = {entry.get("name"): entry for entry in merged_groups}
+    for record in groups:
+        entry = by_name.get(record["name"])
+        if entry is None:
+            entry = by_name[record["name"]] = {"name": record["name"]}
+            merged_groups.append(entry)
+        for key in GROUP_KEYS:
+            if key in record:
+                entry.setdefault(key, record[key])
+    merged["groups"] = merged_groups
+    return merged
+
+
+def load_directory(config_path, user_configs=None, group_configs=None, bundle=None,
+                   cache_dir=DEFAULT_CACHE_DIR, workers=None):
+    """Load the desired directory from ldap.yaml and any bootstrap sources.
+
+    Without bootstrap sources this is ldap_model.load_model with its compiled
+    cache; with them the merged model is compiled on every call.
+    """
+    if not (user_configs or group_configs or bundle):
+        return load_model(config_path, cache_dir)
+    users, groups = load_bootstrap(user_configs, group_configs, bundle, workers=workers)
+    return compile_model(merge_config(load_config(config_path), users, groups))
+
+
+def write_bundle(users, groups, path):
+    """Atomically write users and groups as a newline-delimited JSON bundle"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        for kind, records in (("group", groups), ("user", users)):
+            for record in records:
+                f.write(json.dumps({"kind": kind, **record}, separators=(",", ":")))
+                f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Validate LLDAP bootstrap user and group records")
+    parser.add_argument("--user-configs",
+                        help=f"Directory of user JSON files (default: {DEFAULT_USER_CONFIGS} unless --bundle is given)")
+    parser.add_argument("--group-configs",
+                        help=f"Directory of group JSON files (default: {DEFAULT_GROUP_CONFIGS} unless --bundle is given)")
+    parser.add_argument("--bundle", help="Newline-delimited JSON bundle to read")
+    parser.add_argument("--user-schema", default=DEFAULT_USER_SCHEMA,
+                        help=f"LLDAP user attribute schema (default: {DEFAULT_USER_SCHEMA})")
+    parser.add_argument("--group-schema", default=DEFAULT_GROUP_SCHEMA,
+                        help=f"LLDAP group attribute schema (default: {DEFAULT_GROUP_SCHEMA})")
+    parser.add_argument("--workers", type=int, help="Reader threads (default: chosen by the thread pool)")
+    parser.add_argument("--write-bundle", help="Write the validated records to this bundle file")
+    args = parser.parse_args(argv)
+    if not (args.user_configs or args.group_configs or args.bundle):
+        args.user_configs = DEFAULT_USER_CONFIGS
+        args.group_configs = DEFAULT_GROUP_CONFIGS
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        users, groups = load_bootstrap(args.user_configs, args.group_configs, args.bundle,
+                                       args.user_schema, args.group_schema, args.workers)
+    except (BootstrapError, OSError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✓ Loaded {len(users)} users and {len(groups)} groups")
+    if args.write_bundle:
+        write_bundle(users, groups, args.write_bundle)
+        print(f"💾 Bundle written to {args.write_bundle}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
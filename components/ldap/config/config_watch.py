@@ -0,0 +1,134 @@
+"""Debounced change detection for the LDAP configuration files.
+
+ConfigWatcher watches ldap.yaml and the bootstrap user/group JSON directories
+and reports which of them changed once a burst of edits has settled. It uses
+inotify when the optional inotify_simple package is installed and falls back
+to polling file metadata otherwise.
+
+Files are watched through their parent directory, so editors that save by
+writing a temporary file and renaming it over the original are picked up.
+"""
+import os
+import time
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+# A steady stream of edits is flushed after this many debounce periods
+MAX_DEBOUNCE_PERIODS = 10
+
+
+def scan(path):
+    """Return a cheap signature of a file, or of every entry in a directory"""
+    try:
+        if os.path.isdir(path):
+            return frozenset(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in os.scandir(path) if entry.is_file()
+            )
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+
+class ConfigWatcher:
+    """Report debounced changes to a set of files and directories"""
+
+    def __init__(self, paths, debounce=DEFAULT_DEBOUNCE, poll_interval=DEFAULT_POLL_INTERVAL,
+                 use_inotify=True):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.inotify = None
+        if use_inotify and INotify is not None:
+            self._start_inotify()
+        self.signatures = {path: scan(path) for path in self.paths}
+
+    @property
+    def backend(self):
+        return "inotify" if self.inotify is not None else "polling"
+
+    def _start_inotify(self):
+        self.inotify = INotify()
+        # watch descriptor -> (directory, {file name: watched path} or None for the whole directory)
+        self.watches = {}
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.CREATE | flags.DELETE
+        for path in self.paths:
+            if os.path.isdir(path):
+                directory, name = path, None
+            else:
+                directory, name = os.path.split(path)
+            wd = self.inotify.add_watch(directory, mask)
+            names = self.watches.get(wd, (directory, {}))[1]
+            if name is None or names is None:
+                # A watched directory reports every file in it
+                names = None
+            else:
+                names[name] = path
+            self.watches[wd] = (directory, names)
+
+    def _read_inotify(self, timeout):
+        """Block up to timeout seconds (None blocks) and return the watched paths touched"""
+        changed = set()
+        for event in self.inotify.read(timeout=None if timeout is None else int(timeout * 1000)):
+            directory, names = self.watches.get(event.wd, (None, None))
+            if directory is None:
+                continue
+            if names is None:
+                changed.add(directory)
+            elif event.name in names:
+                changed.add(names[event.name])
+        return changed
+
+    def _poll(self, timeout):
+        """Rescan every poll_interval until something changed or timeout passes"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path in self.paths:
+                signature = scan(path)
+                if signature != self.signatures[path]:
+                    self.signatures[path] = signature
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+            wait = self.poll_interval
+            if deadline is not None:
+                wait = min(wait, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+
+    def _next(self, timeout):
+        if self.inotify is not None:
+            return self._read_inotify(timeout)
+        return self._poll(timeout)
+
+    def wait(self, timeout=None):
+        """Wait for changes and return the set of changed paths once edits settle.
+
+        Returns an empty set if nothing changed within timeout seconds.
+        """
+        changed = self._next(timeout)
+        if not changed:
+            return changed
+        deadline = time.monotonic() + self.debounce * MAX_DEBOUNCE_PERIODS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            more = self._next(min(self.debounce, remaining))
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
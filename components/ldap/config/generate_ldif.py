@@ -1,103 +1,488 @@
-import yaml
-import sys
-import os
+"""Generate an LDIF file from the Redstone LDAP YAML configuration.
+
+Entries are produced by a single pass over the configuration and streamed
+straight to a buffered writer, so large directories never have to be held
+in memory as text.
+
+With --manifest the generator runs incrementally: per-entry content hashes
+from the previous run are compared against the current configuration and
+only changetype add/modify/delete records are written for the entries that
+differ. Pass --full to write the complete snapshot as well.
+
+With --password-scheme, userPassword values are written as salted {SSHA} or
+{PBKDF2-SHA256} hashes. Hashing runs on a process pool and results can be
+cached with --hash-cache so unchanged passwords are not rehashed each run.
+Incremental mode with a password scheme requires --hash-cache: a fresh salt
+on every run would change every user's hash and turn each one into a modify.
+
+With --shards N the directory is split for parallel bulk import: the base
+DN and OU entries go to a base shard, users are spread over N shards by a
+hash of their uid, and groups go to a final shard because they reference
+user DNs. A JSON manifest next to the output records the load phases.
+
+The configuration is read through the compiled model in ldap_model.py, which
+is cached on disk and shared with provision_users.py. Users and groups from
+the LLDAP bootstrap JSON trees or an NDJSON bundle can be merged in with
+--user-configs, --group-configs and --bundle.
+"""
+import argparse
 import base64
 import hashlib
-from pathlib import Path
-
-try:
-    # Read the YAML configuration
-    config = yaml.safe_load(Path('/config/ldap.yaml').read_text())
-    
-    with open('/config/users.ldif', 'w') as f:
-        # Create base entries
+import json
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from bootstrap_loader import load_directory
+from ldap_model import DEFAULT_CACHE_DIR, user_dn
+
+DEFAULT_CONFIG_PATH = '/config/ldap.yaml'
+DEFAULT_OUTPUT_PATH = '/config/users.ldif'
+DEFAULT_CHANGES_PATH = '/config/users.changes.ldif'
+
+MANIFEST_VERSION = 1
+SHARD_MANIFEST_VERSION = 1
+
+# Write buffer for the output file (1 MiB)
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+USER_OBJECT_CLASSES = ('inetOrgPerson', 'organizationalPerson', 'person')
+
+PASSWORD_SCHEMES = ('plain', 'ssha', 'pbkdf2-sha256')
+SSHA_SALT_BYTES = 8
+PBKDF2_SALT_BYTES = 16
+PBKDF2_ROUNDS = 10000
+# Below this many passwords the process pool start-up costs more than it saves
+PARALLEL_HASH_THRESHOLD = 256
+
+
+def require_password(user):
+    """Return the configured password of user, which the LDIF cannot omit"""
+    if user.password is None:
+        raise ValueError(f'User {user.username} has no password')
+    return user.password
+
+
+def iter_base_entries(base_dn):
+    """Yield the base DN and organizational unit entries"""
+    yield base_dn, [
+        ('objectClass', 'dcObject'),
+        ('objectClass', 'organization'),
+        ('dc', base_dn.split('=')[1].split(',')[0]),
+        ('o', 'Redstone Organization'),
+    ]
+    for ou in ('users', 'groups', 'services'):
+        yield f'ou={ou},{base_dn}', [
+            ('objectClass', 'organizationalUnit'),
+            ('ou', ou),
+        ]
+
+
+def user_entry(user, passwords):
+    """Return the (dn, attrs) entry of a service or regular user"""
+    # Plaintext unless the hashing stage produced a value
+    password = passwords.get(user.username) or require_password(user)
+    attrs = [('objectClass', oc) for oc in USER_OBJECT_CLASSES]
+    attrs += [('uid', user.username), ('cn', user.display_name)]
+    if user.is_service:
+        # Service accounts have no personal names, so sn reuses display_name
+        attrs.append(('sn', user.display_name))
+    else:
+        # sn is mandatory for person entries
+        attrs.append(('sn', user.last_name or 'User'))
+        attrs.append(('givenName', user.first_name or 'Default'))
+    attrs += [
+        ('displayName', user.display_name),
+        ('mail', user.email),
+        ('userPassword', password),
+    ]
+    return user.dn, attrs
+
+
+def iter_user_entries(model, passwords=None):
+    """Yield service user and regular user entries
+
+    passwords optionally maps usernames to hashed userPassword values.
+    """
+    passwords = passwords or {}
+    for user in model.users.values():
+        yield user_entry(user, passwords)
+
+
+def iter_group_entries(model):
+    """Yield group entries with members taken from the model's group index"""
+    # At least one member is required, so fall back to the admin user
+    default_members = [user_dn('admin_user', model.base_dn)]
+    for group in model.groups.values():
+        attrs = [
+            ('objectClass', 'groupOfNames'),
+            ('cn', group.name),
+            ('description', group.description),
+        ]
+        members = [model.user_dn(username) for username in group.members] or default_members
+        attrs += [('member', dn) for dn in members]
+        yield group.dn, attrs
+
+
+def iter_entries(model, passwords=None):
+    """Yield every (dn, attrs) entry of the directory in load order"""
+    yield from iter_base_entries(model.base_dn)
+    yield from iter_user_entries(model, passwords)
+    yield from iter_group_entries(model)
+
+
+def format_entry(dn, attrs):
+    """Render a single entry as an LDIF record including the blank separator line"""
+    lines = [f'dn: {dn}']
+    lines.extend(f'{name}: {value}' for name, value in attrs)
+    lines.append('\n')
+    return '\n'.join(lines)
+
+
+def write_ldif(entries, path):
+    """Stream entries to path through a buffered writer and return the entry count"""
+    count = 0
+    with open(path, 'w', buffering=WRITE_BUFFER_SIZE) as f:
         f.write('# Generated LDIF from YAML configuration\n')
-        
-        # Create base DN structure
-        base_dn = config['base_config']['base_dn']
-        f.write(f'dn: {base_dn}\n')
-        f.write('objectClass: dcObject\n')
-        f.write('objectClass: organization\n')
-        f.write(f"dc: {base_dn.split('=')[1].split(',')[0]}\n")
-        f.write('o: Redstone Organization\n\n')
-        
-        # Create organizational units
-        f.write(f'dn: ou=users,{base_dn}\n')
-        f.write('objectClass: organizationalUnit\n')
-        f.write('ou: users\n\n')
-        
-        f.write(f'dn: ou=groups,{base_dn}\n')
-        f.write('objectClass: organizationalUnit\n')
-        f.write('ou: groups\n\n')
-        
-        f.write(f'dn: ou=services,{base_dn}\n')
-        f.write('objectClass: organizationalUnit\n')
-        f.write('ou: services\n\n')
-        
-        # Create service users
-        for user in config.get('service_users', []):
-            uid = user['username']
-            f.write(f'dn: uid={uid},ou=users,{base_dn}\n')
-            f.write('objectClass: inetOrgPerson\n')
-            f.write('objectClass: organizationalPerson\n')
-            f.write('objectClass: person\n')
-            f.write(f'uid: {uid}\n')
-            f.write(f"cn: {user.get('display_name', uid)}\n")
-            # Use display_name for sn if not specified
-            f.write(f"sn: {user.get('display_name', uid)}\n")
-            f.write(f"displayName: {user.get('display_name', uid)}\n")
-            f.write(f"mail: {user.get('email', f'{uid}@example.com')}\n")
-            # Password is stored in plaintext for simplicity in this demo
-            f.write(f"userPassword: {user['password']}\n\n")
-        
-        # Create regular users
-        for user in config.get('users', []):
-            uid = user['username']
-            f.write(f'dn: uid={uid},ou=users,{base_dn}\n')
-            f.write('objectClass: inetOrgPerson\n')
-            f.write('objectClass: organizationalPerson\n')
-            f.write('objectClass: person\n')
-            f.write(f'uid: {uid}\n')
-            f.write(f"cn: {user.get('display_name', uid)}\n")
-            f.write(f"sn: {user.get('last_name', 'User')}\n")
-            f.write(f"givenName: {user.get('first_name', 'Default')}\n")
-            f.write(f"displayName: {user.get('display_name', uid)}\n")
-            f.write(f"mail: {user.get('email', f'{uid}@example.com')}\n")
-            # Password is stored in plaintext for simplicity
-            f.write(f"userPassword: {user['password']}\n\n")
-        
-        # Create groups
-        for group in config.get('groups', []):
-            gid = group['name']
-            f.write(f'dn: cn={gid},ou=groups,{base_dn}\n')
-            f.write('objectClass: groupOfNames\n')
-            f.write(f'cn: {gid}\n')
-            f.write(f"description: {group.get('description', 'Group for ' + gid)}\n")
-            
-            # Find users who belong to this group
-            members = []
-            
-            # Check service users
-            for user in config.get('service_users', []):
-                if 'groups' in user and gid in user['groups']:
-                    members.append(f"uid={user['username']},ou=users,{base_dn}")
-            
-            # Check regular users
-            for user in config.get('users', []):
-                if 'groups' in user and gid in user['groups']:
-                    members.append(f"uid={user['username']},ou=users,{base_dn}")
-            
-            # Add members to the group - at least one member is required
-            if not members:
-                # Use admin as default member if no members found
-                members = [f'uid=admin_user,ou=users,{base_dn}']
-            
-            for member in members:
-                f.write(f'member: {member}\n')
-            
-            f.write('\n')
-    
-    print('Complete LDIF configuration generated successfully')
-except Exception as e:
-    print(f'Error generating LDIF: {e}')
-    sys.exit(1)
+        for dn, attrs in entries:
+            f.write(format_entry(dn, attrs))
+            count += 1
+    return count
+
+
+def shard_paths(output_path, shards):
+    """Return the base, user and group shard paths and the manifest path for output_path"""
+    stem, ext = os.path.splitext(output_path)
+    ext = ext or '.ldif'
+    width = len(str(shards - 1))
+    base_path = f'{stem}.base{ext}'
+    user_paths = [f'{stem}.users-{i:0{width}d}{ext}' for i in range(shards)]
+    group_path = f'{stem}.groups{ext}'
+    return base_path, user_paths, group_path, f'{stem}.shards.json'
+
+
+def user_shard(dn, shards):
+    """Pick the shard of a user entry from a stable hash of its uid"""
+    uid = dn.split(',', 1)[0].split('=', 1)[1]
+    return zlib.crc32(uid.encode('utf-8')) % shards
+
+
+def write_sharded(model, output_path, shards, passwords=None):
+    """Write the directory as base, user and group shards plus a load-order manifest.
+
+    Shards within a phase can be imported concurrently; phases must be
+    loaded in order. Returns the manifest.
+    """
+    base_path, user_paths, group_path, manifest_path = shard_paths(output_path, shards)
+
+    base_count = write_ldif(iter_base_entries(model.base_dn), base_path)
+
+    user_counts = [0] * shards
+    files = [open(path, 'w', buffering=WRITE_BUFFER_SIZE) for path in user_paths]
+    try:
+        for f in files:
+            f.write('# Generated LDIF from YAML configuration\n')
+        for dn, attrs in iter_user_entries(model, passwords):
+            shard = user_shard(dn, shards)
+            files[shard].write(format_entry(dn, attrs))
+            user_counts[shard] += 1
+    finally:
+        for f in files:
+            f.close()
+
+    group_count = write_ldif(iter_group_entries(model), group_path)
+
+    def shard(path, count):
+        return {'file': os.path.basename(path), 'entries': count}
+
+    manifest = {
+        'version': SHARD_MANIFEST_VERSION,
+        'phases': [
+            [shard(base_path, base_count)],
+            [shard(path, count) for path, count in zip(user_paths, user_counts)],
+            [shard(group_path, group_count)],
+        ],
+        'total_entries': base_count + sum(user_counts) + group_count,
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def salt_policy(scheme):
+    """Describe the hashing parameters so cached hashes are invalidated when they change"""
+    if scheme == 'ssha':
+        return f'ssha:salt={SSHA_SALT_BYTES}'
+    return f'pbkdf2-sha256:rounds={PBKDF2_ROUNDS}:salt={PBKDF2_SALT_BYTES}'
+
+
+def _ab64(data):
+    """Adapted base64 used by the OpenLDAP pbkdf2 module (no padding, '.' for '+')"""
+    return base64.b64encode(data).decode('ascii').rstrip('=').replace('+', '.')
+
+
+def hash_password(password, scheme):
+    """Return a salted userPassword value for password"""
+    secret = password.encode('utf-8')
+    if scheme == 'ssha':
+        salt = os.urandom(SSHA_SALT_BYTES)
+        hashed = hashlib.sha1(secret + salt).digest()
+        return '{SSHA}' + base64.b64encode(hashed + salt).decode('ascii')
+    if scheme == 'pbkdf2-sha256':
+        salt = os.urandom(PBKDF2_SALT_BYTES)
+        hashed = hashlib.pbkdf2_hmac('sha256', secret, salt, PBKDF2_ROUNDS)
+        return f'{{PBKDF2-SHA256}}{PBKDF2_ROUNDS}${_ab64(salt)}${_ab64(hashed)}'
+    raise ValueError(f'Unsupported password scheme: {scheme}')
+
+
+def _hash_job(job):
+    """Process pool worker: hash one (cache key, password, scheme) job"""
+    key, password, scheme = job
+    return key, hash_password(password, scheme)
+
+
+def password_cache_key(username, password, policy):
+    """Key cached hashes by username, password digest and salt policy"""
+    password_digest = hashlib.sha256(password.encode('utf-8')).hexdigest()
+    return f'{username}:{password_digest}:{policy}'
+
+
+def load_hash_cache(path):
+    """Read the password hash cache, returning an empty cache if it does not exist"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_hash_cache(cache, path):
+    """Atomically write the password hash cache readable by the owner only"""
+    tmp_path = f'{path}.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def hash_passwords(model, scheme, cache=None, workers=None):
+    """Hash every user password, reusing cached hashes where possible.
+
+    Uncached passwords are spread over a process pool once there are enough
+    of them to make it worthwhile. Returns the username -> hash mapping and
+    the cache entries used by this run, which become the new cache.
+    """
+    policy = salt_policy(scheme)
+    cache = cache or {}
+    passwords = {}
+    used = {}
+    usernames = {}
+    jobs = []
+    for user in model.users.values():
+        password = require_password(user)
+        key = password_cache_key(user.username, password, policy)
+        if key in cache:
+            passwords[user.username] = used[key] = cache[key]
+        else:
+            usernames[key] = user.username
+            jobs.append((key, password, scheme))
+
+    if len(jobs) < PARALLEL_HASH_THRESHOLD:
+        results = [_hash_job(job) for job in jobs]
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_hash_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+    for key, value in results:
+        passwords[usernames[key]] = used[key] = value
+    return passwords, used
+
+
+def digest(values):
+    """Return a short stable digest of a sequence of strings"""
+    h = hashlib.blake2b(digest_size=8)
+    for value in values:
+        h.update(str(value).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def group_attrs(attrs):
+    """Group (name, value) pairs into an ordered name -> [values] mapping"""
+    grouped = {}
+    for name, value in attrs:
+        grouped.setdefault(name, []).append(value)
+    return grouped
+
+
+def load_manifest(path):
+    """Read the DN -> {hash, attrs} manifest written by a previous run"""
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version in {path}: {manifest.get('version')}")
+    return manifest['entries']
+
+
+def save_manifest(entries, path):
+    """Atomically replace the manifest at path"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+        json.dump({'version': MANIFEST_VERSION, 'entries': entries}, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def format_add(dn, attrs):
+    """Render an entry as a changetype: add record"""
+    lines = [f'dn: {dn}', 'changetype: add']
+    lines.extend(f'{name}: {value}' for name, value in attrs)
+    lines.append('\n')
+    return '\n'.join(lines)
+
+
+def format_modify(dn, grouped, changed, removed):
+    """Render a changetype: modify record replacing changed and deleting removed attributes"""
+    lines = [f'dn: {dn}', 'changetype: modify']
+    for name in changed:
+        lines.append(f'replace: {name}')
+        lines.extend(f'{name}: {value}' for value in grouped[name])
+        lines.append('-')
+    for name in removed:
+        lines.append(f'delete: {name}')
+        lines.append('-')
+    lines.append('\n')
+    return '\n'.join(lines)
+
+
+def format_delete(dn):
+    """Render a changetype: delete record"""
+    return f'dn: {dn}\nchangetype: delete\n\n'
+
+
+def write_incremental(entries, changes_path, manifest_path, snapshot_path=None):
+    """Write change records for entries that differ from the manifest.
+
+    The manifest is only replaced once the change file has been written, so a
+    failed run leaves the previous state intact. Returns the number of added,
+    modified and deleted entries.
+    """
+    previous = load_manifest(manifest_path)
+    current = {}
+    added = modified = 0
+
+    snapshot = open(snapshot_path, 'w', buffering=WRITE_BUFFER_SIZE) if snapshot_path else None
+    try:
+        if snapshot:
+            snapshot.write('# Generated LDIF from YAML configuration\n')
+        with open(changes_path, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write('# Incremental LDIF changes from YAML configuration\n')
+            for dn, attrs in entries:
+                if snapshot:
+                    snapshot.write(format_entry(dn, attrs))
+
+                grouped = group_attrs(attrs)
+                attr_hashes = {name: digest(values) for name, values in grouped.items()}
+                entry_hash = digest(f'{name}={h}' for name, h in attr_hashes.items())
+                current[dn] = {'hash': entry_hash, 'attrs': attr_hashes}
+
+                old = previous.get(dn)
+                if old is None:
+                    f.write(format_add(dn, attrs))
+                    added += 1
+                elif old['hash'] != entry_hash:
+                    old_attrs = old['attrs']
+                    changed = [name for name, h in attr_hashes.items() if old_attrs.get(name) != h]
+                    removed = [name for name in old_attrs if name not in attr_hashes]
+                    f.write(format_modify(dn, grouped, changed, removed))
+                    modified += 1
+
+            # Delete in reverse load order so groups go before the users they reference
+            deleted = [dn for dn in reversed(list(previous)) if dn not in current]
+            for dn in deleted:
+                f.write(format_delete(dn))
+    finally:
+        if snapshot:
+            snapshot.close()
+
+    save_manifest(current, manifest_path)
+    return added, modified, len(deleted)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate LDIF from the LDAP YAML configuration')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                        help=f'Path to the LDAP YAML configuration (default: {DEFAULT_CONFIG_PATH})')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_PATH,
+                        help=f'Path of the LDIF file to write (default: {DEFAULT_OUTPUT_PATH})')
+    parser.add_argument('--manifest',
+                        help='Enable incremental mode using the entry hash manifest at this path')
+    parser.add_argument('--changes', default=DEFAULT_CHANGES_PATH,
+                        help=f'Path of the change records file in incremental mode (default: {DEFAULT_CHANGES_PATH})')
+    parser.add_argument('--full', action='store_true',
+                        help='In incremental mode, also write the full snapshot to --output')
+    parser.add_argument('--shards', type=int,
+                        help='Split the output into this many user shards for parallel import')
+    parser.add_argument('--password-scheme', choices=PASSWORD_SCHEMES, default='plain',
+                        help='How userPassword values are written (default: plain)')
+    parser.add_argument('--hash-cache',
+                        help='Cache of password hashes reused across runs')
+    parser.add_argument('--hash-workers', type=int,
+                        help='Number of hashing processes (default: number of CPUs)')
+    parser.add_argument('--user-configs',
+                        help='Directory of LLDAP bootstrap user JSON files to merge with the configuration')
+    parser.add_argument('--group-configs',
+                        help='Directory of LLDAP bootstrap group JSON files to merge with the configuration')
+    parser.add_argument('--bundle',
+                        help='Newline-delimited JSON bundle of bootstrap users and groups to merge with the configuration')
+    parser.add_argument('--model-cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Directory of the compiled configuration cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-model-cache', action='store_true',
+                        help='Always parse the configuration instead of using the compiled cache')
+    args = parser.parse_args(argv)
+    if args.shards is not None and args.shards < 1:
+        parser.error('--shards must be at least 1')
+    if args.shards and args.manifest:
+        parser.error('--shards cannot be combined with incremental mode (--manifest)')
+    if args.manifest and args.password_scheme != 'plain' and not args.hash_cache:
+        # Without cached hashes every user gets a new salt and shows up as modified
+        parser.error('--manifest with a salted --password-scheme requires --hash-cache')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        model = load_directory(args.config, args.user_configs, args.group_configs, args.bundle,
+                               None if args.no_model_cache else args.model_cache_dir)
+        passwords = None
+        if args.password_scheme != 'plain':
+            cache = load_hash_cache(args.hash_cache) if args.hash_cache else None
+            passwords, cache = hash_passwords(model, args.password_scheme, cache, args.hash_workers)
+            if args.hash_cache:
+                save_hash_cache(cache, args.hash_cache)
+
+        if args.shards:
+            manifest = write_sharded(model, args.output, args.shards, passwords)
+            print(f"Sharded LDIF configuration generated: {manifest['total_entries']} entries "
+                  f"in {args.shards + 2} files")
+        elif args.manifest:
+            added, modified, deleted = write_incremental(
+                iter_entries(model, passwords), args.changes, args.manifest,
+                snapshot_path=args.output if args.full else None)
+            print(f'Incremental LDIF changes generated: {added} added, {modified} modified, {deleted} deleted')
+        else:
+            write_ldif(iter_entries(model, passwords), args.output)
+            print('Complete LDIF configuration generated successfully')
+    except Exception as e:
+        print(f'Error generating LDIF: {e}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
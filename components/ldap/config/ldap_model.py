@@ -0,0 +1,251 @@
+"""Compiled directory model shared by generate_ldif.py and provision_users.py.
+
+ldap.yaml is parsed and validated once into compact __slots__ records with
+precomputed DNs, resolved defaults and group/member indexes, so both tools
+see exactly the same users, groups and memberships:
+
+- service accounts are read from service_users (service_accounts is
+  accepted as a legacy alias)
+- memberships come from each user's groups list and from groups[].members
+
+The compiled model is cached on disk keyed by the file's mtime, size and
+SHA-256, so repeat runs on an unchanged file skip YAML parsing entirely.
+The cache contains the configured passwords and is written with mode 0600.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import yaml
+
+try:
+    # The libyaml-backed loader is several times faster on large configs
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "LDAP_MODEL_CACHE_DIR",
+    str(Path.home() / ".cache" / "redstone")
+)
+
+# Bump when the record layout changes so stale caches are ignored
+CACHE_VERSION = 1
+
+
+class ModelError(ValueError):
+    """Raised when ldap.yaml does not describe a valid directory"""
+
+
+class User:
+    """A configured user with resolved defaults and its DN"""
+    __slots__ = ("username", "kind", "display_name", "first_name", "last_name",
+                 "email", "password", "groups", "dn")
+
+    def __init__(self, username, kind, display_name, first_name, last_name, email, password, groups, dn):
+        self.username = username
+        self.kind = kind
+        self.display_name = display_name
+        self.first_name = first_name
+        self.last_name = last_name
+        self.email = email
+        self.password = password
+        self.groups = groups
+        self.dn = dn
+
+    @property
+    def is_service(self):
+        return self.kind == "service"
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __reduce__(self):
+        return (User, tuple(getattr(self, name) for name in self.__slots__))
+
+
+class Group:
+    """A configured group with its DN and ordered member usernames"""
+    __slots__ = ("name", "display_name", "description", "members", "dn")
+
+    def __init__(self, name, display_name, description, members, dn):
+        self.name = name
+        self.display_name = display_name
+        self.description = description
+        self.members = members
+        self.dn = dn
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __reduce__(self):
+        return (Group, tuple(getattr(self, name) for name in self.__slots__))
+
+
+class DirectoryModel:
+    """Users, groups and memberships compiled from ldap.yaml"""
+    __slots__ = ("base_dn", "users", "groups", "memberships")
+
+    def __init__(self, base_dn, users, groups, memberships):
+        self.base_dn = base_dn
+        # username -> User, service accounts first, in file order
+        self.users = users
+        # group name -> Group, in file order
+        self.groups = groups
+        # {(group name, username)} including groups that are referenced but not defined
+        self.memberships = memberships
+
+    def __reduce__(self):
+        return (DirectoryModel, (self.base_dn, self.users, self.groups, self.memberships))
+
+    def user_dn(self, username):
+        return user_dn(username, self.base_dn)
+
+    def members_of(self, group_name):
+        """Return the member usernames of a group, including undefined groups"""
+        group = self.groups.get(group_name)
+        if group is not None:
+            return group.members
+        return tuple(sorted(u for g, u in self.memberships if g == group_name))
+
+
+def user_dn(username, base_dn):
+    """Return the DN of a user entry"""
+    return f"uid={username},ou=users,{base_dn}"
+
+
+def group_dn(name, base_dn):
+    """Return the DN of a group entry"""
+    return f"cn={name},ou=groups,{base_dn}"
+
+
+def compile_model(config):
+    """Validate a parsed ldap.yaml document and compile it into a DirectoryModel"""
+    if not isinstance(config, dict):
+        raise ModelError("LDAP configuration must be a mapping")
+    try:
+        base_dn = config["base_config"]["base_dn"]
+    except (KeyError, TypeError):
+        raise ModelError("base_config.base_dn is required")
+
+    service_users = config.get("service_users")
+    if service_users is None:
+        service_users = config.get("service_accounts")
+
+    users = {}
+    for kind, section in (("service", service_users), ("user", config.get("users"))):
+        for entry in section or []:
+            username = entry.get("username")
+            if not username:
+                raise ModelError(f"A {kind} entry is missing its username")
+            if username in users:
+                raise ModelError(f"User {username} is defined more than once")
+            password = entry.get("password")
+            users[username] = User(
+                username=username,
+                kind=kind,
+                display_name=entry.get("display_name", username),
+                first_name=entry.get("first_name", ""),
+                last_name=entry.get("last_name", ""),
+                email=entry.get("email", f"{username}@example.com"),
+                password=str(password) if password is not None else None,
+                # dict.fromkeys drops duplicate group names but keeps their order
+                groups=tuple(dict.fromkeys(entry.get("groups") or [])),
+                dn=user_dn(username, base_dn),
+            )
+
+    # One pass over users builds the inverted group -> members index
+    members = {}
+    for user in users.values():
+        for name in user.groups:
+            members.setdefault(name, {})[user.username] = None
+
+    groups = {}
+    for entry in config.get("groups") or []:
+        name = entry.get("name")
+        if not name:
+            raise ModelError("A group entry is missing its name")
+        if name in groups:
+            raise ModelError(f"Group {name} is defined more than once")
+        group_members = members.setdefault(name, {})
+        for username in entry.get("members") or []:
+            group_members[username] = None
+        groups[name] = Group(
+            name=name,
+            display_name=entry.get("display_name", name),
+            description=entry.get("description", f"Group for {name}"),
+            members=tuple(group_members),
+            dn=group_dn(name, base_dn),
+        )
+
+    memberships = {(name, username) for name, usernames in members.items() for username in usernames}
+    return DirectoryModel(base_dn, users, groups, memberships)
+
+
+def load_config(config_path):
+    """Parse ldap.yaml without compiling it"""
+    with open(config_path, "rb") as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
+def _cache_path(config_path, cache_dir):
+    key = hashlib.sha1(str(Path(config_path).resolve()).encode("utf-8")).hexdigest()[:16]
+    return Path(cache_dir) / f"ldap-model-{key}.pickle"
+
+
+def _read_cache(path):
+    try:
+        with open(path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError):
+        return None
+    return cached if isinstance(cached, dict) and cached.get("version") == CACHE_VERSION else None
+
+
+def _write_cache(path, stat, digest, model):
+    try:
+        # The model holds plaintext passwords, so the cache is private to the current user
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # mkstemp creates the file with mode 0600
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".ldap-model-")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({
+                "version": CACHE_VERSION,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": digest,
+                "model": model,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        # The cache is an optimisation; an unwritable cache dir is not an error
+        pass
+
+
+def load_model(config_path, cache_dir=DEFAULT_CACHE_DIR):
+    """Load the compiled model for config_path, using the on-disk cache when valid.
+
+    A cache entry is reused without reading the file when mtime and size
+    match, and after a content hash check when only the mtime changed.
+    Pass cache_dir=None to always parse.
+    """
+    if cache_dir is None:
+        return compile_model(load_config(config_path))
+
+    path = _cache_path(config_path, cache_dir)
+    stat = os.stat(config_path)
+    cached = _read_cache(path)
+    if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+        return cached["model"]
+
+    with open(config_path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if cached and cached["sha256"] == digest:
+        model = cached["model"]
+    else:
+        model = compile_model(yaml.load(data, Loader=SafeLoader))
+    _write_cache(path, stat, digest, model)
+    return model
@@ -0,0 +1,197 @@
+"""Report drift between two LDIF files, or between an LDIF file and ldap.yaml.
+
+Both sides are streamed. A first pass keeps only the normalized DN, record
+offset and digest of every entry; entries whose digests differ are re-read by
+offset to list the attribute values that changed. Memory grows with the
+number of entries, not with the size of the files, so multi-gigabyte
+exports can be compared. As in LDAP, DNs and attribute names compare
+case-insensitively and the order of attribute values is ignored.
+
+With --config the expected side is the directory compiled from ldap.yaml,
+rendered exactly as generate_ldif.py would write it.
+
+    python ldif_diff.py ../bootstrap/users.ldif users.ldif
+    python ldif_diff.py users.ldif --config ldap.yaml --ignore userPassword
+
+Exits 0 when nothing differs, 1 when there is drift and 2 on errors.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import sys
+
+from generate_ldif import iter_entries
+from ldap_model import DEFAULT_CACHE_DIR, load_model
+from ldif_reader import LDIFError, LDIFReader, normalize_dn
+
+# Values never printed in reports
+SECRET_ATTRIBUTES = frozenset({'userpassword'})
+
+
+def value_bytes(value):
+    return value if isinstance(value, bytes) else value.encode('utf-8')
+
+
+def attribute_set(attrs, ignore=frozenset()):
+    """Return the set of (lowercase name, value bytes) pairs of an entry"""
+    return {(name.lower(), value_bytes(value)) for name, value in attrs if name.lower() not in ignore}
+
+
+def entry_digest(attrs, ignore=frozenset()):
+    """Return an order-independent digest of an entry's attribute values"""
+    h = hashlib.blake2b(digest_size=16)
+    for name, value in sorted(attribute_set(attrs, ignore)):
+        h.update(name.encode('ascii'))
+        h.update(b'\0')
+        h.update(value)
+        h.update(b'\0')
+    return h.digest()
+
+
+class LDIFSource:
+    """Entries of an LDIF file, re-read by offset on demand"""
+
+    def __init__(self, path):
+        self.name = path
+        self.reader = LDIFReader(path)
+
+    def scan(self, ignore):
+        """Return normalized DN -> (digest, offset) in file order"""
+        return {
+            normalize_dn(dn): (entry_digest(attrs, ignore), offset)
+            for offset, dn, attrs in self.reader.iter_with_offsets()
+        }
+
+    def entry(self, handle):
+        return self.reader.read_entry(handle)
+
+    def close(self):
+        self.reader.close()
+
+
+class ModelSource:
+    """Entries of the directory compiled from ldap.yaml, as generate_ldif.py renders them"""
+
+    def __init__(self, config_path, cache_dir):
+        self.name = config_path
+        self.model = load_model(config_path, cache_dir)
+
+    def scan(self, ignore):
+        return {
+            normalize_dn(dn): (entry_digest(attrs, ignore), (dn, attrs))
+            for dn, attrs in iter_entries(self.model)
+        }
+
+    def entry(self, handle):
+        return handle
+
+    def close(self):
+        pass
+
+
+def diff_sources(old, new, ignore=frozenset()):
+    """Yield (change, dn, removed, added) for every entry that differs
+
+    change is 'removed', 'added' or 'changed'; removed and added are the
+    sorted (name, value bytes) pairs only present on that side.
+    """
+    old_entries = old.scan(ignore)
+    new_entries = new.scan(ignore)
+    for key, (digest, handle) in old_entries.items():
+        match = new_entries.get(key)
+        if match is None:
+            dn, attrs = old.entry(handle)
+            yield 'removed', dn, sorted(attribute_set(attrs, ignore)), []
+        elif match[0] != digest:
+            dn, attrs = old.entry(handle)
+            old_attrs = attribute_set(attrs, ignore)
+            new_attrs = attribute_set(new.entry(match[1])[1], ignore)
+            yield 'changed', dn, sorted(old_attrs - new_attrs), sorted(new_attrs - old_attrs)
+    for key, (_, handle) in new_entries.items():
+        if key not in old_entries:
+            dn, attrs = new.entry(handle)
+            yield 'added', dn, [], sorted(attribute_set(attrs, ignore))
+
+
+def display_value(name, value):
+    """Render a value for reports; secrets are hidden and binary values base64-encoded"""
+    if name in SECRET_ATTRIBUTES:
+        return '(hidden)'
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return base64.b64encode(value).decode('ascii')
+
+
+def format_change(change, dn, removed, added, verbose):
+    marker = {'removed': '-', 'added': '+', 'changed': '~'}[change]
+    lines = [f'{marker} dn: {dn}']
+    # Whole entries are only listed attribute by attribute when asked for
+    if change == 'changed' or verbose:
+        lines.extend(f'    - {name}: {display_value(name, value)}' for name, value in removed)
+        lines.extend(f'    + {name}: {display_value(name, value)}' for name, value in added)
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compare an LDIF file with another LDIF file or with ldap.yaml')
+    parser.add_argument('old', help='LDIF file to compare from')
+    parser.add_argument('new', nargs='?', help='LDIF file to compare against')
+    parser.add_argument('--config',
+                        help='Compare against the directory compiled from this LDAP YAML configuration instead')
+    parser.add_argument('--ignore', action='append', default=[], metavar='ATTRIBUTE',
+                        help='Attribute to leave out of the comparison (repeatable)')
+    parser.add_argument('--summary', action='store_true', help='Only print the counts of differences')
+    parser.add_argument('--verbose', action='store_true', help='List the attributes of added and removed entries')
+    parser.add_argument('--json', action='store_true', help='Print one JSON object per difference')
+    parser.add_argument('--model-cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Directory of the compiled configuration cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-model-cache', action='store_true',
+                        help='Always parse the configuration instead of using the compiled cache')
+    args = parser.parse_args(argv)
+    if (args.new is None) == (args.config is None):
+        parser.error('give either a second LDIF file or --config')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    ignore = frozenset(name.lower() for name in args.ignore)
+    counts = {'added': 0, 'removed': 0, 'changed': 0}
+    old = new = None
+    try:
+        old = LDIFSource(args.old)
+        if args.config:
+            new = ModelSource(args.config, None if args.no_model_cache else args.model_cache_dir)
+        else:
+            new = LDIFSource(args.new)
+        for change, dn, removed, added in diff_sources(old, new, ignore):
+            counts[change] += 1
+            if args.summary:
+                continue
+            if args.json:
+                print(json.dumps({
+                    'change': change,
+                    'dn': dn,
+                    'removed': [[name, display_value(name, value)] for name, value in removed],
+                    'added': [[name, display_value(name, value)] for name, value in added],
+                }))
+            else:
+                print(format_change(change, dn, removed, added, args.verbose))
+    except (OSError, LDIFError, ValueError) as e:
+        print(f'Error comparing LDIF: {e}', file=sys.stderr)
+        return 2
+    finally:
+        for source in (old, new):
+            if source is not None:
+                source.close()
+
+    if not args.json:
+        print(f'{counts["added"]} added, {counts["removed"]} removed, {counts["changed"]} changed '
+              f'({old.name} -> {new.name})')
+    return 1 if any(counts.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
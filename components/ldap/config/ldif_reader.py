@@ -0,0 +1,168 @@
+"""Stream entries out of LDIF files without loading them into memory.
+
+LDIFReader memory-maps the file and parses one record at a time, so only
+the entry being looked at is ever decoded. Folded continuation lines,
+base64 (::) values, comments, a leading version line and CRLF line endings
+are handled as described in RFC 2849. index() maps every DN to the byte
+offset of its record, so single entries can be re-read later by offset
+instead of scanning the file again.
+
+Entries are (dn, attrs) pairs like the ones generate_ldif.py writes, where
+attrs is a list of (name, value) pairs. Values are str, or bytes when a
+base64 value is not valid UTF-8.
+"""
+import base64
+import binascii
+import mmap
+import os
+
+
+class LDIFError(ValueError):
+    """Raised when an LDIF file cannot be parsed"""
+
+
+def normalize_dn(dn):
+    """Return dn in canonical form: lowercase without spaces around separators"""
+    rdns = []
+    for rdn in dn.split(','):
+        name, _, value = rdn.partition('=')
+        rdns.append(f'{name.strip()}={value.strip()}')
+    return ','.join(rdns).lower()
+
+
+def parse_line(line):
+    """Parse one unfolded attribute line into (name, value)"""
+    name, sep, rest = line.partition(b':')
+    if not sep or not name:
+        raise LDIFError(f'not an attribute line: {line[:80]!r}')
+    name = name.decode('ascii').strip()
+    if rest.startswith(b':'):
+        try:
+            raw = base64.b64decode(rest[1:].strip(), validate=True)
+        except binascii.Error as e:
+            raise LDIFError(f'invalid base64 value for {name}: {e}') from None
+        try:
+            return name, raw.decode('utf-8')
+        except UnicodeDecodeError:
+            return name, raw
+    if rest.startswith(b'<'):
+        # URL reference (name:< file:///...), kept as the URL
+        return name, rest[1:].strip().decode('utf-8')
+    return name, rest.lstrip(b' ').decode('utf-8')
+
+
+class LDIFReader:
+    """Lazy, memory-mapped reader of an LDIF file
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        # mmap cannot map an empty file
+        if os.fstat(self._file.fileno()).st_size:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            # Entries are mostly read front to back; let the kernel read ahead and drop pages behind
+            if hasattr(self._data, 'madvise'):
+                self._data.madvise(mmap.MADV_SEQUENTIAL)
+        else:
+            self._data = b''
+        self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def _lines(self, pos):
+        """Yield (offset, line) from pos with continuation lines unfolded"""
+        data = self._data
+        end = len(data)
+        pending = None
+        pending_offset = pos
+        while pos < end:
+            newline = data.find(b'\n', pos)
+            if newline == -1:
+                newline = end
+            line = data[pos:newline]
+            if line.endswith(b'\r'):
+                line = line[:-1]
+            offset, pos = pos, newline + 1
+            if line.startswith(b' '):
+                if pending is None:
+                    raise LDIFError(f'{self.path}: continuation line without a preceding line at byte {offset}')
+                pending.append(line[1:])
+                continue
+            if pending is not None:
+                yield pending_offset, b''.join(pending)
+            pending, pending_offset = [line], offset
+        if pending is not None:
+            yield pending_offset, b''.join(pending)
+
+    def _records(self, pos=0):
+        """Yield (offset, lines) of every record from pos; comments are dropped"""
+        lines = []
+        start = pos
+        for offset, line in self._lines(pos):
+            if not line:
+                if lines:
+                    yield start, lines
+                    lines = []
+                continue
+            if line.startswith(b'#'):
+                continue
+            if not lines:
+                start = offset
+                # A version line may precede the first record without a blank line
+                if line.startswith(b'version:'):
+                    continue
+            lines.append(line)
+        if lines:
+            yield start, lines
+
+    def _parse(self, offset, lines):
+        try:
+            name, dn = parse_line(lines[0])
+            if name.lower() != 'dn':
+                raise LDIFError(f'record does not start with dn: {lines[0][:80]!r}')
+            return dn, [parse_line(line) for line in lines[1:]]
+        except (LDIFError, UnicodeDecodeError) as e:
+            raise LDIFError(f'{self.path}: record at byte {offset}: {e}') from None
+
+    def __iter__(self):
+        for _, dn, attrs in self.iter_with_offsets():
+            yield dn, attrs
+
+    def iter_with_offsets(self):
+        """Yield (offset, dn, attrs) for every entry in file order"""
+        for offset, lines in self._records():
+            dn, attrs = self._parse(offset, lines)
+            yield offset, dn, attrs
+
+    def read_entry(self, offset):
+        """Return the (dn, attrs) entry whose record starts at offset"""
+        for start, lines in self._records(offset):
+            return self._parse(start, lines)
+        raise LDIFError(f'{self.path}: no record at byte {offset}')
+
+    def index(self):
+        """Return a normalized DN -> record offset mapping, built on first use"""
+        if self._index is None:
+            index = {}
+            for offset, lines in self._records():
+                name, dn = parse_line(lines[0])
+                index[normalize_dn(dn)] = offset
+            self._index = index
+        return self._index
+
+    def get(self, dn):
+        """Return the (dn, attrs) entry for dn, or None if the file has no such entry"""
+        offset = self.index().get(normalize_dn(dn))
+        return None if offset is None else self.read_entry(offset)
@@ -0,0 +1,196 @@
+"""LLDAP authentication with a persistent, self-refreshing JWT.
+
+TokenManager holds the admin JWT and refresh token for one LLDAP URL. The
+JWT's exp claim is decoded (not verified; LLDAP verifies it) so the token
+is renewed shortly before it expires: first through /auth/refresh with the
+refresh token, falling back to a full /auth/simple/login. Tokens are saved
+to a cache file readable only by the current user, so back-to-back runs
+reuse them instead of logging in again.
+
+A TokenManager can be passed anywhere a token string was: formatting it
+(f"Bearer {token}") yields the current JWT, renewing it first if needed.
+Renewal is serialized by a lock, so concurrent workers share one token and
+at most one of them talks to the auth endpoints at a time.
+"""
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Set LLDAP_TOKEN_CACHE to an empty string to keep tokens in memory only
+TOKEN_CACHE_PATH = os.environ.get(
+    "LLDAP_TOKEN_CACHE",
+    str(Path.home() / ".cache" / "redstone" / "lldap-token.json")
+) or None
+# Renew this many seconds before the JWT expires
+REFRESH_MARGIN = int(os.environ.get("LLDAP_TOKEN_REFRESH_MARGIN", "300"))
+
+def jwt_expiry(token):
+    """Return the exp claim of a JWT as a Unix timestamp, or None if it has none"""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+class AuthenticationError(RuntimeError):
+    """Raised when no valid token can be obtained"""
+
+class TokenManager:
+    """Thread-safe holder of an LLDAP JWT that refreshes and persists it
+
+    Args:
+        session: requests session used for the auth endpoints
+        url: LLDAP base URL the token is valid for
+        username: Admin username to log in with
+        password: Admin password to log in with
+        cache_path: Token cache file, or None to keep tokens in memory only
+        margin: Seconds before expiry at which the token is renewed
+    """
+
+    def __init__(self, session, url, username, password, cache_path=TOKEN_CACHE_PATH, margin=REFRESH_MARGIN):
+        self.session = session
+        self.url = url
+        self.username = username
+        self.password = password
+        self.cache_path = cache_path
+        self.margin = margin
+        self.token = None
+        self.refresh_token = None
+        self.expires_at = None
+        self.logins = 0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return self.get()
+
+    def _usable(self):
+        if not self.token:
+            return False
+        # Without an exp claim the token is trusted until the server rejects it
+        return self.expires_at is None or time.time() < self.expires_at - self.margin
+
+    def get(self):
+        """Return a JWT that is valid for at least the refresh margin"""
+        if self._usable():
+            return self.token
+        with self._lock:
+            # Another worker may have renewed it while this one waited
+            if not self._usable():
+                self._renew()
+            return self.token
+
+    def ensure(self):
+        """Obtain a usable token from the cache, a refresh or a login; return whether that worked"""
+        try:
+            with self._lock:
+                if not self._usable():
+                    self._load_cache()
+                if not self._usable():
+                    self._renew()
+            return True
+        except AuthenticationError as e:
+            print(f"✗ {str(e)}")
+            return False
+
+    def invalidate(self, rejected=None):
+        """Forget the JWT after the server rejected it, so the next get() renews it
+
+        rejected is the token the failed request used; if another worker has
+        already replaced it, nothing is forgotten.
+        """
+        with self._lock:
+            if rejected is None or rejected == self.token:
+                self.token = None
+                self.expires_at = None
+
+    def _renew(self):
+        if self.refresh_token and self._refresh():
+            self.refreshes += 1
+        else:
+            self._login()
+            self.logins += 1
+        self._save_cache()
+
+    def _set_token(self, token, refresh_token=None):
+        self.token = token
+        self.expires_at = jwt_expiry(token)
+        if refresh_token:
+            self.refresh_token = refresh_token
+
+    def _login(self):
+        try:
+            resp = self.session.post(
+                f"{self.url}/auth/simple/login",
+                json={"username": self.username, "password": self.password},
+                headers={"Content-Type": "application/json"},
+                timeout=5
+            )
+        except Exception as e:
+            raise AuthenticationError(f"Connection error with {self.url}: {str(e)}") from None
+        if resp.status_code != 200:
+            raise AuthenticationError(f"Login failed with status {resp.status_code}: {resp.text[:100]}")
+        try:
+            body = resp.json()
+            self._set_token(body["token"], body.get("refreshToken"))
+        except (ValueError, KeyError, TypeError) as e:
+            raise AuthenticationError(f"Received status 200 but invalid JSON: {str(e)}") from None
+
+    def _refresh(self):
+        """Exchange the refresh token for a new JWT; return False if LLDAP refused"""
+        try:
+            resp = self.session.get(
+                f"{self.url}/auth/refresh",
+                headers={"Cookie": f"refresh_token={self.refresh_token}"},
+                timeout=5
+            )
+            if resp.status_code == 200:
+                self._set_token(resp.json()["token"])
+                return True
+        except Exception as e:
+            print(f"⚠️ Token refresh failed, logging in again: {str(e)}")
+            return False
+        # The refresh token expired or was revoked
+        self.refresh_token = None
+        return False
+
+    def _load_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cached.get("url") != self.url or cached.get("username") != self.username:
+            return
+        if cached.get("token"):
+            self._set_token(cached["token"], cached.get("refresh_token"))
+        elif cached.get("refresh_token"):
+            self.refresh_token = cached["refresh_token"]
+
+    def _save_cache(self):
+        # A token without exp cannot be judged by a later run, so it is not kept
+        if not self.cache_path or self.expires_at is None:
+            return
+        directory = os.path.dirname(self.cache_path) or "."
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            # mkstemp creates the file with mode 0600
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".lldap-token-")
+            with os.fdopen(fd, "w") as f:
+                json.dump({
+                    "url": self.url,
+                    "username": self.username,
+                    "token": self.token,
+                    "refresh_token": self.refresh_token,
+                    "expires_at": self.expires_at,
+                }, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"⚠️ Could not write token cache {self.cache_path}: {str(e)}")
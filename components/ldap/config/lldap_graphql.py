@@ -0,0 +1,247 @@
+"""Batched GraphQL transport for the LLDAP API.
+
+LLDAP serves GraphQL at /api/graphql. Instead of one HTTP request per user,
+group or membership, planned operations are packed into aliased mutation
+documents of up to batch_size fields, and each field's result or error is
+mapped back to the operation that produced it. The whole directory is read
+with a single query.
+
+LLDAP does not accept passwords over GraphQL, so users created through this
+transport need their password set with lldap_set_password afterwards.
+Group fields other than the display name (such as description) are sent
+and read back as LLDAP group attributes, so both transports produce the
+same groups.
+"""
+from lldap_auth import TokenManager
+
+GRAPHQL_PATH = "/api/graphql"
+DEFAULT_BATCH_SIZE = 50
+
+SNAPSHOT_QUERY = """
+query DirectorySnapshot {
+  users { id email displayName firstName lastName groups { id displayName } }
+  groups { id displayName attributes { name value } }
+}
+"""
+
+# action -> (mutation field, selection, [(argument, GraphQL type)])
+MUTATIONS = {
+    "create_user": ("createUser", "{ id }", [("user", "CreateUserInput!")]),
+    "update_user": ("updateUser", "{ ok }", [("user", "UpdateUserInput!")]),
+    "create_group": ("createGroupWithDetails", "{ id displayName }", [("request", "CreateGroupInput!")]),
+    "update_group": ("updateGroup", "{ ok }", [("group", "UpdateGroupInput!")]),
+    "add_member": ("addUserToGroup", "{ ok }", [("userId", "String!"), ("groupId", "Int!")]),
+    "remove_member": ("removeUserFromGroup", "{ ok }", [("userId", "String!"), ("groupId", "Int!")]),
+    "delete_user": ("deleteUser", "{ ok }", [("userId", "String!")]),
+    "delete_group": ("deleteGroup", "{ ok }", [("groupId", "Int!")]),
+}
+
+# REST-style user fields and their GraphQL input names
+USER_INPUT_FIELDS = {
+    "email": "email",
+    "display_name": "displayName",
+    "first_name": "firstName",
+    "last_name": "lastName",
+}
+
+
+# Group fields stored as LLDAP group attributes
+GROUP_ATTRIBUTES = ("description",)
+
+
+def group_attribute_values(group):
+    """Return the configured group attributes as AttributeValueInput objects"""
+    return [
+        {"name": name, "value": [str(getattr(group, name))]}
+        for name in GROUP_ATTRIBUTES
+        if getattr(group, name, None) is not None
+    ]
+
+
+class GraphQLError(Exception):
+    """Raised when a GraphQL request fails as a whole"""
+
+
+class GraphQLTransport:
+    """Send LLDAP reads and batched mutations over a shared HTTP session"""
+
+    def __init__(self, session, base_url, token, batch_size=DEFAULT_BATCH_SIZE, timeout=30):
+        self.session = session
+        self.url = f"{base_url}{GRAPHQL_PATH}"
+        self.token = token
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+
+    def _post(self, token, document, variables):
+        return self.session.post(
+            self.url,
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Accept": "application/json",
+                "Content-Type": "application/json"
+            },
+            json={"query": document, "variables": variables or {}},
+            timeout=self.timeout
+        )
+
+    def execute(self, document, variables=None):
+        """POST one GraphQL document and return the decoded response body
+
+        As with REST requests, a managed token that LLDAP rejects is renewed
+        and the document sent once more.
+        """
+        token = str(self.token)
+        resp = self._post(token, document, variables)
+        if resp.status_code == 401 and isinstance(self.token, TokenManager):
+            self.token.invalidate(token)
+            resp = self._post(str(self.token), document, variables)
+        if resp.status_code != 200:
+            raise GraphQLError(f"GraphQL request failed with status {resp.status_code}: {resp.text[:200]}")
+        return resp.json()
+
+    def fetch_directory(self):
+        """Read all users, groups and memberships with one query.
+
+        Returns (users, groups) shaped like the REST list responses, with each
+        group carrying the usernames of its members.
+        """
+        body = self.execute(SNAPSHOT_QUERY)
+        if body.get("errors"):
+            raise GraphQLError(f"Snapshot query failed: {body['errors'][0].get('message')}")
+        data = body["data"]
+
+        groups = {}
+        for g in data["groups"]:
+            group = {"id": g["id"], "display_name": g["displayName"], "users": []}
+            for attribute in g.get("attributes") or []:
+                if attribute.get("name") in GROUP_ATTRIBUTES and attribute.get("value"):
+                    group[attribute["name"]] = attribute["value"][0]
+            groups[g["displayName"]] = group
+        users = []
+        for u in data["users"]:
+            users.append({
+                "username": u["id"],
+                "email": u.get("email"),
+                "display_name": u.get("displayName"),
+                "first_name": u.get("firstName"),
+                "last_name": u.get("lastName"),
+            })
+            for g in u.get("groups") or []:
+                group = groups.setdefault(
+                    g["displayName"], {"id": g["id"], "display_name": g["displayName"], "users": []})
+                group["users"].append(u["id"])
+        return users, list(groups.values())
+
+    def _arguments(self, op, group_id):
+        """Return the GraphQL argument values of a planned operation, in MUTATIONS order"""
+        if op.action == "create_user":
+            # op.data is the configured ldap_model.User
+            user = {"id": op.data.username}
+            user.update({gql: getattr(op.data, field) for field, gql in USER_INPUT_FIELDS.items()})
+            return [user]
+        if op.action == "update_user":
+            user = {"id": op.target}
+            user.update({USER_INPUT_FIELDS[field]: value for field, value in op.data.items()})
+            return [user]
+        if op.action == "create_group":
+            # op.data is the configured ldap_model.Group
+            request = {"displayName": op.target}
+            attributes = group_attribute_values(op.data)
+            if attributes:
+                request["attributes"] = attributes
+            return [request]
+        if op.action == "update_group":
+            group = {"id": self._require_group_id(group_id, op.target)}
+            changes = dict(op.data)
+            if "display_name" in changes:
+                group["displayName"] = changes.pop("display_name")
+            insert = [{"name": name, "value": [str(value)]} for name, value in changes.items() if value is not None]
+            remove = [name for name, value in changes.items() if value is None]
+            if insert:
+                group["insertAttributes"] = insert
+            if remove:
+                group["removeAttributes"] = remove
+            return [group]
+        if op.action in ("add_member", "remove_member"):
+            username, group_name = op.target
+            return [username, self._require_group_id(group_id, group_name)]
+        if op.action == "delete_user":
+            return [op.target]
+        if op.action == "delete_group":
+            return [self._require_group_id(group_id, op.target)]
+        raise GraphQLError(f"{op.action} is not supported over GraphQL")
+
+    @staticmethod
+    def _require_group_id(group_id, group_name):
+        value = group_id(group_name)
+        if value is None:
+            raise GraphQLError(f"Group {group_name} not found")
+        return value
+
+    def build_batch(self, operations, group_id):
+        """Pack operations into one aliased mutation document.
+
+        Operations that cannot be expressed (unknown group, unsupported action)
+        are returned as failures instead of being sent. Returns the document,
+        its variables, the alias -> operation map and the failures.
+        """
+        fields = []
+        definitions = []
+        variables = {}
+        aliases = {}
+        failures = []
+        for i, op in enumerate(operations):
+            try:
+                field, selection, params = MUTATIONS[op.action]
+                values = self._arguments(op, group_id)
+            except (KeyError, GraphQLError) as e:
+                message = str(e) if isinstance(e, GraphQLError) else f"{op.action} is not supported over GraphQL"
+                failures.append((op, False, message, None))
+                continue
+            alias = f"op{i}"
+            args = []
+            for (name, gql_type), value in zip(params, values):
+                var = f"{name}{i}"
+                definitions.append(f"${var}: {gql_type}")
+                variables[var] = value
+                args.append(f"{name}: ${var}")
+            fields.append(f"  {alias}: {field}({', '.join(args)}) {selection}")
+            aliases[alias] = op
+
+        if not fields:
+            return None, variables, aliases, failures
+        document = f"mutation Batch({', '.join(definitions)}) {{\n" + "\n".join(fields) + "\n}"
+        return document, variables, aliases, failures
+
+    def run_batch(self, operations, group_id):
+        """Execute operations as one document and return (op, ok, error, data) per operation.
+
+        group_id resolves a group display name to its numeric id.
+        """
+        document, variables, aliases, results = self.build_batch(operations, group_id)
+        if document is None:
+            return results
+
+        try:
+            body = self.execute(document, variables)
+        except Exception as e:
+            return results + [(op, False, str(e), None) for op in aliases.values()]
+
+        errors = {}
+        for error in body.get("errors") or []:
+            path = error.get("path") or []
+            alias = path[0] if path else None
+            errors.setdefault(alias, error.get("message", "unknown error"))
+
+        data = body.get("data")
+        for alias, op in aliases.items():
+            if alias in errors:
+                results.append((op, False, errors[alias], None))
+            elif data is None:
+                # A non-null field failed and nulled the whole response, so the
+                # outcome of the remaining fields is unknown
+                message = errors.get(None, "batch response had no data; re-run plan to see what was applied")
+                results.append((op, False, message, None))
+            else:
+                results.append((op, data.get(alias) is not None, None, data.get(alias)))
+        return results
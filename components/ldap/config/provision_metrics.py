@@ -0,0 +1,201 @@
+"""Prometheus metrics for LLDAP provisioning runs.
+
+A provisioning run records request latency per endpoint, operation latency,
+retries, failures and the duration of each phase (discovery, auth, snapshot,
+users/groups, memberships, prune). At the end of the run the metrics are
+rendered in the Prometheus text exposition format and either written to a
+node-exporter textfile collector or served on a short-lived HTTP port.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+PREFIX = "lldap_provision"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = f"{PREFIX}_{name}"
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1.0):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can be set or accumulated, keyed by label values"""
+    kind = "gauge"
+
+    def set(self, *labels, value):
+        with self.lock:
+            self.values[labels] = float(value)
+
+
+class Histogram(Counter):
+    """Cumulative-bucket histogram keyed by label values"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, *labels, value):
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, series in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, series["buckets"]):
+                le = [("le", _format_number(bound))]
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {count}")
+            plain = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{plain} {_format_number(series['sum'])}")
+            lines.append(f"{self.name}_count{plain} {series['count']}")
+        return lines
+
+
+class ProvisioningMetrics:
+    """All metrics recorded during one provisioning run"""
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            "request_duration_seconds", "LLDAP API request latency by endpoint",
+            ("method", "endpoint", "status"))
+        self.operation_duration = Histogram(
+            "operation_duration_seconds", "Provisioning operation latency including retries",
+            ("operation",))
+        self.operations = Counter(
+            "operations_total", "Provisioning operations by result", ("operation", "result"))
+        self.retries = Counter(
+            "retries_total", "Requests retried after a transient failure", ("method", "endpoint"))
+        self.failures = Counter(
+            "request_failures_total", "Requests answered with a 5xx or 429 status",
+            ("method", "endpoint"))
+        self.phase_duration = Gauge(
+            "phase_duration_seconds", "Wall time spent in each provisioning phase", ("phase",))
+        self.last_run = Gauge(
+            "last_run_timestamp_seconds", "Unix time the provisioning run finished")
+        self.last_success = Gauge(
+            "last_run_success", "1 if the last provisioning run succeeded, 0 otherwise")
+        self.run_duration = Gauge(
+            "run_duration_seconds", "Total wall time of the provisioning run")
+        self.started = time.monotonic()
+
+    def all(self):
+        return [self.request_duration, self.operation_duration, self.operations, self.retries,
+                self.failures, self.phase_duration, self.run_duration, self.last_run, self.last_success]
+
+    @contextmanager
+    def phase(self, name):
+        """Add the wall time of the with-block to the named phase"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phase_duration.inc(name, amount=time.monotonic() - started)
+
+    def observe_response(self, response, *args, **kwargs):
+        """requests response hook recording per-endpoint latency"""
+        method = response.request.method
+        endpoint = urlsplit(response.url).path or "/"
+        self.request_duration.observe(
+            method, endpoint, str(response.status_code), value=response.elapsed.total_seconds())
+        if response.status_code >= 500 or response.status_code == 429:
+            self.failures.inc(method, endpoint)
+
+    def observe_retry(self, method, url, exc):
+        """ResilientSession retry listener"""
+        self.retries.inc(method.upper(), urlsplit(url).path or "/")
+
+    def observe_operation(self, operation, seconds, ok):
+        self.operation_duration.observe(operation, value=seconds)
+        self.operations.inc(operation, "success" if ok else "failure")
+
+    def finish(self, ok):
+        self.run_duration.set(value=time.monotonic() - self.started)
+        self.last_run.set(value=time.time())
+        self.last_success.set(value=1 if ok else 0)
+
+    def render(self):
+        lines = []
+        for metric in self.all():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically write the metrics for node-exporter's textfile collector"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, linger):
+        """Serve /metrics on port for linger seconds so Prometheus can scrape the run"""
+        body = self.render().encode("utf-8")
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("", port), Handler)
+        server.timeout = 1
+        deadline = time.monotonic() + linger
+        try:
+            while time.monotonic() < deadline:
+                server.handle_request()
+        finally:
+            server.server_close()
+
+
+# Metrics for the current run, shared by every module that records them
+metrics = ProvisioningMetrics()
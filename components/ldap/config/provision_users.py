@@ -1,10 +1,29 @@
 import sys
-import yaml
 import json
-import requests
+import argparse
+import cProfile
+import threading
 import traceback
 import subprocess
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+
+# resilience.py is shared with the Release.com client in deploy/release/api; the
+# helper container mounts it on PYTHONPATH, a checkout finds it relative to here
+RELEASE_API_DIR = Path(__file__).resolve().parent / ".." / ".." / ".." / "deploy" / "release" / "api"
+if RELEASE_API_DIR.is_dir():
+    sys.path.append(str(RELEASE_API_DIR.resolve()))
+
+from bootstrap_loader import load_directory
+from config_watch import DEFAULT_DEBOUNCE, ConfigWatcher
+from ldap_model import DEFAULT_CACHE_DIR
+from lldap_auth import TOKEN_CACHE_PATH, TokenManager
+from lldap_graphql import DEFAULT_BATCH_SIZE, GraphQLTransport
+from provision_metrics import metrics
+from resilience import ResilientSession
 
 # Define global variables for LLDAP connection
 import os
@@ -30,18 +49,79 @@ POSSIBLE_LLDAP_URLS = [
     "http://host.docker.internal:3892" # Host machine from container
 ]
 
+# Endpoint discovery results are cached so later runs try the last good URL first
+ENDPOINT_CACHE_PATH = os.environ.get(
+    "LLDAP_ENDPOINT_CACHE",
+    str(Path.home() / ".cache" / "redstone" / "lldap-endpoint.json")
+)
+ENDPOINT_CACHE_TTL = int(os.environ.get("LLDAP_ENDPOINT_CACHE_TTL", "3600"))
+
+def parse_host_port(url):
+    host = url.split('://')[1].split(':')[0]
+    port = int(url.split(':')[-1])
+    return host, port
+
+def probe_latency(url, timeout=1):
+    """Return the seconds taken to open a TCP connection to url, or None if it is not accessible"""
+    host, port = parse_host_port(url)
+    started = time.monotonic()
+    if is_port_open(host, port, timeout):
+        return time.monotonic() - started
+    return None
+
+def probe_endpoints(urls=None, timeout=1):
+    """Probe all candidate URLs at once, yielding (url, latency) in the order they answer"""
+    urls = urls or POSSIBLE_LLDAP_URLS
+    pool = ThreadPoolExecutor(max_workers=len(urls))
+    futures = {pool.submit(probe_latency, url, timeout): url for url in urls}
+    try:
+        for future in as_completed(futures):
+            url = futures[future]
+            latency = future.result()
+            if latency is None:
+                print(f"  ❌ {url} is not accessible")
+                continue
+            print(f"  ✅ {url} is accessible ({latency * 1000:.0f}ms)")
+            yield url, latency
+    finally:
+        # Don't wait on slower probes once a caller has what it needs
+        pool.shutdown(wait=False, cancel_futures=True)
+
 # Try to detect the best URL based on connectivity
 def detect_best_url():
     print("\n🔍 Auto-detecting best LLDAP connection method...")
-    for url in POSSIBLE_LLDAP_URLS:
-        host = url.split('://')[1].split(':')[0]
-        port = int(url.split(':')[-1])
-        print(f"  Testing {host}:{port}...")
-        if is_port_open(host, port):
-            print(f"  ✅ {url} is accessible")
-            return url
-        print(f"  ❌ {url} is not accessible")
+    for url, _ in probe_endpoints():
+        return url
     return None
+
+def load_cached_endpoint():
+    """Return the cached endpoint record if it exists and is within its TTL"""
+    try:
+        with open(ENDPOINT_CACHE_PATH) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - cached.get("checked_at", 0) > ENDPOINT_CACHE_TTL:
+        return None
+    return cached if cached.get("url") else None
+
+def save_cached_endpoint(url, latency):
+    try:
+        os.makedirs(os.path.dirname(ENDPOINT_CACHE_PATH), exist_ok=True)
+        with open(ENDPOINT_CACHE_PATH, "w") as f:
+            json.dump({
+                "url": url,
+                "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+                "checked_at": time.time(),
+            }, f)
+    except OSError as e:
+        print(f"⚠️ Could not write endpoint cache {ENDPOINT_CACHE_PATH}: {str(e)}")
+
+def forget_cached_endpoint():
+    try:
+        os.remove(ENDPOINT_CACHE_PATH)
+    except OSError:
+        pass
     
 ADMIN_USER = "admin"
 ADMIN_PASSWORD = os.environ.get("LDAP_ADMIN_PASSWORD", "adminadmin")
@@ -54,218 +134,855 @@ ADMIN_PASSWORD = os.environ.get("LDAP_ADMIN_PASSWORD", ADMIN_PASSWORD)
 # Global variable to store the working LLDAP URL once discovered
 working_lldap_url = None
 
+DEFAULT_CONFIG_PATH = "/config/ldap.yaml"
+DEFAULT_RESYNC_INTERVAL = 3600
+# Seconds before a full resync after a watch cycle had failures
+WATCH_RETRY_DELAY = 30
+
+# Number of API calls allowed in flight at once
+DEFAULT_CONCURRENCY = int(os.environ.get("LLDAP_CONCURRENCY", "8"))
+
+# Shared session so every call reuses pooled keep-alive connections. It also
+# applies default timeouts, retries transient failures with jittered backoff,
+# adapts concurrency to LLDAP's latency and fails fast when LLDAP is down.
+http_session = ResilientSession(max_concurrency=DEFAULT_CONCURRENCY)
+http_session.hooks["response"].append(metrics.observe_response)
+http_session.retry_listeners.append(metrics.observe_retry)
+
+def configure_session(pool_size):
+    """Size the shared session's connection pool for pool_size concurrent workers"""
+    http_session.max_concurrency = pool_size
+    adapter = HTTPAdapter(pool_connections=len(POSSIBLE_LLDAP_URLS), pool_maxsize=pool_size)
+    http_session.mount("http://", adapter)
+    http_session.mount("https://", adapter)
+
+def login(url):
+    """Return a token manager for url holding a cached, refreshed or new JWT, or None if that fails"""
+    with metrics.phase("auth"):
+        token = TokenManager(http_session, url, ADMIN_USER, ADMIN_PASSWORD, TOKEN_CACHE_PATH)
+        return token if token.ensure() else None
+
 def get_jwt_token():
-    """Get JWT token for API authentication by trying multiple possible URLs"""
+    """Get the JWT token manager for API authentication, trying the cached endpoint before probing
+
+    The manager renews the JWT before it expires and can be passed wherever
+    a token string is expected, so workers always send a current token.
+    """
     global working_lldap_url
     
-    # First try the auto-detected URL if possible
-    best_url = detect_best_url()
-    if best_url:
-        print(f"\n🔑 Attempting to authenticate using auto-detected URL: {best_url}")
-        try:
-            # LLDAP auth endpoint is at /auth/simple/login
-            resp = requests.post(
-                f"{best_url}/auth/simple/login",
-                json={"username": ADMIN_USER, "password": ADMIN_PASSWORD},
-                headers={"Content-Type": "application/json"},  # Explicitly set content type
-                timeout=5  # Add timeout to avoid hanging
-            )
-            
-            if resp.status_code == 200:
-                print(f"✅ Successfully authenticated to LLDAP at {best_url}")
-                working_lldap_url = best_url
-                return resp.json()["token"]
-        except Exception as e:
-            print(f"❌ Authentication failed with auto-detected URL: {str(e)}")
+    # A recently successful endpoint skips discovery entirely
+    cached = load_cached_endpoint()
+    if cached:
+        url = cached["url"]
+        print(f"\n⚡ Trying cached LLDAP endpoint {url} ({cached.get('latency_ms')}ms when last checked)")
+        with metrics.phase("discovery"):
+            reachable = probe_latency(url) is not None
+        if reachable:
+            token = login(url)
+            if token:
+                print(f"✅ Successfully authenticated to LLDAP at {url}")
+                working_lldap_url = url
+                return token
+        print("⚠️ Cached endpoint is no longer usable, rediscovering...")
+        forget_cached_endpoint()
     
-    # Fall back to trying each possible URL if auto-detection fails
-    print("\n🔄 Falling back to trying all possible LLDAP URLs...")
-    for url in POSSIBLE_LLDAP_URLS:
-        print(f"  Attempting to connect to LLDAP at {url}...")
-        try:
-            resp = requests.post(
-                f"{url}/auth/simple/login",
-                json={"username": ADMIN_USER, "password": ADMIN_PASSWORD},
-                headers={"Content-Type": "application/json"},  # Explicitly set content type
-                timeout=5  # Add timeout to avoid hanging
-            )
-            
-            if resp.status_code == 200:
-                print(f"✓ Successfully connected to LLDAP at {url}")
-                working_lldap_url = url  # Store the working URL for other functions
-                try:
-                    # Make sure we can actually parse the response as JSON
-                    token = resp.json()["token"]
-                    print(f"✓ Successfully obtained authentication token")
-                    return token
-                except Exception as json_err:
-                    print(f"⚠️ Received status 200 but invalid JSON: {str(json_err)}")
-                    continue
-            else:
-                print(f"✗ Failed with status {resp.status_code}: {resp.text[:100]}")
-        except Exception as e:
-            print(f"✗ Connection error with {url}: {str(e)}")
+    # Probe every candidate at once and authenticate against them as they answer
+    print("\n🔍 Auto-detecting best LLDAP connection method...")
+    probes = probe_endpoints()
+    while True:
+        with metrics.phase("discovery"):
+            probed = next(probes, None)
+        if probed is None:
+            break
+        url, latency = probed
+        print(f"\n🔑 Attempting to authenticate using {url}")
+        token = login(url)
+        if token:
+            print(f"✅ Successfully authenticated to LLDAP at {url}")
+            working_lldap_url = url  # Store the working URL for other functions
+            save_cached_endpoint(url, latency)
+            return token
     
     # If we get here, all connection attempts failed
     print("❌ All LLDAP connection attempts failed")
     sys.exit(1)
 
-def create_user(token, user_data):
+def api_headers(token):
+    """Standard headers for authenticated LLDAP API calls"""
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/json",
+        "Content-Type": "application/json"
+    }
+
+def api_request(method, token, path, **kwargs):
+    """Send an authenticated request to an LLDAP API path
+
+    If LLDAP rejects a managed token (e.g. it was revoked or LLDAP restarted
+    with a new secret), the token is renewed and the request sent once more.
+    """
+    headers = api_headers(token)
+    resp = http_session.request(method, f"{working_lldap_url}{path}", headers=headers, **kwargs)
+    if resp.status_code == 401 and isinstance(token, TokenManager):
+        token.invalidate(headers["Authorization"][len("Bearer "):])
+        resp = http_session.request(method, f"{working_lldap_url}{path}", headers=api_headers(token), **kwargs)
+    return resp
+
+def api_post(token, path, payload):
+    """POST a JSON payload to an LLDAP API path"""
+    return api_request("POST", token, path, json=payload)
+
+class DirectorySnapshot:
+    """In-memory view of the LLDAP users, groups and memberships.
+
+    The directory is listed once per run; every existence check and group id
+    lookup is answered from the snapshot, which is updated in place after
+    each successful create so it never has to be refetched.
+    """
+
+    def __init__(self, users, groups):
+        self.users = {u["username"]: u for u in users if u.get("username")}
+        self.groups = {}
+        self.memberships = set()
+        for group in groups:
+            self._index_group(group)
+        # Set when a created group's id was not returned by the API
+        self.group_ids_stale = False
+        self._refresh_lock = threading.Lock()
+
+    def _index_group(self, group):
+        name = group.get("display_name")
+        if not name:
+            return
+        self.groups[name] = group
+        for member in group.get("users") or []:
+            username = (member.get("username") or member.get("id")) if isinstance(member, dict) else member
+            if username:
+                self.memberships.add((name, username))
+
+    @classmethod
+    def fetch(cls, token, transport=None):
+        """List all users and groups with one request each, or one GraphQL query"""
+        print("\n📸 Fetching directory snapshot...")
+        if transport is not None:
+            users, groups = transport.fetch_directory()
+        else:
+            users = cls._list(token, "user", "users")
+            groups = cls._list(token, "group", "groups")
+        snapshot = cls(users, groups)
+        print(f"✓ Snapshot has {len(snapshot.users)} users and {len(snapshot.groups)} groups")
+        return snapshot
+
+    @staticmethod
+    def _list(token, kind, key):
+        resp = api_request("GET", token, f"/api/{kind}/list", timeout=30)
+        if not resp.text.strip():
+            raise json.JSONDecodeError(f"Empty response from /api/{kind}/list", resp.text, 0)
+        if resp.status_code != 200:
+            if 'token' in resp.text.lower() or 'unauthorized' in resp.text.lower():
+                print("The response suggests an authentication issue. Token may be invalid.")
+            raise RuntimeError(f"Listing {key} failed with status {resp.status_code}: {resp.text[:100]}")
+        return resp.json().get(key, [])
+
+    def refresh_groups(self, token):
+        """Reload the group list, used only when created groups came back without ids"""
+        self.groups = {}
+        self.memberships = set()
+        for group in self._list(token, "group", "groups"):
+            self._index_group(group)
+        self.group_ids_stale = False
+
+    def has_user(self, username):
+        return username in self.users
+
+    def add_user(self, user):
+        self.users[user["username"]] = user
+
+    def has_group(self, group_name):
+        return group_name in self.groups
+
+    def add_group(self, group):
+        if group.get("id") is None:
+            self.group_ids_stale = True
+        self.groups[group["display_name"]] = group
+
+    def group_id(self, token, group_name):
+        group = self.groups.get(group_name)
+        if group is not None and group.get("id") is None:
+            # Concurrent workers share a single reload
+            with self._refresh_lock:
+                if self.group_ids_stale:
+                    self.refresh_groups(token)
+            group = self.groups.get(group_name)
+        return group.get("id") if group else None
+
+    def has_member(self, group_name, username):
+        return (group_name, username) in self.memberships
+
+    def add_member(self, group_name, username):
+        self.memberships.add((group_name, username))
+
+    def update_user(self, username, changes):
+        self.users[username].update(changes)
+
+    def update_group(self, group_name, changes):
+        self.groups[group_name].update(changes)
+
+    def remove_member(self, group_name, username):
+        self.memberships.discard((group_name, username))
+
+    def remove_user(self, username):
+        self.users.pop(username, None)
+        self.memberships = {m for m in self.memberships if m[1] != username}
+
+    def remove_group(self, group_name):
+        self.groups.pop(group_name, None)
+        self.memberships = {m for m in self.memberships if m[0] != group_name}
+
+def user_payload(user):
+    """Build the LLDAP user create payload from a configured user"""
+    return {
+        "username": user.username,
+        "email": user.email,
+        "display_name": user.display_name,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "password": user.password or "password123",
+    }
+
+def group_payload(group):
+    """Build the LLDAP group create payload from a configured group"""
+    # LLDAP identifies groups by display name, so it carries the configured name
+    return {
+        "display_name": group.name,
+        "description": group.description,
+    }
+
+def create_user(token, user, snapshot):
     """Create a user via the LLDAP API"""
-    username = user_data["username"]
+    username = user.username
     
-    # Check if user exists first
-    print(f"\n🔍 Checking if user {username} exists...")
-    try:
-        # Use the correct LLDAP API path for users
-        resp = requests.get(
-            f"{working_lldap_url}/api/user/list",
-            headers={
-                "Authorization": f"Bearer {token}", 
-                "Accept": "application/json",
-                "Content-Type": "application/json"
-            },
-            timeout=5
-        )
-        print(f"Response status: {resp.status_code}")
-        print(f"Response headers: {resp.headers}")
-        print(f"Response content: {resp.text[:100]}...") # Print first 100 chars
-        
-        # Check if response is empty
-        if not resp.text.strip():
-            print("\n⚠️ Empty response received from API")
-            return False
-            
-        users = resp.json().get("users", [])
-        if any(u.get("username") == username for u in users):
-            print(f"User {username} already exists, skipping")
-            return True
-    except json.JSONDecodeError as e:
-        print(f"\n⚠️ JSON parsing error: {str(e)}")
-        print(f"Raw response: '{resp.text}'")
-        if 'token' in resp.text.lower() or 'unauthorized' in resp.text.lower():
-            print("The response suggests an authentication issue. Token may be invalid.")
-        return False
+    if snapshot.has_user(username):
+        print(f"User {username} already exists, skipping")
+        return True
     
-    # Prepare user create payload
-    create_data = {
-        "username": username,
-        "email": user_data.get("email", f"{username}@example.com"),
-        "display_name": user_data.get("display_name", username),
-        "first_name": user_data.get("first_name", ""),
-        "last_name": user_data.get("last_name", ""),
-        "password": user_data.get("password", "password123"),
-    }
+    create_data = user_payload(user)
     
     # Create user with correct API endpoint
-    resp = requests.post(
-        f"{working_lldap_url}/api/user/create",
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        },
-        json=create_data
-    )
+    resp = api_post(token, "/api/user/create", create_data)
     
     if resp.status_code in [200, 201]:
         print(f"✓ Created user: {username}")
+        snapshot.add_user({k: v for k, v in create_data.items() if k != "password"})
         return True
     else:
         print(f"✗ Failed to create user {username}: {resp.text}")
         return False
 
-def create_group(token, group_data):
+def create_group(token, group, snapshot):
     """Create a group via the LLDAP API"""
-    group_name = group_data["name"]
+    group_name = group.name
     
-    # Check if group exists first using correct API endpoint
-    resp = requests.get(
-        f"{working_lldap_url}/api/group/list",
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-    )
-    groups = resp.json().get("groups", [])
-    if any(g.get("display_name") == group_name for g in groups):
+    if snapshot.has_group(group_name):
         print(f"Group {group_name} already exists, skipping")
         return True
     
     # Create group with correct API endpoint
-    resp = requests.post(
-        f"{working_lldap_url}/api/group/create",
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        },
-        json={
-            "display_name": group_name,
-            "description": group_data.get("description", f"Group for {group_name}"),
-        }
-    )
+    resp = api_post(token, "/api/group/create", group_payload(group))
     
     if resp.status_code in [200, 201]:
         print(f"✓ Created group: {group_name}")
+        try:
+            group_id = resp.json().get("id")
+        except ValueError:
+            group_id = None
+        snapshot.add_group({"id": group_id, **group_payload(group)})
         return True
     else:
         print(f"✗ Failed to create group {group_name}: {resp.text}")
         return False
 
-def add_user_to_group(token, username, group_name):
+def add_user_to_group(token, username, group_name, snapshot):
     """Add a user to a group"""
-    # Find group ID first with correct API endpoint
-    resp = requests.get(
-        f"{working_lldap_url}/api/group/list",
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-    )
-    groups = resp.json().get("groups", [])
-    matching_groups = [g for g in groups if g.get("display_name") == group_name]
+    if snapshot.has_member(group_name, username):
+        print(f"User {username} is already in group {group_name}, skipping")
+        return True
     
-    if not matching_groups:
+    group_id = snapshot.group_id(token, group_name)
+    if group_id is None:
         print(f"⚠️ Group {group_name} not found, skipping")
         return False
     
-    group_id = matching_groups[0]["id"]
-    
     # Add user to group with correct API endpoint
-    resp = requests.post(
-        f"{working_lldap_url}/api/group/add_member",
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        },
-        json={
-            "group_id": group_id,
-            "username": username
-        }
-    )
+    resp = api_post(token, "/api/group/add_member", {"group_id": group_id, "username": username})
     
     if resp.status_code in [200, 201, 204]:
         print(f"✓ Added user {username} to group {group_name}")
+        snapshot.add_member(group_name, username)
         return True
     else:
         print(f"✗ Failed to add user {username} to group {group_name}: {resp.text}")
         return False
 
-def main():
+def update_user(token, username, changes, snapshot):
+    """Update changed attributes of an existing user"""
+    resp = api_post(token, "/api/user/update", {"username": username, **changes})
+    if resp.status_code in [200, 201, 204]:
+        print(f"✓ Updated user {username}: {', '.join(changes)}")
+        snapshot.update_user(username, changes)
+        return True
+    print(f"✗ Failed to update user {username}: {resp.text}")
+    return False
+
+def update_group(token, group_name, changes, snapshot):
+    """Update changed attributes of an existing group"""
+    group_id = snapshot.group_id(token, group_name)
+    if group_id is None:
+        print(f"⚠️ Group {group_name} not found, skipping")
+        return False
+    resp = api_post(token, "/api/group/update", {"group_id": group_id, **changes})
+    if resp.status_code in [200, 201, 204]:
+        print(f"✓ Updated group {group_name}: {', '.join(changes)}")
+        snapshot.update_group(group_name, changes)
+        return True
+    print(f"✗ Failed to update group {group_name}: {resp.text}")
+    return False
+
+def remove_user_from_group(token, username, group_name, snapshot):
+    """Remove a user from a group"""
+    group_id = snapshot.group_id(token, group_name)
+    if group_id is None:
+        print(f"⚠️ Group {group_name} not found, skipping")
+        return False
+    resp = api_post(token, "/api/group/remove_member", {"group_id": group_id, "username": username})
+    if resp.status_code in [200, 201, 204]:
+        print(f"✓ Removed user {username} from group {group_name}")
+        snapshot.remove_member(group_name, username)
+        return True
+    print(f"✗ Failed to remove user {username} from group {group_name}: {resp.text}")
+    return False
+
+def delete_user(token, username, snapshot):
+    """Delete a user that is no longer in the configuration"""
+    resp = api_post(token, "/api/user/delete", {"username": username})
+    if resp.status_code in [200, 201, 204]:
+        print(f"✓ Deleted user {username}")
+        snapshot.remove_user(username)
+        return True
+    print(f"✗ Failed to delete user {username}: {resp.text}")
+    return False
+
+def delete_group(token, group_name, snapshot):
+    """Delete a group that is no longer in the configuration"""
+    group_id = snapshot.group_id(token, group_name)
+    if group_id is None:
+        print(f"⚠️ Group {group_name} not found, skipping")
+        return False
+    resp = api_post(token, "/api/group/delete", {"group_id": group_id})
+    if resp.status_code in [200, 201, 204]:
+        print(f"✓ Deleted group {group_name}")
+        snapshot.remove_group(group_name)
+        return True
+    print(f"✗ Failed to delete group {group_name}: {resp.text}")
+    return False
+
+# Attributes compared when planning user and group updates
+USER_FIELDS = ("email", "display_name", "first_name", "last_name")
+GROUP_FIELDS = ("description",)
+
+# LLDAP's own admin account and built-in groups are never pruned
+PROTECTED_USERS = {ADMIN_USER}
+PROTECTED_GROUPS = {"lldap_admin", "lldap_password_manager", "lldap_strict_readonly"}
+
+Operation = namedtuple("Operation", ["action", "target", "data"])
+
+# Plan actions in execution order: (action, phase, function)
+PLAN_ACTIONS = [
+    ("create_user", "user", create_user),
+    ("update_user", "user", update_user),
+    ("create_group", "group", create_group),
+    ("update_group", "group", update_group),
+    ("add_member", "membership", add_user_to_group),
+    ("remove_member", "membership", remove_user_from_group),
+    ("delete_group", "prune", delete_group),
+    ("delete_user", "prune", delete_user),
+]
+ACTION_ORDER = {action: i for i, (action, _, _) in enumerate(PLAN_ACTIONS)}
+ACTION_PHASES = {action: phase for action, phase, _ in PLAN_ACTIONS}
+
+# (metrics phase, operation phases that may run together); each stage waits for the one before it
+APPLY_STAGES = (
+    ("users_groups", ("user", "group")),
+    ("memberships", ("membership",)),
+    ("prune", ("prune",)),
+)
+
+# Actions the create-only provision command performs
+PROVISION_ACTIONS = ("create_user", "create_group", "add_member")
+
+def desired_state(model):
+    """Return the configured users, groups and (group, username) memberships.
+
+    The compiled model already merges service_users with users and
+    groups[].members with each user's groups list.
+    """
+    return model.users, model.groups, model.memberships
+
+def undefined_membership(group_name, username, users, groups, snapshot):
+    """Return why a membership cannot be added, or None when its group and user exist"""
+    if group_name not in groups and not snapshot.has_group(group_name):
+        return "group is not defined"
+    if username not in users and not snapshot.has_user(username):
+        return "user is not defined"
+    return None
+
+def addable_memberships(users, groups, memberships, snapshot):
+    """Return the sorted memberships that can be added, warning about and skipping the rest"""
+    addable = []
+    for group_name, username in sorted(memberships):
+        reason = undefined_membership(group_name, username, users, groups, snapshot)
+        if reason:
+            print(f"⚠️ Skipping membership {username} in {group_name}: {reason}")
+            continue
+        addable.append((group_name, username))
+    return addable
+
+def changed_fields(desired, live, fields):
+    """Return {field: desired value} for fields the live record reports differently"""
+    return {
+        field: desired[field]
+        for field in fields
+        if field in live and live[field] != desired[field]
+    }
+
+def model_delta(old, new):
+    """Return the usernames, group names and memberships that differ between two models"""
+    def changed(before, after):
+        return {
+            name for name in before.keys() | after.keys()
+            if name not in before or name not in after or before[name].as_dict() != after[name].as_dict()
+        }
+    return changed(old.users, new.users), changed(old.groups, new.groups), old.memberships ^ new.memberships
+
+def plan_changes(model, snapshot, prune=False, scope=None):
+    """Diff the configuration against the snapshot into an ordered list of operations.
+
+    Memberships of configured groups that are not in the configuration are
+    removed. With prune, users and groups missing from the configuration are
+    deleted as well, except LLDAP's protected admin account and groups.
+
+    scope optionally limits the plan to the (usernames, group names,
+    memberships) returned by model_delta, so a small edit is planned without
+    walking the whole directory.
+    """
+    users, groups, memberships = desired_state(model)
+    if scope is None:
+        user_names, group_names = list(users), list(groups)
+        added = memberships - snapshot.memberships
+        removed = snapshot.memberships - memberships
+        stale_users, stale_groups = list(snapshot.users), list(snapshot.groups)
+    else:
+        user_names, group_names, changed_memberships = scope
+        added = {m for m in changed_memberships if m in memberships and m not in snapshot.memberships}
+        removed = {m for m in changed_memberships if m not in memberships and m in snapshot.memberships}
+        stale_users = sorted(u for u in user_names if u in snapshot.users)
+        stale_groups = sorted(g for g in group_names if g in snapshot.groups)
+    operations = []
+
+    for username in user_names:
+        user = users.get(username)
+        if user is None:
+            continue
+        live = snapshot.users.get(username)
+        if live is None:
+            operations.append(Operation("create_user", username, user))
+            continue
+        changes = changed_fields(user_payload(user), live, USER_FIELDS)
+        if changes:
+            operations.append(Operation("update_user", username, changes))
+
+    for group_name in group_names:
+        group = groups.get(group_name)
+        if group is None:
+            continue
+        live = snapshot.groups.get(group_name)
+        if live is None:
+            operations.append(Operation("create_group", group_name, group))
+            continue
+        changes = changed_fields(group_payload(group), live, GROUP_FIELDS)
+        if changes:
+            operations.append(Operation("update_group", group_name, changes))
+
+    for group_name, username in addable_memberships(users, groups, added, snapshot):
+        operations.append(Operation("add_member", (username, group_name), None))
+    for group_name, username in sorted(removed):
+        if group_name in groups:
+            operations.append(Operation("remove_member", (username, group_name), None))
+
+    if prune:
+        for group_name in stale_groups:
+            if group_name not in groups and group_name not in PROTECTED_GROUPS:
+                operations.append(Operation("delete_group", group_name, None))
+        for username in stale_users:
+            if username not in users and username not in PROTECTED_USERS:
+                operations.append(Operation("delete_user", username, None))
+
+    operations.sort(key=lambda op: ACTION_ORDER[op.action])
+    return operations
+
+def describe_operation(op, snapshot):
+    """Render one planned operation as a single line"""
+    if op.action == "create_user":
+        return f"+ user {op.target}"
+    if op.action == "create_group":
+        return f"+ group {op.target}"
+    if op.action in ("update_user", "update_group"):
+        kind = op.action.split("_")[1]
+        live = snapshot.users[op.target] if kind == "user" else snapshot.groups[op.target]
+        changes = ", ".join(f"{k}: {live.get(k)!r} -> {v!r}" for k, v in op.data.items())
+        return f"~ {kind} {op.target} ({changes})"
+    if op.action == "add_member":
+        return f"+ member {op.target[0]} in {op.target[1]}"
+    if op.action == "remove_member":
+        return f"- member {op.target[0]} in {op.target[1]}"
+    return f"- {op.action.split('_')[1]} {op.target}"
+
+def operation_label(op):
+    target = " -> ".join(op.target) if isinstance(op.target, tuple) else op.target
+    return f"{op.action} {target}"
+
+def record_success(snapshot, op, data):
+    """Mirror a batched operation that succeeded into the snapshot"""
+    if op.action == "create_user":
+        snapshot.add_user({k: v for k, v in user_payload(op.data).items() if k != "password"})
+    elif op.action == "update_user":
+        snapshot.update_user(op.target, op.data)
+    elif op.action == "create_group":
+        snapshot.add_group({"id": (data or {}).get("id"), **group_payload(op.data)})
+    elif op.action == "add_member":
+        snapshot.add_member(op.target[1], op.target[0])
+    elif op.action == "remove_member":
+        snapshot.remove_member(op.target[1], op.target[0])
+    elif op.action == "delete_user":
+        snapshot.remove_user(op.target)
+    elif op.action == "delete_group":
+        snapshot.remove_group(op.target)
+
+def print_plan(operations, snapshot):
+    counts = {}
+    for op in operations:
+        counts[op.action] = counts.get(op.action, 0) + 1
+    if not operations:
+        print("\n✅ No changes. LLDAP matches the configuration.")
+        return
+    print(f"\n📋 Plan: {len(operations)} operations")
+    for action, _, _ in PLAN_ACTIONS:
+        if counts.get(action):
+            print(f"  {action}: {counts[action]}")
+    print()
+    for op in operations:
+        print(f"  {describe_operation(op, snapshot)}")
+
+def save_plan(operations, path):
+    def plan_data(data):
+        if not data:
+            return None
+        if hasattr(data, "as_dict"):
+            data = data.as_dict()
+        # Never write passwords into plan files
+        return {k: v for k, v in data.items() if k != "password"}
+
+    with open(path, "w") as f:
+        json.dump([
+            {"action": op.action, "target": op.target, "data": plan_data(op.data)}
+            for op in operations
+        ], f, indent=2)
+
+OperationResult = namedtuple("OperationResult", ["phase", "item", "ok", "error"])
+
+class ProvisioningEngine:
+    """Run provisioning operations on a bounded thread pool.
+
+    Users and groups do not depend on each other and are created in one
+    phase; memberships run in a second phase once both exist. Every
+    operation's outcome is collected for the final summary.
+    """
+
+    def __init__(self, token, snapshot, concurrency=DEFAULT_CONCURRENCY):
+        self.token = token
+        self.snapshot = snapshot
+        self.concurrency = max(1, concurrency)
+        self.results = []
+
+    def _run(self, phase, item, func, args):
+        started = time.monotonic()
+        try:
+            ok = bool(func(self.token, *args, self.snapshot))
+            error = None
+        except Exception as e:
+            print(f"✗ {phase} {item} failed: {str(e)}")
+            ok, error = False, str(e)
+        metrics.observe_operation(func.__name__, time.monotonic() - started, ok)
+        return OperationResult(phase, item, ok, error)
+
+    def run_phase(self, jobs):
+        """Run (phase, item, func, args) jobs concurrently and record their results"""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self._run, *job) for job in jobs]
+            results = [future.result() for future in futures]
+        self.results.extend(results)
+        return results
+
+    def provision(self, users, groups, memberships):
+        """Create users and groups, then memberships given as (group, username) pairs"""
+        print(f"\n👤 Creating {len(users)} users and {len(groups)} groups (concurrency {self.concurrency})...")
+        with metrics.phase("users_groups"):
+            self.run_phase(
+                [("user", u.username, create_user, (u,)) for u in users]
+                + [("group", g.name, create_group, (g,)) for g in groups]
+            )
+
+        print(f"\n🔗 Adding {len(memberships)} group memberships...")
+        with metrics.phase("memberships"):
+            self.run_phase([
+                ("membership", f"{username} -> {group_name}", add_user_to_group, (username, group_name))
+                for group_name, username in memberships
+            ])
+        return self.results
+
+    def apply(self, operations):
+        """Run planned operations; users and groups, then memberships, then deletions"""
+        functions = {action: (phase, func) for action, phase, func in PLAN_ACTIONS}
+        for stage_name, stage in APPLY_STAGES:
+            jobs = []
+            for op in operations:
+                phase, func = functions[op.action]
+                if phase not in stage:
+                    continue
+                if op.action in ("add_member", "remove_member"):
+                    args = op.target
+                elif op.action in ("create_user", "create_group", "delete_user", "delete_group"):
+                    args = (op.data,) if op.data is not None else (op.target,)
+                else:
+                    args = (op.target, op.data)
+                jobs.append((phase, operation_label(op), func, args))
+            if jobs:
+                print(f"\n⚙️ Applying {len(jobs)} {'/'.join(stage)} operations (concurrency {self.concurrency})...")
+                with metrics.phase(stage_name):
+                    self.run_phase(jobs)
+        return self.results
+
+    def apply_batched(self, operations, transport):
+        """Run planned operations as batched GraphQL documents, stage by stage.
+
+        Batches within a stage are sent concurrently, bounded by the engine's
+        concurrency, and each operation's result is recorded individually.
+        """
+        def group_id(group_name):
+            return self.snapshot.group_id(self.token, group_name)
+
+        def run_batch(batch):
+            started = time.monotonic()
+            results = transport.run_batch(batch, group_id)
+            metrics.observe_operation("graphql_batch", time.monotonic() - started, all(r[1] for r in results))
+            return results
+
+        for stage_name, stage in APPLY_STAGES:
+            ops = [op for op in operations if ACTION_PHASES[op.action] in stage]
+            if not ops:
+                continue
+            size = transport.batch_size
+            batches = [ops[i:i + size] for i in range(0, len(ops), size)]
+            print(f"\n⚙️ Applying {len(ops)} {'/'.join(stage)} operations in {len(batches)} GraphQL batches...")
+            with metrics.phase(stage_name), ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                for batch in pool.map(run_batch, batches):
+                    for op, ok, error, data in batch:
+                        metrics.operations.inc(op.action, "success" if ok else "failure")
+                        if ok:
+                            record_success(self.snapshot, op, data)
+                        else:
+                            print(f"✗ {operation_label(op)}" + (f": {error}" if error else ""))
+                        self.results.append(OperationResult(ACTION_PHASES[op.action], operation_label(op), ok, error))
+            succeeded = sum(1 for r in self.results[-len(ops):] if r.ok)
+            print(f"✓ {succeeded}/{len(ops)} operations succeeded")
+        return self.results
+
+    def failures(self):
+        return [r for r in self.results if not r.ok]
+
+    def print_summary(self):
+        print("\n📊 Provisioning summary:")
+        for phase in ("user", "group", "membership", "prune"):
+            results = [r for r in self.results if r.phase == phase]
+            if not results:
+                continue
+            failed = sum(1 for r in results if not r.ok)
+            print(f"  {phase}: {len(results) - failed} succeeded, {failed} failed")
+        for r in self.failures():
+            print(f"  ✗ {r.phase} {r.item}" + (f": {r.error}" if r.error else ""))
+
+def load_desired(args):
+    """Compile ldap.yaml, merged with any bootstrap JSON sources, into the desired model"""
+    return load_directory(args.config, args.user_configs, args.group_configs, args.bundle,
+                          None if args.no_model_cache else args.model_cache_dir)
+
+def reconcile(token, snapshot, operations, transport, concurrency):
+    """Apply planned operations over the existing snapshot and return the engine"""
+    engine = ProvisioningEngine(token, snapshot, concurrency)
+    print_plan(operations, snapshot)
+    if not operations:
+        return engine
+    if transport is not None:
+        engine.apply_batched(operations, transport)
+    else:
+        engine.apply(operations)
+    engine.print_summary()
+    return engine
+
+def watch(args, token, model, snapshot, transport):
+    """Reconcile LLDAP with the configuration whenever the watched files change.
+
+    The snapshot stays in memory between cycles and is updated by each apply,
+    so an edit only costs the operations it implies: the old and new models
+    are diffed and only the affected users, groups and memberships are
+    planned. Every --resync-interval seconds, and shortly after a cycle with
+    failures, a fresh snapshot is fetched and fully reconciled to pick up
+    changes made outside this process.
+    """
+    sources = [p for p in (args.user_configs, args.group_configs, args.bundle) if p]
+    paths = [args.config] + sources + (args.watch_path or [])
+    watcher = ConfigWatcher(paths, debounce=args.debounce)
+    print(f"\n👀 Watching {len(paths)} paths with {watcher.backend} (debounce {args.debounce}s)")
+    for path in paths:
+        print(f"  {path}")
+
+    engine = reconcile(token, snapshot, plan_changes(model, snapshot, prune=args.prune), transport, args.concurrency)
+    next_resync = time.monotonic() + (WATCH_RETRY_DELAY if engine.failures() else args.resync_interval)
+    try:
+        while True:
+            changed = watcher.wait(timeout=max(0.0, next_resync - time.monotonic()))
+            if changed:
+                print(f"\n🔄 Configuration changed: {', '.join(sorted(changed))}")
+                try:
+                    new_model = load_desired(args)
+                except Exception as e:
+                    print(f"❌ Error loading configuration, keeping the previous one: {str(e)}")
+                    continue
+                operations = plan_changes(new_model, snapshot, prune=args.prune, scope=model_delta(model, new_model))
+                model = new_model
+            else:
+                print("\n🔁 Resyncing against a fresh snapshot...")
+                try:
+                    # Recheck the endpoint; the cached token is reused or refreshed, not logged in again
+                    token = get_jwt_token()
+                    if transport is not None:
+                        transport = GraphQLTransport(http_session, working_lldap_url, token, args.batch_size)
+                    with metrics.phase("snapshot"):
+                        snapshot = DirectorySnapshot.fetch(token, transport)
+                except (Exception, SystemExit) as e:
+                    print(f"⚠️ Resync failed, retrying in {WATCH_RETRY_DELAY}s: {str(e)}")
+                    next_resync = time.monotonic() + WATCH_RETRY_DELAY
+                    continue
+                operations = plan_changes(model, snapshot, prune=args.prune)
+                next_resync = time.monotonic() + args.resync_interval
+
+            engine = reconcile(token, snapshot, operations, transport, args.concurrency)
+            if engine.failures():
+                next_resync = min(next_resync, time.monotonic() + WATCH_RETRY_DELAY)
+            if args.metrics_file:
+                metrics.finish(not engine.failures())
+                metrics.write_textfile(args.metrics_file)
+    except KeyboardInterrupt:
+        print("\n👋 Watch mode stopped")
+    finally:
+        watcher.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Provision LLDAP users and groups from the LDAP YAML configuration")
+    parser.add_argument("command", nargs="?", default="provision", choices=["provision", "plan", "apply", "watch"],
+                        help="provision creates missing entries (default); plan shows the changes needed "
+                             "to match the configuration; apply makes them; watch keeps applying them "
+                             "as the configuration files change")
+    parser.add_argument("--prune", action="store_true",
+                        help="plan/apply: also delete users and groups that are not in the configuration")
+    parser.add_argument("--out", help="plan: write the planned operations to this JSON file")
+    parser.add_argument("--watch-path", action="append",
+                        help="watch: extra file or directory to watch besides the configuration "
+                             "sources, may be repeated")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE,
+                        help=f"watch: seconds without further edits before reconciling (default: {DEFAULT_DEBOUNCE})")
+    parser.add_argument("--resync-interval", type=int, default=DEFAULT_RESYNC_INTERVAL,
+                        help=f"watch: seconds between full resyncs against a fresh snapshot "
+                             f"(default: {DEFAULT_RESYNC_INTERVAL})")
+    parser.add_argument("--transport", choices=["rest", "graphql"], default="rest",
+                        help="rest sends one request per operation (default); graphql batches "
+                             "operations into aliased mutation documents")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"graphql: operations per batch document (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--metrics-file",
+                        help="Write Prometheus metrics for the run to this file (node-exporter textfile collector)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve Prometheus metrics on this port at /metrics after the run")
+    parser.add_argument("--metrics-linger", type=int, default=30,
+                        help="Seconds to keep serving --metrics-port after the run (default: 30)")
+    parser.add_argument("--profile",
+                        help="Write a cProfile trace of the run to this file (view with snakeviz or flameprof)")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH,
+                        help=f"Path to the LDAP YAML configuration (default: {DEFAULT_CONFIG_PATH})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum API calls in flight (default: {DEFAULT_CONCURRENCY}, or LLDAP_CONCURRENCY)")
+    parser.add_argument("--user-configs",
+                        help="Directory of LLDAP bootstrap user JSON files to merge with the configuration")
+    parser.add_argument("--group-configs",
+                        help="Directory of LLDAP bootstrap group JSON files to merge with the configuration")
+    parser.add_argument("--bundle",
+                        help="Newline-delimited JSON bundle of bootstrap users and groups to merge with the configuration")
+    parser.add_argument("--model-cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory of the compiled configuration cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-model-cache", action="store_true",
+                        help="Always parse the configuration instead of using the compiled cache")
+    return parser.parse_args(argv)
+
+def export_metrics(args, ok):
+    metrics.finish(ok)
+    if args.metrics_file:
+        metrics.write_textfile(args.metrics_file)
+        print(f"📈 Metrics written to {args.metrics_file}")
+    if args.metrics_port:
+        print(f"📈 Serving metrics on :{args.metrics_port}/metrics for {args.metrics_linger}s")
+        metrics.serve(args.metrics_port, args.metrics_linger)
+
+def main(argv=None):
+    args = parse_args(argv)
+    profiler = cProfile.Profile() if args.profile else None
+    ok = False
+    if profiler:
+        profiler.enable()
+    try:
+        run(args)
+        ok = True
+    except SystemExit as e:
+        ok = not e.code
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"🔬 Profile written to {args.profile}")
+        export_metrics(args, ok)
+
+def run(args):
+    configure_session(args.concurrency)
     try:
         # Read YAML configuration
         print("\n📂 Reading LDAP configuration file...")
         try:
-            config = yaml.safe_load(Path('/config/ldap.yaml').read_text())
-            print(f"✓ Configuration loaded successfully with {len(config.get('users', []) + config.get('service_accounts', []))} users and {len(config.get('groups', []))} groups")
+            model = load_desired(args)
+            print(f"✓ Configuration loaded successfully with {len(model.users)} users and {len(model.groups)} groups")
         except Exception as yaml_error:
             print(f"❌ Error loading YAML configuration: {str(yaml_error)}")
             print("📄 File contents preview:")
-            with open('/config/ldap.yaml', 'r') as f:
+            with open(args.config, 'r') as f:
                 print(f.read()[:500] + '...')
             raise yaml_error
         
@@ -278,15 +995,7 @@ def main():
         print("🔍 Verifying API connection...")
         try:
             # Test API access with a correct API endpoint (version info)
-            test_resp = requests.get(
-                f"{working_lldap_url}/api/server/version",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Accept": "application/json",
-                    "Content-Type": "application/json"
-                },
-                timeout=5
-            )
+            test_resp = api_request("GET", token, "/api/server/version", timeout=5)
             if test_resp.status_code == 200:
                 print("✅ API connection verified successfully!")
             else:
@@ -296,25 +1005,47 @@ def main():
             print("Continuing anyway...")
         
         # Create users and groups
-        users = config.get('users', []) + config.get('service_accounts', [])
-        if not users:
+        if not model.users:
             print("⚠️ No users defined in configuration")
         
-        print("\n👤 Creating users...")
-        for user_data in users:
-            create_user(token, user_data)
+        transport = None
+        if args.transport == "graphql":
+            transport = GraphQLTransport(http_session, working_lldap_url, token, args.batch_size)
         
-        print("\n👥 Creating groups...")
-        for group_data in config.get('groups', []):
-            create_group(token, group_data)
+        # Read the current directory state once; every check below uses it
+        with metrics.phase("snapshot"):
+            snapshot = DirectorySnapshot.fetch(token, transport)
+        engine = ProvisioningEngine(token, snapshot, args.concurrency)
         
-        # Add users to groups
-        print("\n🔗 Adding users to groups...")
-        for group_data in config.get('groups', []):
-            group_name = group_data['name']
-            for username in group_data.get('members', []):
-                add_user_to_group(token, username, group_name)
+        if args.command == "watch":
+            watch(args, token, model, snapshot, transport)
+            return
+        if args.command in ("plan", "apply"):
+            operations = plan_changes(model, snapshot, prune=args.prune)
+            print_plan(operations, snapshot)
+            if args.out:
+                save_plan(operations, args.out)
+                print(f"\n💾 Plan written to {args.out}")
+            if args.command == "plan" or not operations:
+                return
+            if transport is not None:
+                engine.apply_batched(operations, transport)
+            else:
+                engine.apply(operations)
+        elif transport is not None:
+            operations = [op for op in plan_changes(model, snapshot) if op.action in PROVISION_ACTIONS]
+            engine.apply_batched(operations, transport)
+            if any(op.action == "create_user" for op in operations):
+                print("ℹ️ Passwords cannot be set over GraphQL; set them with lldap_set_password")
+        else:
+            users, groups, memberships = desired_state(model)
+            memberships = addable_memberships(users, groups, memberships, snapshot)
+            engine.provision(list(users.values()), list(groups.values()), memberships)
+        engine.print_summary()
         
+        if engine.failures():
+            print(f"\n⚠️ LLDAP provisioning finished with {len(engine.failures())} failed operations\n")
+            sys.exit(1)
         print("\n✅ LLDAP provisioning completed successfully!\n")
     except json.JSONDecodeError as json_err:
         print(f"\n❌ JSON parsing error: {str(json_err)}")
@@ -0,0 +1,25 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+LDAP_DIR = Path(__file__).resolve().parent.parent
+
+# The config scripts import their siblings directly, as they do when run as scripts
+sys.path[:0] = [str(LDAP_DIR / "config"), str(LDAP_DIR / "benchmark")]
+# Keep token and endpoint caches out of the home directory
+os.environ.setdefault("LLDAP_TOKEN_CACHE", "")
+
+
+@pytest.fixture
+def lldap(tmp_path, monkeypatch):
+    """A MockLLDAP that provision_users.main() discovers and logs in to"""
+    import provision_users
+    from mock_lldap import MockLLDAP
+
+    mock = MockLLDAP()
+    monkeypatch.setattr(provision_users, "POSSIBLE_LLDAP_URLS", [mock.start()])
+    monkeypatch.setattr(provision_users, "ENDPOINT_CACHE_PATH", str(tmp_path / "endpoint.json"))
+    yield mock
+    mock.stop()
@@ -0,0 +1,166 @@
+import base64
+import hashlib
+import json
+import os
+import stat
+
+import pytest
+
+import generate_ldif
+from ldap_model import load_model
+from ldif_reader import LDIFReader
+
+
+def write_config(path, users, groups=()):
+    lines = ['base_config:', '  base_dn: dc=example,dc=com', 'users:']
+    for name, password in users:
+        lines += [f'  - username: {name}', f'    password: {password}', '    groups: [staff]']
+    lines += ['groups:', '  - name: staff']
+    lines += [f'  - name: {name}' for name in groups]
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def records(path, changetype):
+    dns = []
+    for block in path.read_text().split('\n\n'):
+        lines = [line for line in block.splitlines() if not line.startswith('#')]
+        if f'changetype: {changetype}' in lines:
+            dns.append(lines[0][len('dn: '):])
+    return dns
+
+
+def compile_model_from(config):
+    return load_model(str(config), None)
+
+
+@pytest.fixture
+def incremental(tmp_path):
+    config = tmp_path / 'ldap.yaml'
+    changes = tmp_path / 'changes.ldif'
+
+    def run(*extra):
+        assert generate_ldif.main([
+            '--config', str(config), '--no-model-cache', '--output', str(tmp_path / 'users.ldif'),
+            '--manifest', str(tmp_path / 'manifest.json'), '--changes', str(changes), *extra,
+        ]) in (0, None)
+        return changes
+    return config, run
+
+
+def test_first_incremental_run_adds_everything(incremental):
+    config, run = incremental
+    write_config(config, [('alice', 'secret1'), ('bob', 'secret2')])
+
+    changes = run()
+
+    assert 'uid=alice,ou=users,dc=example,dc=com' in records(changes, 'add')
+    assert 'cn=staff,ou=groups,dc=example,dc=com' in records(changes, 'add')
+    assert records(changes, 'modify') == records(changes, 'delete') == []
+
+
+def test_unchanged_configuration_writes_no_changes(incremental):
+    config, run = incremental
+    write_config(config, [('alice', 'secret1')])
+    run()
+
+    changes = run()
+
+    assert records(changes, 'add') == records(changes, 'modify') == records(changes, 'delete') == []
+
+
+def test_changed_and_removed_entries(incremental):
+    config, run = incremental
+    write_config(config, [('alice', 'secret1'), ('bob', 'secret2')])
+    run()
+    write_config(config, [('alice', 'changed-secret')])
+
+    changes = run()
+
+    assert records(changes, 'modify') == ['uid=alice,ou=users,dc=example,dc=com',
+                                          'cn=staff,ou=groups,dc=example,dc=com']
+    assert records(changes, 'delete') == ['uid=bob,ou=users,dc=example,dc=com']
+    assert 'replace: userPassword\nuserPassword: changed-secret' in changes.read_text()
+
+
+def test_ssha_hash_verifies():
+    value = generate_ldif.hash_password('secret', 'ssha')
+
+    raw = base64.b64decode(value[len('{SSHA}'):])
+    hashed, salt = raw[:20], raw[20:]
+    assert value.startswith('{SSHA}')
+    assert hashlib.sha1(b'secret' + salt).digest() == hashed
+
+
+def test_hash_cache_reuses_hashes_until_the_password_changes(tmp_path):
+    config = tmp_path / 'ldap.yaml'
+    write_config(config, [('alice', 'secret1'), ('bob', 'secret2')])
+    model = compile_model_from(config)
+
+    first, cache = generate_ldif.hash_passwords(model, 'ssha')
+    again, _ = generate_ldif.hash_passwords(model, 'ssha', cache)
+    write_config(config, [('alice', 'secret1'), ('bob', 'changed-secret')])
+    changed, _ = generate_ldif.hash_passwords(compile_model_from(config), 'ssha', cache)
+
+    assert again == first
+    assert changed['alice'] == first['alice']
+    assert changed['bob'] != first['bob']
+
+
+def test_incremental_salted_hashes_require_hash_cache(incremental, capsys):
+    config, run = incremental
+    write_config(config, [('alice', 'secret1')])
+
+    with pytest.raises(SystemExit) as exc:
+        run('--password-scheme', 'ssha')
+
+    assert exc.value.code == 2
+    assert 'requires --hash-cache' in capsys.readouterr().err
+
+
+def test_incremental_salted_hashes_with_hash_cache(incremental, tmp_path):
+    config, run = incremental
+    write_config(config, [('alice', 'secret1')])
+    options = ('--password-scheme', 'ssha', '--hash-cache', str(tmp_path / 'hashes.json'))
+    run(*options)
+
+    changes = run(*options)
+
+    assert records(changes, 'add') == records(changes, 'modify') == []
+    assert stat.S_IMODE(os.stat(tmp_path / 'hashes.json').st_mode) == 0o600
+
+
+def test_shards_hold_the_same_entries_as_the_full_output(tmp_path):
+    config = tmp_path / 'ldap.yaml'
+    write_config(config, [(f'user{i}', f'secret{i}') for i in range(30)])
+    full = tmp_path / 'full.ldif'
+    sharded = tmp_path / 'users.ldif'
+    generate_ldif.main(['--config', str(config), '--no-model-cache', '--output', str(full)])
+
+    generate_ldif.main(['--config', str(config), '--no-model-cache', '--output', str(sharded), '--shards', '3'])
+
+    with open(tmp_path / 'users.shards.json') as f:
+        manifest = json.load(f)
+    shard_entries = []
+    for phase in manifest['phases']:
+        for shard in phase:
+            with LDIFReader(str(tmp_path / shard['file'])) as reader:
+                entries = list(reader)
+            assert len(entries) == shard['entries']
+            shard_entries.extend(entries)
+    with LDIFReader(str(full)) as reader:
+        assert sorted(shard_entries) == sorted(reader)
+    assert manifest['total_entries'] == len(shard_entries)
+    # Users are spread over every shard, groups load after all of them
+    assert all(shard['entries'] for shard in manifest['phases'][1])
+    assert manifest['phases'][2][0]['file'] == 'users.groups.ldif'
+
+
+def test_user_shard_is_stable():
+    dn = 'uid=alice,ou=users,dc=example,dc=com'
+    assert generate_ldif.user_shard(dn, 8) == generate_ldif.user_shard(dn, 8)
+    assert generate_ldif.user_shard(dn, 1) == 0
+
+
+def test_shards_cannot_be_combined_with_a_manifest(tmp_path):
+    with pytest.raises(SystemExit):
+        generate_ldif.parse_args(['--shards', '2', '--manifest', str(tmp_path / 'manifest.json')])
@@ -0,0 +1,55 @@
+import os
+import stat
+
+from ldap_model import _cache_path, load_model
+
+CONFIG = """\
+base_config:
+  base_dn: dc=example,dc=com
+users:
+  - username: alice
+    password: secret
+    groups: [developers]
+groups:
+  - name: developers
+"""
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_cache_file_is_private(tmp_path):
+    config = tmp_path / "ldap.yaml"
+    config.write_text(CONFIG)
+    cache_dir = tmp_path / "cache"
+
+    load_model(str(config), str(cache_dir))
+
+    path = _cache_path(str(config), str(cache_dir))
+    assert mode(cache_dir) == 0o700
+    assert mode(path) == 0o600
+    assert [p.name for p in cache_dir.iterdir()] == [path.name]
+
+
+def test_cached_model_matches_parsed_model(tmp_path):
+    config = tmp_path / "ldap.yaml"
+    config.write_text(CONFIG)
+    cache_dir = str(tmp_path / "cache")
+
+    first = load_model(str(config), cache_dir)
+    cached = load_model(str(config), cache_dir)
+
+    assert cached.users["alice"].password == first.users["alice"].password == "secret"
+    assert cached.memberships == first.memberships == {("developers", "alice")}
+
+
+def test_changed_config_is_recompiled(tmp_path):
+    config = tmp_path / "ldap.yaml"
+    config.write_text(CONFIG)
+    cache_dir = str(tmp_path / "cache")
+    load_model(str(config), cache_dir)
+
+    config.write_text(CONFIG.replace("secret", "changed-secret"))
+
+    assert load_model(str(config), cache_dir).users["alice"].password == "changed-secret"
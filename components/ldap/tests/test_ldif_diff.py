@@ -0,0 +1,124 @@
+import base64
+
+import pytest
+
+import ldif_diff
+from ldif_reader import LDIFError, LDIFReader, normalize_dn
+
+OLD = """\
+version: 1
+# exported directory
+dn: uid=alice,ou=users,dc=example,dc=com
+objectClass: inetOrgPerson
+cn: Alice
+mail: alice@example.com
+userPassword: old-secret
+
+dn: uid=bob,ou=users,dc=example,dc=com
+objectClass: inetOrgPerson
+cn: Bob
+
+"""
+
+NEW = """\
+dn: UID=alice, ou=users, dc=example, dc=com
+objectClass: inetOrgPerson
+mail: alice@example.com
+cn: Alice Liddell
+userPassword: new-secret
+
+dn: uid=carol,ou=users,dc=example,dc=com
+objectClass: inetOrgPerson
+cn: Carol
+"""
+
+
+@pytest.fixture
+def files(tmp_path):
+    old = tmp_path / "old.ldif"
+    new = tmp_path / "new.ldif"
+    old.write_text(OLD)
+    new.write_text(NEW)
+    return str(old), str(new)
+
+
+def test_reader_unfolds_lines_and_decodes_base64(tmp_path):
+    path = tmp_path / "folded.ldif"
+    encoded = base64.b64encode("Zoë".encode("utf-8")).decode("ascii")
+    path.write_bytes(
+        b"dn: uid=zoe,ou=users,dc=example,dc=com\r\n"
+        b"description: a long value that was\r\n"
+        b"  folded\r\n"
+        + f"cn:: {encoded}\r\n".encode("ascii")
+    )
+
+    with LDIFReader(str(path)) as reader:
+        (dn, attrs), = list(reader)
+
+    assert dn == "uid=zoe,ou=users,dc=example,dc=com"
+    assert attrs == [("description", "a long value that was folded"), ("cn", "Zoë")]
+
+
+def test_reader_reads_entries_back_by_offset(files):
+    with LDIFReader(files[0]) as reader:
+        entry = reader.get("UID=bob, ou=users, dc=example, dc=com")
+        assert entry == ("uid=bob,ou=users,dc=example,dc=com", [("objectClass", "inetOrgPerson"), ("cn", "Bob")])
+        assert reader.get("uid=nobody,ou=users,dc=example,dc=com") is None
+
+
+def test_reader_rejects_records_without_dn(tmp_path):
+    path = tmp_path / "broken.ldif"
+    path.write_text("cn: orphan\n")
+
+    with LDIFReader(str(path)) as reader, pytest.raises(LDIFError):
+        list(reader)
+
+
+def test_normalize_dn():
+    assert normalize_dn("UID=Alice , OU=Users,dc=example") == "uid=alice,ou=users,dc=example"
+
+
+def test_diff_reports_added_removed_and_changed_entries(files):
+    old, new = ldif_diff.LDIFSource(files[0]), ldif_diff.LDIFSource(files[1])
+    try:
+        changes = {change: (dn, removed, added) for change, dn, removed, added in ldif_diff.diff_sources(old, new)}
+    finally:
+        old.close()
+        new.close()
+
+    assert set(changes) == {"changed", "removed", "added"}
+    dn, removed, added = changes["changed"]
+    assert dn == "uid=alice,ou=users,dc=example,dc=com"
+    assert removed == [("cn", b"Alice"), ("userpassword", b"old-secret")]
+    assert added == [("cn", b"Alice Liddell"), ("userpassword", b"new-secret")]
+    assert changes["removed"][0] == "uid=bob,ou=users,dc=example,dc=com"
+    assert changes["added"][0] == "uid=carol,ou=users,dc=example,dc=com"
+
+
+def test_cli_hides_passwords_and_exits_1_on_drift(files, capsys):
+    assert ldif_diff.main([*files]) == 1
+
+    out = capsys.readouterr().out
+    assert "old-secret" not in out and "new-secret" not in out
+    assert "userpassword: (hidden)" in out
+    assert "1 added, 1 removed, 1 changed" in out
+
+
+def test_cli_ignores_attributes_and_exits_0_without_drift(files, tmp_path):
+    assert ldif_diff.main([files[0], files[0]]) == 0
+    assert ldif_diff.main([files[0], str(tmp_path / "missing.ldif")]) == 2
+
+
+def test_generated_ldif_matches_its_configuration(tmp_path):
+    import generate_ldif
+
+    config = tmp_path / "ldap.yaml"
+    config.write_text(
+        "base_config:\n  base_dn: dc=example,dc=com\n"
+        "users:\n  - username: alice\n    password: secret\n    groups: [staff]\n"
+        "groups:\n  - name: staff\n"
+    )
+    output = tmp_path / "users.ldif"
+    generate_ldif.main(["--config", str(config), "--no-model-cache", "--output", str(output)])
+
+    assert ldif_diff.main([str(output), "--config", str(config), "--no-model-cache"]) == 0
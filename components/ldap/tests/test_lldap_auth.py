@@ -0,0 +1,96 @@
+import os
+import stat
+import threading
+import time
+
+import pytest
+import requests
+
+from lldap_auth import TokenManager, jwt_expiry
+from mock_lldap import MockLLDAP
+
+
+@pytest.fixture
+def mock():
+    server = MockLLDAP(token_ttl=3600)
+    server.start()
+    yield server
+    server.stop()
+
+
+def manager(mock, cache_path=None, margin=300):
+    return TokenManager(requests.Session(), mock.url, "admin", "password", cache_path=cache_path, margin=margin)
+
+
+def logins(mock):
+    return mock.counts.get("POST /auth/simple/login", 0)
+
+
+def refreshes(mock):
+    return mock.counts.get("GET /auth/refresh", 0)
+
+
+def test_jwt_expiry_reads_the_exp_claim(mock):
+    assert jwt_expiry(mock.issue_token()) == pytest.approx(time.time() + 3600, abs=5)
+    assert jwt_expiry("not-a-jwt") is None
+
+
+def test_cached_token_is_reused_by_the_next_run(mock, tmp_path):
+    cache_path = str(tmp_path / "cache" / "token.json")
+    first = manager(mock, cache_path)
+    assert first.ensure()
+
+    second = manager(mock, cache_path)
+    assert second.ensure()
+
+    assert second.token == first.token
+    assert logins(mock) == 1
+    assert stat.S_IMODE(os.stat(cache_path).st_mode) == 0o600
+
+
+def test_expiring_token_is_refreshed_not_logged_in_again(mock):
+    token = manager(mock)
+    token.ensure()
+    token.expires_at = time.time() + 60
+
+    str(token)
+
+    assert (logins(mock), refreshes(mock)) == (1, 1)
+    assert token.expires_at > time.time() + 3000
+
+
+def test_concurrent_workers_share_one_refresh(mock):
+    token = manager(mock)
+    token.ensure()
+    token.expires_at = time.time() - 1
+    seen = []
+
+    workers = [threading.Thread(target=lambda: seen.append(str(token))) for _ in range(16)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(set(seen)) == 1
+    assert refreshes(mock) == 1
+
+
+def test_rejected_refresh_token_falls_back_to_login(mock):
+    token = manager(mock)
+    token.ensure()
+    token.refresh_token = "revoked"
+    token.invalidate()
+
+    assert token.get()
+    assert logins(mock) == 2
+    assert token.refresh_token == "mock-refresh"
+
+
+def test_invalidate_ignores_a_token_already_replaced(mock):
+    token = manager(mock)
+    token.ensure()
+    current = token.token
+
+    token.invalidate("an-older-token")
+
+    assert token.token == current
@@ -0,0 +1,86 @@
+import base64
+import json
+import time
+
+from ldap_model import compile_model
+from lldap_auth import TokenManager
+from lldap_graphql import GraphQLTransport
+from provision_users import DirectorySnapshot, plan_changes
+
+CONFIG = {
+    "base_config": {"base_dn": "dc=example,dc=com"},
+    "users": [],
+    "groups": [{"name": "developers", "description": "Application developers"}],
+}
+
+
+def jwt(subject):
+    claims = json.dumps({"sub": subject, "exp": time.time() + 3600}).encode()
+    return "header." + base64.urlsafe_b64encode(claims).decode().rstrip("=") + ".signature"
+
+
+class Response:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = json.dumps(body)
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Answers GraphQL posts from a list of (status, body) replies and logs in on demand"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.documents = []
+        self.tokens = []
+        self.logins = 0
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        if url.endswith("/auth/simple/login"):
+            self.logins += 1
+            return Response(200, {"token": jwt(self.logins)})
+        self.documents.append(json)
+        self.tokens.append(headers["Authorization"])
+        return Response(*self.replies.pop(0))
+
+
+def test_create_group_sends_description():
+    model = compile_model(CONFIG)
+    operations = plan_changes(model, DirectorySnapshot([], []))
+    transport = GraphQLTransport(FakeSession([]), "http://lldap", "token")
+
+    document, variables, aliases, failures = transport.build_batch(operations, lambda name: None)
+
+    assert not failures
+    assert "createGroupWithDetails(request: $request0)" in document
+    assert variables["request0"] == {
+        "displayName": "developers",
+        "attributes": [{"name": "description", "value": ["Application developers"]}],
+    }
+
+
+def test_snapshot_reads_description_back():
+    session = FakeSession([(200, {"data": {
+        "users": [],
+        "groups": [{"id": 3, "displayName": "developers",
+                    "attributes": [{"name": "description", "value": ["Application developers"]}]}],
+    }})])
+    transport = GraphQLTransport(session, "http://lldap", "token")
+
+    snapshot = DirectorySnapshot(*transport.fetch_directory())
+
+    assert snapshot.groups["developers"]["description"] == "Application developers"
+    assert plan_changes(compile_model(CONFIG), snapshot) == []
+
+
+def test_rejected_token_is_renewed_once():
+    session = FakeSession([(401, {"error": "expired"}), (200, {"data": {"op0": {"ok": True}}})])
+    token = TokenManager(session, "http://lldap", "admin", "password", cache_path=None)
+    transport = GraphQLTransport(session, "http://lldap", token)
+
+    assert transport.execute("mutation { op0: deleteUser(userId: \"x\") { ok } }") == {"data": {"op0": {"ok": True}}}
+    assert session.logins == 2
+    assert session.tokens[0] != session.tokens[1]
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+import provision_users
+from ldap_model import compile_model
+from provision_users import DirectorySnapshot, plan_changes
+
+CONFIG = {
+    "base_config": {"base_dn": "dc=example,dc=com"},
+    "users": [
+        {"username": "alice", "password": "secret1", "email": "alice@example.com", "groups": ["developers"]},
+        {"username": "bob", "password": "secret2", "email": "bob@example.com", "groups": ["developers"]},
+    ],
+    "groups": [{"name": "developers", "description": "Developers"}],
+}
+
+CONFIG_YAML = """\
+base_config:
+  base_dn: dc=example,dc=com
+users:
+  - username: alice
+    password: secret1
+    email: alice@example.com
+    groups: [developers]
+  - username: carol
+    password: secret3
+    email: carol@example.com
+    groups: [developers]
+groups:
+  - name: developers
+    description: Developers
+"""
+
+
+def actions(operations):
+    return [(op.action, op.target) for op in operations]
+
+
+@pytest.fixture
+def model():
+    return compile_model(CONFIG)
+
+
+def test_plan_on_empty_directory_creates_everything(model):
+    planned = actions(plan_changes(model, DirectorySnapshot([], [])))
+
+    assert planned == [
+        ("create_user", "alice"),
+        ("create_user", "bob"),
+        ("create_group", "developers"),
+        ("add_member", ("alice", "developers")),
+        ("add_member", ("bob", "developers")),
+    ]
+
+
+def test_plan_updates_changed_fields_and_removes_stray_members(model):
+    snapshot = DirectorySnapshot(
+        [{"username": "alice", "email": "old@example.com"}, {"username": "bob", "email": "bob@example.com"},
+         {"username": "mallory", "email": "mallory@example.com"}],
+        [{"id": 1, "display_name": "developers", "description": "Developers",
+          "users": [{"username": "alice"}, {"username": "mallory"}]}],
+    )
+
+    operations = plan_changes(model, snapshot)
+
+    assert actions(operations) == [
+        ("update_user", "alice"),
+        ("add_member", ("bob", "developers")),
+        ("remove_member", ("mallory", "developers")),
+    ]
+    assert operations[0].data == {"email": "alice@example.com"}
+
+
+def test_prune_deletes_unconfigured_entries_but_not_protected_ones(model):
+    snapshot = DirectorySnapshot(
+        [{"username": "alice"}, {"username": "bob"}, {"username": "mallory"},
+         {"username": provision_users.ADMIN_USER}],
+        [{"id": 1, "display_name": "developers", "users": [{"username": "alice"}, {"username": "bob"}]},
+         {"id": 2, "display_name": "old_team", "users": []},
+         {"id": 3, "display_name": "lldap_admin", "users": []}],
+    )
+
+    assert actions(plan_changes(model, snapshot)) == []
+    assert actions(plan_changes(model, snapshot, prune=True)) == [
+        ("delete_group", "old_team"),
+        ("delete_user", "mallory"),
+    ]
+
+
+def test_apply_converges_and_plan_then_reports_no_changes(tmp_path, lldap, capsys):
+    lldap.preload(compile_model(CONFIG))
+    config = tmp_path / "ldap.yaml"
+    config.write_text(CONFIG_YAML)
+    plan_file = tmp_path / "plan.json"
+
+    provision_users.main(["plan", "--config", str(config), "--no-model-cache", "--prune", "--out", str(plan_file)])
+    planned = [(op["action"], op["target"]) for op in json.loads(plan_file.read_text())]
+    provision_users.main(["apply", "--config", str(config), "--no-model-cache", "--prune"])
+    capsys.readouterr()
+    provision_users.main(["plan", "--config", str(config), "--no-model-cache", "--prune"])
+
+    assert planned == [
+        ("create_user", "carol"),
+        ("add_member", ["carol", "developers"]),
+        ("remove_member", ["bob", "developers"]),
+        ("delete_user", "bob"),
+    ]
+    assert sorted(lldap.users) == ["alice", "carol"]
+    members = [m["username"] for g in lldap.groups.values() if g["display_name"] == "developers" for m in g["users"]]
+    assert sorted(members) == ["alice", "carol"]
+    assert "No changes" in capsys.readouterr().out
@@ -0,0 +1,66 @@
+import pytest
+
+import provision_users
+from ldap_model import compile_model
+from provision_users import DirectorySnapshot, addable_memberships, plan_changes
+
+CONFIG = {
+    "base_config": {"base_dn": "dc=example,dc=com"},
+    "users": [
+        {"username": "alice", "password": "secret", "groups": ["developers", "project_users"]},
+    ],
+    "groups": [
+        {"name": "developers", "members": ["alice", "ghost"]},
+    ],
+}
+
+
+@pytest.fixture
+def model():
+    return compile_model(CONFIG)
+
+
+def test_memberships_of_undefined_groups_and_users_are_skipped(model, capsys):
+    snapshot = DirectorySnapshot([], [])
+
+    addable = addable_memberships(model.users, model.groups, model.memberships, snapshot)
+
+    assert addable == [("developers", "alice")]
+    out = capsys.readouterr().out
+    assert "alice in project_users: group is not defined" in out
+    assert "ghost in developers: user is not defined" in out
+
+
+def test_membership_of_group_already_in_lldap_is_kept(model):
+    snapshot = DirectorySnapshot([], [{"id": 7, "display_name": "project_users", "users": []}])
+
+    addable = addable_memberships(model.users, model.groups, model.memberships, snapshot)
+
+    assert ("project_users", "alice") in addable
+
+
+def test_plan_skips_undefined_group(model):
+    operations = plan_changes(model, DirectorySnapshot([], []))
+
+    members = [op.target for op in operations if op.action == "add_member"]
+    assert members == [("alice", "developers")]
+
+
+def test_provision_with_undefined_group_succeeds(tmp_path, lldap, capsys):
+    config = tmp_path / "ldap.yaml"
+    config.write_text(
+        "base_config:\n"
+        "  base_dn: dc=example,dc=com\n"
+        "users:\n"
+        "  - username: alice\n"
+        "    password: secret\n"
+        "    groups: [developers, project_users]\n"
+        "groups:\n"
+        "  - name: developers\n"
+    )
+
+    provision_users.main(["provision", "--config", str(config), "--no-model-cache"])
+
+    out = capsys.readouterr().out
+    assert "Skipping membership alice in project_users" in out
+    assert "membership: 1 succeeded, 0 failed" in out
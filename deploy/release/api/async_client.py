@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Async Release.com API Client
+Concurrent counterpart of ReleaseAPIClient for fleet-wide operations
+
+AsyncReleaseAPIClient runs on a single httpx.AsyncClient, so every call
+shares one connection pool (multiplexed over HTTP/2 when the h2 package is
+installed). A semaphore caps the calls in flight, and transient failures
+are retried with the same policy as ResilientSession. The fan-out helpers
+gather independent calls concurrently, so a sweep over every application
+and environment takes about as long as its slowest chain of calls.
+"""
+
+import asyncio
+import logging
+import os
+import random
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from pagination import DEFAULT_PAGE_SIZE, Paginator, items
+from resilience import DEFAULT_TIMEOUT, IDEMPOTENT_METHODS, REJECTED_STATUSES, RETRY_STATUSES, RetryableStatus
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+except ImportError:
+    h2 = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_MAX_CONCURRENCY = 16
+# Deployments fetched to find the latest one; history is listed newest first
+LATEST_PAGE_SIZE = 10
+
+
+def latest(deployments: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Return the newest deployment by created_at, or the first one if there are no timestamps"""
+    if not deployments:
+        return None
+    if all(d.get('created_at') for d in deployments):
+        return max(deployments, key=lambda d: d['created_at'])
+    return deployments[0]
+
+
+class AsyncReleaseAPIClient:
+    """Async client for the Release.com API
+
+    Use as an async context manager so the connection pool is closed:
+
+        async with AsyncReleaseAPIClient() as client:
+            statuses = await client.latest_deployment_statuses()
+
+    Args:
+        api_token: Release.com API token (defaults to RELEASE_API_TOKEN env var)
+        base_url: Base URL for Release.com API
+        http2: Multiplex requests over HTTP/2 (needs the h2 package)
+        max_connections: Upper bound of open connections in the pool
+        max_keepalive_connections: Idle connections kept for reuse
+        max_concurrency: Calls in flight at once across all fan-outs
+        timeout: (connect, read) timeout in seconds
+        max_attempts: Attempts per call, including the first
+        backoff_max: Upper bound in seconds for a single retry wait
+    """
+
+    def __init__(self, api_token: Optional[str] = None, base_url: str = "https://api.release.com",
+                 http2: bool = True, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 max_attempts: int = 4, backoff_max: float = 20.0):
+        self.api_token = api_token or os.getenv('RELEASE_API_TOKEN')
+        self.base_url = base_url.rstrip('/')
+        if not self.api_token:
+            raise ValueError("Release.com API token is required")
+
+        if http2 and h2 is None:
+            logger.warning("h2 is not installed; falling back to HTTP/1.1 (pip install 'httpx[http2]')")
+            http2 = False
+        connect_timeout, read_timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        # Created on first use so it binds to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_keepalive_connections),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            headers={
+                'Authorization': f'Bearer {self.api_token}',
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            },
+        )
+
+    async def __aenter__(self) -> 'AsyncReleaseAPIClient':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _make_request(self, method: str, endpoint: str, idempotent: Optional[bool] = None,
+                            **kwargs) -> Any:
+        """Make HTTP request to Release.com API, retrying transient failures"""
+        response = await self._send(method, f"/{endpoint.lstrip('/')}", idempotent, **kwargs)
+        return response.json() if response.content else {}
+
+    async def _send(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs) -> httpx.Response:
+        """Send HTTP request to a path or absolute API URL, retrying transient failures"""
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else REJECTED_STATUSES
+
+        def should_retry(exc: BaseException) -> bool:
+            if isinstance(exc, RetryableStatus):
+                return True
+            if idempotent:
+                return isinstance(exc, httpx.TransportError)
+            # A failed connect means the request never reached the server
+            return isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout))
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.max_attempts),
+                wait=self._wait,
+                retry=retry_if_exception(should_retry),
+                before_sleep=lambda state: logger.warning(
+                    f"Retrying {method} {url} after {state.outcome.exception()!r} "
+                    f"(attempt {state.attempt_number}/{self.max_attempts})"),
+                reraise=True,
+            ):
+                with attempt:
+                    async with self._semaphore:
+                        response = await self.client.request(method, url, **kwargs)
+                    if response.status_code in retry_statuses:
+                        raise RetryableStatus(response)
+        except RetryableStatus as e:
+            response = e.response
+
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"API request failed: {e}")
+            raise
+        return response
+
+    async def _paginate(self, endpoint: str, key: str, page_size: int = DEFAULT_PAGE_SIZE,
+                        params: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the records of a list endpoint, fetching each page only when the previous one is used up"""
+        pager = Paginator(self.base_url, endpoint, page_size, params)
+        while True:
+            response = await self._send('GET', pager.url, params=pager.params)
+            body = response.json() if response.content else {}
+            records = items(body, key)
+            # The same page again means the server ignored the page request
+            if pager.repeated(records):
+                return
+            for record in records:
+                yield record
+            if not pager.advance(body, records, response.links.get('next', {}).get('url')):
+                return
+
+    def _wait(self, retry_state) -> float:
+        """Full-jitter exponential backoff that honours Retry-After on 429/503"""
+        exc = retry_state.outcome.exception()
+        if isinstance(exc, RetryableStatus):
+            retry_after = exc.response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max) + random.uniform(0, 0.5)
+        return wait_random_exponential(multiplier=0.5, max=self.backoff_max)(retry_state)
+
+    async def get_applications(self) -> List[Dict[str, Any]]:
+        """Get list of applications"""
+        return await self._make_request('GET', '/applications')
+
+    def iter_applications(self, page_size: int = DEFAULT_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over applications lazily, one page at a time"""
+        return self._paginate('/applications', 'applications', page_size)
+
+    async def get_application(self, app_id: str) -> Dict[str, Any]:
+        """Get application details"""
+        return await self._make_request('GET', f'/applications/{app_id}')
+
+    async def get_environments(self, app_id: str) -> List[Dict[str, Any]]:
+        """Get environments for an application"""
+        return await self._make_request('GET', f'/applications/{app_id}/environments')
+
+    def iter_environments(self, app_id: str, page_size: int = DEFAULT_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over the environments of an application lazily, one page at a time"""
+        return self._paginate(f'/applications/{app_id}/environments', 'environments', page_size)
+
+    async def deploy(self, app_id: str, environment_id: str, **kwargs) -> Dict[str, Any]:
+        """Trigger deployment"""
+        return await self._make_request(
+            'POST', f'/applications/{app_id}/environments/{environment_id}/deployments', json=kwargs)
+
+    async def get_deployments(self, app_id: str, environment_id: str) -> List[Dict[str, Any]]:
+        """Get deployment history"""
+        return await self._make_request('GET', f'/applications/{app_id}/environments/{environment_id}/deployments')
+
+    def iter_deployments(self, app_id: str, environment_id: str,
+                         page_size: int = DEFAULT_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over deployment history lazily; breaking out of the loop stops downloading"""
+        return self._paginate(
+            f'/applications/{app_id}/environments/{environment_id}/deployments', 'deployments', page_size)
+
+    async def get_deployment_status(self, app_id: str, environment_id: str, deployment_id: str) -> Dict[str, Any]:
+        """Get deployment status"""
+        return await self._make_request(
+            'GET', f'/applications/{app_id}/environments/{environment_id}/deployments/{deployment_id}')
+
+    async def gather(self, calls: Iterable) -> List[Any]:
+        """Await calls concurrently; a failed call yields its exception instead of cancelling the rest"""
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Fan-out call failed: {result}")
+        return results
+
+    async def environments_for_all_apps(self, app_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Map each application id to its environments, fetched concurrently
+
+        Applications whose environments could not be fetched map to the exception.
+        """
+        if app_ids is None:
+            app_ids = [app['id'] async for app in self.iter_applications()]
+        results = await self.gather(self._collect(self.iter_environments(app_id)) for app_id in app_ids)
+        return dict(zip(app_ids, results))
+
+    @staticmethod
+    async def _collect(records: AsyncIterator[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [record async for record in records]
+
+    async def _latest_status(self, app_id: str, env_id: str) -> Dict[str, Any]:
+        # Only the first page is read; breaking before it is used up stops the download
+        recent = []
+        async for deployment in self.iter_deployments(app_id, env_id, page_size=LATEST_PAGE_SIZE):
+            recent.append(deployment)
+            if len(recent) >= LATEST_PAGE_SIZE:
+                break
+        deployment = latest(recent)
+        if deployment is None:
+            return {'app_id': app_id, 'env_id': env_id, 'deployment_id': None, 'status': None}
+        status = await self.get_deployment_status(app_id, env_id, deployment['id'])
+        return {'app_id': app_id, 'env_id': env_id, 'deployment_id': deployment['id'],
+                'status': status.get('status'), 'deployment': status}
+
+    async def latest_deployment_statuses(self, environments: Optional[List[Tuple[str, str]]] = None
+                                         ) -> List[Dict[str, Any]]:
+        """Return the latest deployment status of every (app_id, env_id) pair
+
+        Without environments, every environment of every application is
+        swept. Each pair's deployments -> status chain runs concurrently with
+        the others; failures are reported in the entry's 'error' field.
+        """
+        if environments is None:
+            environments = []
+            for app_id, envs in (await self.environments_for_all_apps()).items():
+                if isinstance(envs, Exception):
+                    continue
+                environments.extend((app_id, env['id']) for env in envs)
+        results = await self.gather(self._latest_status(app_id, env_id) for app_id, env_id in environments)
+        return [
+            {'app_id': app_id, 'env_id': env_id, 'error': str(result)} if isinstance(result, Exception) else result
+            for (app_id, env_id), result in zip(environments, results)
+        ]
+
+
+async def fleet_status(api_token: Optional[str] = None, **kwargs) -> List[Dict[str, Any]]:
+    """Sweep the latest deployment status of every environment of every application"""
+    async with AsyncReleaseAPIClient(api_token=api_token, **kwargs) as client:
+        return await client.latest_deployment_statuses()
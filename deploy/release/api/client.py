@@ -5,10 +5,20 @@ Following the "Built for Clarity" design philosophy
 """
 
 import os
+import asyncio
 import requests
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+
+from deployment_watch import (DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL, DEFAULT_TIMEOUT, parse_target,
+                              watch_deployments)
+from fleet_deploy import (DEFAULT_CONCURRENCY, DEFAULT_MAX_FAILURE_RATE, DEFAULT_WAVES, fleet_deploy,
+                          load_targets, plan_waves)
+from pagination import DEFAULT_PAGE_SIZE, Paginator, items
+from resilience import ResilientSession
+from response_cache import DEFAULT_CACHE_FILE, DEFAULT_TTL, ResponseCache, cache_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,17 +27,21 @@ logger = logging.getLogger(__name__)
 class ReleaseAPIClient:
     """Client for interacting with Release.com API"""
     
-    def __init__(self, api_token: Optional[str] = None, base_url: str = "https://api.release.com"):
+    def __init__(self, api_token: Optional[str] = None, base_url: str = "https://api.release.com",
+                 cache: Optional[ResponseCache] = None):
         """
         Initialize Release.com API client
         
         Args:
             api_token: Release.com API token (defaults to RELEASE_API_TOKEN env var)
             base_url: Base URL for Release.com API
+            cache: Opt-in response cache for GET requests (see response_cache.py)
         """
         self.api_token = api_token or os.getenv('RELEASE_API_TOKEN')
         self.base_url = base_url.rstrip('/')
-        self.session = requests.Session()
+        self.cache = cache
+        # Adds timeouts, retry with backoff and circuit breaking to every call
+        self.session = ResilientSession()
         
         if not self.api_token:
             raise ValueError("Release.com API token is required")
@@ -38,22 +52,78 @@ class ReleaseAPIClient:
             'Accept': 'application/json'
         })
     
-    def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
-        """Make HTTP request to Release.com API"""
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send HTTP request to an absolute Release.com API URL"""
         try:
             response = self.session.request(method, url, **kwargs)
             response.raise_for_status()
-            return response.json() if response.content else {}
+            return response
         except requests.exceptions.RequestException as e:
             logger.error(f"API request failed: {e}")
             raise
     
+    def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        """Make HTTP request to Release.com API, through the response cache when enabled"""
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        if self.cache is None:
+            response = self._send(method, url, **kwargs)
+            return response.json() if response.content else {}
+        
+        if method.upper() != 'GET':
+            response = self._send(method, url, **kwargs)
+            # The write may have changed the resource, its children and its parent
+            self.cache.invalidate(url)
+            return response.json() if response.content else {}
+        
+        key = cache_key(url, kwargs.get('params'))
+        body, validators = self.cache.lookup(key)
+        if body is not None:
+            return body
+        if validators:
+            response = self._send(method, url, **{**kwargs, 'headers': {**kwargs.get('headers', {}), **validators}})
+            if response.status_code == 304:
+                body = self.cache.revalidated(key)
+                if body is not None:
+                    return body
+                # Evicted since the lookup; fetch the full response instead
+                response = self._send(method, url, **kwargs)
+        else:
+            response = self._send(method, url, **kwargs)
+        body = response.json() if response.content else {}
+        self.cache.store(key, body, response.headers)
+        return body
+    
+    def _paginate(self, endpoint: str, key: str, page_size: int = DEFAULT_PAGE_SIZE,
+                  params: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the records of a list endpoint, fetching each page only when the previous one is used up
+        
+        Args:
+            endpoint: Path of the list endpoint
+            key: Name of the record list in wrapped responses
+            page_size: Records requested per page
+            params: Extra query parameters sent with every page
+        """
+        pager = Paginator(self.base_url, endpoint, page_size, params)
+        while True:
+            response = self._send('GET', pager.url, params=pager.params)
+            body = response.json() if response.content else {}
+            records = items(body, key)
+            # The same page again means the server ignored the page request
+            if pager.repeated(records):
+                return
+            yield from records
+            if not pager.advance(body, records, response.links.get('next', {}).get('url')):
+                return
+    
     def get_applications(self) -> List[Dict[str, Any]]:
         """Get list of applications"""
         return self._make_request('GET', '/applications')
     
+    def iter_applications(self, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """Iterate over applications lazily, one page at a time"""
+        return self._paginate('/applications', 'applications', page_size)
+    
     def get_application(self, app_id: str) -> Dict[str, Any]:
         """Get application details"""
         return self._make_request('GET', f'/applications/{app_id}')
@@ -71,6 +141,10 @@ class ReleaseAPIClient:
         """Get environments for an application"""
         return self._make_request('GET', f'/applications/{app_id}/environments')
     
+    def iter_environments(self, app_id: str, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """Iterate over the environments of an application lazily, one page at a time"""
+        return self._paginate(f'/applications/{app_id}/environments', 'environments', page_size)
+    
     def create_environment(self, app_id: str, name: str, **kwargs) -> Dict[str, Any]:
         """Create new environment"""
         data = {
@@ -88,25 +162,112 @@ class ReleaseAPIClient:
         """Get deployment history"""
         return self._make_request('GET', f'/applications/{app_id}/environments/{environment_id}/deployments')
     
+    def iter_deployments(self, app_id: str, environment_id: str,
+                         page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over deployment history lazily, one page at a time
+        
+        Pages are fetched only as the caller consumes them, so breaking out of
+        the loop (e.g. at the newest successful deployment) stops downloading.
+        """
+        return self._paginate(
+            f'/applications/{app_id}/environments/{environment_id}/deployments', 'deployments', page_size)
+    
     def get_deployment_status(self, app_id: str, environment_id: str, deployment_id: str) -> Dict[str, Any]:
         """Get deployment status"""
         return self._make_request('GET', f'/applications/{app_id}/environments/{environment_id}/deployments/{deployment_id}')
 
+def watch(targets: List[Tuple[str, str, str]], args) -> int:
+    """Watch deployments until all finish; return 0 only if every one succeeded"""
+    results = asyncio.run(watch_deployments(
+        targets, args.token, args.timeout, min_interval=args.min_interval, max_interval=args.max_interval))
+    print(json.dumps([{k: v for k, v in r.items() if k != 'deployment'} for r in results], indent=2))
+    return 0 if all(r['succeeded'] for r in results) else 1
+
+def deploy_fleet(args) -> int:
+    """Roll out to every target of the targets file in waves; return 0 only if all succeeded"""
+    waves = plan_waves(load_targets(args.targets), args.waves)
+    extra = dict(param.split('=', 1) for param in args.param)
+    if extra:
+        waves = [[target._replace(params={**target.params, **extra}) for target in wave] for wave in waves]
+    if args.dry_run:
+        print(json.dumps([[target._asdict() for target in wave] for wave in waves], indent=2))
+        return 0
+    report = asyncio.run(fleet_deploy(
+        waves, args.token, concurrency=args.concurrency, max_failure_rate=args.max_failure_rate,
+        deploy_timeout=args.timeout, min_interval=args.min_interval, max_interval=args.max_interval))
+    print(json.dumps(report, indent=2))
+    return 0 if report['failed'] == 0 and report['skipped'] == 0 else 1
+
 def main():
     """CLI interface for Release.com API client"""
     import argparse
     
     parser = argparse.ArgumentParser(description='Release.com API Client')
     parser.add_argument('--token', help='API token (or set RELEASE_API_TOKEN env var)')
-    parser.add_argument('command', choices=['apps', 'envs', 'deploy', 'status'])
+    parser.add_argument('command', choices=['apps', 'envs', 'deployments', 'deploy', 'status', 'watch', 'fleet-status', 'fleet-deploy'])
     parser.add_argument('--app-id', help='Application ID')
     parser.add_argument('--env-id', help='Environment ID')
     parser.add_argument('--deployment-id', help='Deployment ID')
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE',
+                        help='Deployment parameter sent with deploy (repeatable)')
+    parser.add_argument('--wait', action='store_true', help='After deploy, watch the deployment until it finishes')
+    parser.add_argument('--deployment', action='append', default=[], metavar='APP_ID:ENV_ID:DEPLOYMENT_ID',
+                        help='Deployment to watch (repeatable)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Give up watching a deployment after this many seconds (default: {DEFAULT_TIMEOUT:g})')
+    parser.add_argument('--min-interval', type=float, default=DEFAULT_MIN_INTERVAL,
+                        help=f'Seconds between polls right after a status change (default: {DEFAULT_MIN_INTERVAL:g})')
+    parser.add_argument('--max-interval', type=float, default=DEFAULT_MAX_INTERVAL,
+                        help=f'Longest poll interval of an idle deployment (default: {DEFAULT_MAX_INTERVAL:g})')
+    parser.add_argument('--targets', help='Targets file for fleet-deploy (YAML or JSON)')
+    parser.add_argument('--waves', default=DEFAULT_WAVES,
+                        help=f'Fleet-deploy wave sizes: counts, percentages or rest (default: {DEFAULT_WAVES})')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Deployments in flight at once within a wave (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--max-failure-rate', type=float, default=DEFAULT_MAX_FAILURE_RATE,
+                        help=f'Share of a wave allowed to fail before the rollout halts '
+                             f'(default: {DEFAULT_MAX_FAILURE_RATE:g})')
+    parser.add_argument('--dry-run', action='store_true', help='Print the fleet-deploy wave plan without deploying')
+    parser.add_argument('--limit', type=int, default=20, help='Deployments to list (default: 20)')
+    parser.add_argument('--cache', action='store_true',
+                        help='Cache GET responses on disk between invocations and revalidate them')
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE,
+                        help=f'Response cache file (default: {DEFAULT_CACHE_FILE})')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                        help=f'Seconds a cached response is used without revalidation (default: {DEFAULT_TTL:g})')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f'Records per page for list commands (default: {DEFAULT_PAGE_SIZE})')
     
     args = parser.parse_args()
     
     try:
-        client = ReleaseAPIClient(api_token=args.token)
+        if args.command == 'fleet-status':
+            # Sweeps every application and environment concurrently
+            from async_client import fleet_status
+            print(json.dumps(asyncio.run(fleet_status(args.token)), indent=2))
+            return 0
+        
+        if args.command == 'fleet-deploy':
+            if not args.targets:
+                print("--targets is required for fleet-deploy command")
+                return 1
+            return deploy_fleet(args)
+        
+        if args.command == 'watch':
+            targets = [parse_target(value) for value in args.deployment]
+            if all([args.app_id, args.env_id, args.deployment_id]):
+                targets.append((args.app_id, args.env_id, args.deployment_id))
+            if not targets:
+                print("--deployment (or --app-id, --env-id and --deployment-id) is required for watch command")
+                return 1
+            return watch(targets, args)
+        
+        cache = None
+        if args.cache:
+            cache = ResponseCache(ttl=args.cache_ttl, path=args.cache_file,
+                                  owner=args.token or os.getenv('RELEASE_API_TOKEN'))
+        client = ReleaseAPIClient(api_token=args.token, cache=cache)
         
         if args.command == 'apps':
             apps = client.get_applications()
@@ -119,6 +280,28 @@ def main():
             envs = client.get_environments(args.app_id)
             print(json.dumps(envs, indent=2))
         
+        elif args.command == 'deployments':
+            if not all([args.app_id, args.env_id]):
+                print("--app-id and --env-id are required for deployments command")
+                return
+            # Only the pages needed for --limit deployments are downloaded
+            page_size = min(args.page_size, args.limit) or 1
+            deployments = list(islice(client.iter_deployments(args.app_id, args.env_id, page_size), args.limit))
+            print(json.dumps(deployments, indent=2))
+        
+        elif args.command == 'deploy':
+            if not all([args.app_id, args.env_id]):
+                print("--app-id and --env-id are required for deploy command")
+                return 1
+            params = dict(param.split('=', 1) for param in args.param)
+            deployment = client.deploy(args.app_id, args.env_id, **params)
+            print(json.dumps(deployment, indent=2))
+            if args.wait:
+                if not isinstance(deployment, dict) or deployment.get('id') is None:
+                    print("Deploy response has no deployment id; cannot wait for the deployment")
+                    return 1
+                return watch([(args.app_id, args.env_id, str(deployment['id']))], args)
+        
         elif args.command == 'status':
             if not all([args.app_id, args.env_id, args.deployment_id]):
                 print("--app-id, --env-id, and --deployment-id are required for status command")
@@ -126,6 +309,10 @@ def main():
             status = client.get_deployment_status(args.app_id, args.env_id, args.deployment_id)
             print(json.dumps(status, indent=2))
         
+        if cache is not None:
+            cache.save()
+            logger.info(f"Response cache: {cache.stats()}")
+        
     except Exception as e:
         logger.error(f"Command failed: {e}")
         return 1
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Multiplexed deployment status watcher
+Tracks many Release.com deployments at once on one AsyncReleaseAPIClient
+
+Every deployment is polled by its own task on a single event loop, so one
+process and one connection pool replace a shell loop per deployment. The
+poll interval of each deployment adapts on its own:
+- right after a status change it drops to min_interval, since the next
+  change tends to follow soon (queued -> deploying -> deployed)
+- each unchanged poll stretches it by backoff, up to active_max_interval
+  while the deployment is in progress and max_interval while it is idle
+- failed polls back off exponentially; after max_failures failures in a
+  row the deployment is reported with status 'error'
+- every sleep is jittered so deployments started together do not poll in lockstep
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from async_client import AsyncReleaseAPIClient
+
+logger = logging.getLogger(__name__)
+
+SUCCESS_STATUSES = frozenset({'deployed', 'succeeded', 'success', 'completed'})
+FAILURE_STATUSES = frozenset({'failed', 'error', 'errored', 'cancelled', 'canceled', 'rolled_back', 'timed_out'})
+TERMINAL_STATUSES = SUCCESS_STATUSES | FAILURE_STATUSES
+# Waiting on something else; nothing is about to change
+IDLE_STATUSES = frozenset({'queued', 'pending', 'waiting', 'scheduled'})
+
+DEFAULT_MIN_INTERVAL = 2.0
+DEFAULT_ACTIVE_MAX_INTERVAL = 10.0
+DEFAULT_MAX_INTERVAL = 60.0
+DEFAULT_BACKOFF = 1.5
+DEFAULT_MAX_FAILURES = 10
+# Used by the CLI so a deployment that never finishes cannot block it forever
+DEFAULT_TIMEOUT = 3600.0
+
+Target = Tuple[str, str, str]
+
+
+def parse_target(value: str) -> Target:
+    """Parse an APP_ID:ENV_ID:DEPLOYMENT_ID watch target"""
+    parts = value.split(':')
+    if len(parts) != 3 or not all(parts):
+        raise ValueError(f"Expected APP_ID:ENV_ID:DEPLOYMENT_ID, got {value!r}")
+    return parts[0], parts[1], parts[2]
+
+
+class DeploymentWatcher:
+    """Poll many deployments concurrently until each reaches a terminal status
+
+    Args:
+        client: Client whose connection pool and concurrency cap are shared by all polls
+        min_interval: Seconds between polls right after a status change
+        active_max_interval: Longest interval while a deployment is in progress
+        max_interval: Longest interval while a deployment is idle or polls fail
+        backoff: Factor the interval grows by after each unchanged or failed poll
+        max_failures: Consecutive failed polls after which a deployment is given up on
+        on_change: Called as on_change(target, old_status, new_status) on every change
+    """
+
+    def __init__(self, client: AsyncReleaseAPIClient, min_interval: float = DEFAULT_MIN_INTERVAL,
+                 active_max_interval: float = DEFAULT_ACTIVE_MAX_INTERVAL,
+                 max_interval: float = DEFAULT_MAX_INTERVAL, backoff: float = DEFAULT_BACKOFF,
+                 max_failures: int = DEFAULT_MAX_FAILURES,
+                 on_change: Optional[Callable[[Target, Optional[str], Optional[str]], None]] = None):
+        self.client = client
+        self.min_interval = min_interval
+        self.active_max_interval = active_max_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_failures = max_failures
+        self.on_change = on_change
+        self.polls = 0
+        self.results: Dict[Target, Dict[str, Any]] = {}
+
+    def next_interval(self, interval: float, status: Optional[str], changed: bool) -> float:
+        """Return the un-jittered interval before the next poll"""
+        if changed:
+            return self.min_interval
+        cap = self.max_interval if status in IDLE_STATUSES else self.active_max_interval
+        return min(cap, max(interval, self.min_interval) * self.backoff)
+
+    @staticmethod
+    def jittered(interval: float) -> float:
+        # Equal jitter: at least half the interval, so polling never gets much faster than planned
+        return interval / 2 + random.uniform(0, interval / 2)
+
+    async def _track(self, target: Target) -> Dict[str, Any]:
+        app_id, env_id, deployment_id = target
+        status: Optional[str] = None
+        interval = self.min_interval
+        failures = 0
+        started = time.monotonic()
+        while True:
+            self.polls += 1
+            try:
+                deployment = await self.client.get_deployment_status(app_id, env_id, deployment_id)
+                failures = 0
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                # Retrying will not fix a bad id or a missing permission
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500 \
+                        and e.response.status_code != 429:
+                    raise
+                failures += 1
+                if failures >= self.max_failures:
+                    raise
+                delay = min(self.max_interval, self.min_interval * self.backoff ** failures)
+                logger.warning(f"Polling {deployment_id} failed ({e}); retrying in about {delay:.0f}s")
+                await asyncio.sleep(self.jittered(delay))
+                continue
+
+            new_status = deployment.get('status')
+            changed = new_status != status
+            if changed:
+                logger.info(f"{app_id}/{env_id}/{deployment_id}: {status or 'unknown'} -> {new_status}")
+                if self.on_change:
+                    self.on_change(target, status, new_status)
+                status = new_status
+            if status in TERMINAL_STATUSES:
+                return {'app_id': app_id, 'env_id': env_id, 'deployment_id': deployment_id,
+                        'status': status, 'succeeded': status in SUCCESS_STATUSES,
+                        'seconds': round(time.monotonic() - started, 1), 'deployment': deployment}
+            interval = self.next_interval(interval, status, changed)
+            await asyncio.sleep(self.jittered(interval))
+
+    async def _record(self, target: Target):
+        try:
+            self.results[target] = await self._track(target)
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Stopped watching {target[2]}: {e}")
+            self.results[target] = {'app_id': target[0], 'env_id': target[1], 'deployment_id': target[2],
+                                    'status': 'error', 'succeeded': False, 'error': str(e)}
+
+    async def watch(self, targets: List[Target], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Watch every target and return their final states in target order
+
+        Returns once all deployments are terminal, or after timeout seconds;
+        deployments still running then are reported with status 'timeout'.
+        """
+        targets = list(dict.fromkeys(targets))
+        if not targets:
+            return []
+        tasks = [asyncio.ensure_future(self._record(target)) for target in targets]
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return [
+            self.results.get(target) or {'app_id': target[0], 'env_id': target[1], 'deployment_id': target[2],
+                                         'status': 'timeout', 'succeeded': False}
+            for target in targets
+        ]
+
+
+async def watch_deployments(targets: List[Target], api_token: Optional[str] = None,
+                            timeout: Optional[float] = None, **kwargs) -> List[Dict[str, Any]]:
+    """Watch deployments until all are terminal; kwargs configure DeploymentWatcher"""
+    async with AsyncReleaseAPIClient(api_token=api_token) as client:
+        watcher = DeploymentWatcher(client, **kwargs)
+        results = await watcher.watch(targets, timeout)
+        logger.info(f"Watched {len(targets)} deployments with {watcher.polls} status polls")
+        return results
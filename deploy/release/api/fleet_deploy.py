@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Wave-scheduled fleet deploys
+Rolls one release out to many customer environments in waves
+
+Targets are deployed wave by wave (by default a single canary, then 10% of
+the fleet, then the rest). Inside a wave at most `concurrency` deployments
+run at once; each one is triggered and then gated on the status endpoint
+until it is terminal. As soon as a wave's failures exceed
+max_failure_rate of its size, no further deployments are started and the
+remaining targets are reported as skipped.
+
+A targets file lists the environments:
+
+    defaults:
+      params: {branch: main}
+    targets:
+      - app_id: app-123
+        env_id: env-456
+        values: customers/claudes-place-values.yaml   # name from global.customerIdentifier
+      - name: other-customer
+        app_id: app-123
+        env_id: env-789
+        params: {branch: hotfix}
+"""
+
+import asyncio
+import logging
+import math
+import os
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import yaml
+
+from async_client import AsyncReleaseAPIClient
+from deployment_watch import DeploymentWatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WAVES = '1,10%,rest'
+DEFAULT_CONCURRENCY = 5
+DEFAULT_MAX_FAILURE_RATE = 0.0
+
+
+class FleetTarget(NamedTuple):
+    """One customer environment to deploy"""
+    name: str
+    app_id: str
+    env_id: str
+    params: Dict[str, Any]
+
+
+def customer_identifier(values_path: str) -> Optional[str]:
+    """Read global.customerIdentifier from a customer Helm values file"""
+    with open(values_path) as f:
+        values = yaml.safe_load(f) or {}
+    return (values.get('global') or {}).get('customerIdentifier')
+
+
+def load_targets(path: str) -> List[FleetTarget]:
+    """Load fleet targets from a YAML or JSON targets file
+
+    Relative values paths are resolved against the current directory, then
+    against the targets file's directory.
+    """
+    with open(path) as f:
+        document = yaml.safe_load(f) or {}
+    if isinstance(document, list):
+        document = {'targets': document}
+    defaults = document.get('defaults') or {}
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    targets = []
+    for index, entry in enumerate(document.get('targets') or []):
+        missing = [key for key in ('app_id', 'env_id') if not entry.get(key)]
+        if missing:
+            raise ValueError(f"Target {index} in {path} is missing {', '.join(missing)}")
+        name = entry.get('name')
+        if not name and entry.get('values'):
+            values = entry['values']
+            if not os.path.exists(values):
+                values = os.path.join(base_dir, values)
+            name = customer_identifier(values)
+        params = {**(defaults.get('params') or {}), **(entry.get('params') or {})}
+        targets.append(FleetTarget(name or f"{entry['app_id']}/{entry['env_id']}",
+                                   str(entry['app_id']), str(entry['env_id']), params))
+
+    names = [target.name for target in targets]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate targets in {path}: {', '.join(duplicates)}")
+    return targets
+
+
+def plan_waves(targets: List[FleetTarget], spec: str = DEFAULT_WAVES) -> List[List[FleetTarget]]:
+    """Split targets into waves
+
+    spec is a comma-separated list of wave sizes: a count ('1'), a share of
+    the whole fleet ('10%', rounded up) or 'rest'. Targets left over after
+    the last wave form one final wave.
+    """
+    waves = []
+    remaining = list(targets)
+    for size in (part.strip() for part in spec.split(',') if part.strip()):
+        if not remaining:
+            break
+        if size == 'rest':
+            count = len(remaining)
+        elif size.endswith('%'):
+            count = max(1, math.ceil(len(targets) * float(size[:-1]) / 100))
+        else:
+            count = int(size)
+            if count < 1:
+                raise ValueError(f"Wave size must be at least 1, got {size!r}")
+        waves.append(remaining[:count])
+        remaining = remaining[count:]
+    if remaining:
+        waves.append(remaining)
+    return waves
+
+
+class FleetDeployer:
+    """Deploy targets wave by wave, halting when a wave fails too often
+
+    Args:
+        client: Client shared by every deployment and status poll
+        concurrency: Deployments in flight at once inside a wave
+        max_failure_rate: Share of a wave allowed to fail before the rollout halts
+        deploy_timeout: Seconds a deployment may take before it counts as failed
+        watch_options: Keyword arguments for the DeploymentWatcher gating each deployment
+    """
+
+    def __init__(self, client: AsyncReleaseAPIClient, concurrency: int = DEFAULT_CONCURRENCY,
+                 max_failure_rate: float = DEFAULT_MAX_FAILURE_RATE, deploy_timeout: Optional[float] = None,
+                 **watch_options):
+        self.client = client
+        self.concurrency = concurrency
+        self.max_failure_rate = max_failure_rate
+        self.deploy_timeout = deploy_timeout
+        self.watcher = DeploymentWatcher(client, **watch_options)
+
+    async def _deploy(self, target: FleetTarget) -> Dict[str, Any]:
+        result = {'name': target.name, 'app_id': target.app_id, 'env_id': target.env_id}
+        try:
+            deployment = await self.client.deploy(target.app_id, target.env_id, **target.params)
+            # A malformed response fails this target only; the wave's failure threshold decides the rollout
+            if not isinstance(deployment, dict) or deployment.get('id') is None:
+                raise ValueError(f"deploy response has no deployment id: {deployment!r:.200}")
+            deployment_id = str(deployment['id'])
+        except Exception as e:
+            logger.error(f"Deploying {target.name} failed: {e}")
+            return {**result, 'status': None, 'succeeded': False, 'error': str(e)}
+        logger.info(f"Deploying {target.name} ({deployment_id})")
+        watched, = await self.watcher.watch([(target.app_id, target.env_id, deployment_id)], self.deploy_timeout)
+        watched.pop('deployment', None)
+        return {**result, **watched}
+
+    async def _run_wave(self, number: int, wave: List[FleetTarget]) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        allowed_failures = math.floor(len(wave) * self.max_failure_rate)
+        failures = 0
+
+        async def run(target: FleetTarget) -> Dict[str, Any]:
+            nonlocal failures
+            async with semaphore:
+                # Stop starting deployments once this wave cannot pass any more
+                if failures > allowed_failures:
+                    return {'name': target.name, 'app_id': target.app_id, 'env_id': target.env_id,
+                            'status': 'skipped', 'succeeded': False, 'wave': number}
+                result = await self._deploy(target)
+            if not result['succeeded']:
+                failures += 1
+            return {**result, 'wave': number}
+
+        return list(await asyncio.gather(*(run(target) for target in wave)))
+
+    async def run(self, waves: List[List[FleetTarget]]) -> Dict[str, Any]:
+        """Run every wave in order and return the rollout report"""
+        results: List[Dict[str, Any]] = []
+        halted_at = None
+        for number, wave in enumerate(waves, 1):
+            if halted_at is not None:
+                results.extend({'name': t.name, 'app_id': t.app_id, 'env_id': t.env_id,
+                                'status': 'skipped', 'succeeded': False, 'wave': number} for t in wave)
+                continue
+            logger.info(f"Wave {number}/{len(waves)}: {len(wave)} targets")
+            wave_results = await self._run_wave(number, wave)
+            results.extend(wave_results)
+            failed = sum(1 for r in wave_results if not r['succeeded'] and r['status'] != 'skipped')
+            failure_rate = failed / len(wave)
+            succeeded = sum(1 for r in wave_results if r['succeeded'])
+            logger.info(f"Wave {number}: {succeeded} of {len(wave)} succeeded")
+            if failure_rate > self.max_failure_rate:
+                logger.error(f"Halting rollout: wave {number} failure rate {failure_rate:.0%} "
+                             f"exceeds {self.max_failure_rate:.0%}")
+                halted_at = number
+        return {
+            'halted_at_wave': halted_at,
+            'succeeded': sum(1 for r in results if r['succeeded']),
+            'failed': sum(1 for r in results if not r['succeeded'] and r['status'] != 'skipped'),
+            'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+            'status_polls': self.watcher.polls,
+            'results': results,
+        }
+
+
+async def fleet_deploy(waves: List[List[FleetTarget]], api_token: Optional[str] = None,
+                       **kwargs) -> Dict[str, Any]:
+    """Roll out to every wave of targets; kwargs configure FleetDeployer"""
+    async with AsyncReleaseAPIClient(api_token=api_token) as client:
+        return await FleetDeployer(client, **kwargs).run(waves)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Pagination helpers for Release.com list endpoints
+Shared by ReleaseAPIClient and AsyncReleaseAPIClient
+
+Pages are requested one at a time by the clients' iterators, so a caller
+that stops iterating never downloads the rest of a listing. Paginator works
+out the request for the next page from whichever scheme a response uses:
+a next link (Link header or links.next), a next cursor, or page numbers.
+Servers that ignore the page parameters are detected (a bare list without
+a next link, more records than requested, or a repeated page), so the
+listing ends instead of fetching the same records forever.
+"""
+
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+DEFAULT_PAGE_SIZE = 50
+
+PAGE_SIZE_PARAM = 'per_page'
+PAGE_PARAM = 'page'
+CURSOR_PARAM = 'cursor'
+
+CURSOR_FIELDS = ('next_cursor', 'nextCursor')
+META_FIELDS = ('meta', 'pagination')
+
+
+def items(body: Any, key: str) -> List[Dict[str, Any]]:
+    """Return the records of a list response, whether bare or wrapped in an object"""
+    if isinstance(body, list):
+        return body
+    if isinstance(body, dict):
+        for name in (key, 'data', 'items', 'results'):
+            if isinstance(body.get(name), list):
+                return body[name]
+    return []
+
+
+class Paginator:
+    """Track the request for the next page of a list endpoint
+
+    Args:
+        base_url: API base URL; next links must stay under it
+        endpoint: Path of the list endpoint
+        page_size: Records requested per page
+        params: Extra query parameters sent with every page
+    """
+
+    def __init__(self, base_url: str, endpoint: str, page_size: int = DEFAULT_PAGE_SIZE,
+                 params: Optional[Dict[str, Any]] = None):
+        self.base_url = base_url.rstrip('/')
+        self.page_size = page_size
+        self.base_params = {**(params or {}), PAGE_SIZE_PARAM: page_size}
+        self.page = 1
+        self._first_record: Optional[Dict[str, Any]] = None
+        self.url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        self.params: Optional[Dict[str, Any]] = dict(self.base_params)
+
+    def _follow(self, link: str) -> bool:
+        url = urljoin(f"{self.base_url}/", link)
+        # Never send the API token to another host
+        if not url.startswith(f"{self.base_url}/"):
+            raise ValueError(f"Refusing to follow pagination link outside {self.base_url}: {url}")
+        self.url = url
+        self.params = None
+        return True
+
+    def repeated(self, records: List[Dict[str, Any]]) -> bool:
+        """Return True if records start like the previous page did
+
+        A repeated page means the server ignored the page request. Call this
+        before using a page's records, so a repeated page is never handed out.
+        """
+        if records and records[0] == self._first_record:
+            return True
+        self._first_record = records[0] if records else None
+        return False
+
+    def advance(self, body: Any, records: List[Dict[str, Any]], next_link: Optional[str] = None) -> bool:
+        """Prepare the request for the next page; return False once the listing is exhausted"""
+        if not records:
+            return False
+        bare = not isinstance(body, dict)
+        if bare:
+            body = {}
+        meta = dict(body)
+        for name in META_FIELDS:
+            if isinstance(body.get(name), dict):
+                meta.update(body[name])
+
+        links = body.get('links')
+        next_link = next_link or (links.get('next') if isinstance(links, dict) else None)
+        if next_link:
+            return self._follow(next_link)
+        # A bare list without a next link carries no pagination at all
+        if bare:
+            return False
+
+        cursor = next((meta[name] for name in CURSOR_FIELDS if meta.get(name)), None)
+        if cursor:
+            self.params = {**self.base_params, CURSOR_PARAM: cursor}
+            return True
+        if meta.get('has_more') is False:
+            return False
+
+        total_pages = meta.get('total_pages')
+        if total_pages is not None:
+            if self.page >= total_pages:
+                return False
+        elif len(records) < self.page_size:
+            return False
+        # A server that ignores per_page returns everything at once
+        if len(records) > self.page_size:
+            return False
+        self.page += 1
+        self.params = {**self.base_params, PAGE_PARAM: self.page}
+        return True
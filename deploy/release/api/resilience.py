@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Resilience layer for HTTP clients
+Shared by the Release.com API client and LLDAP provisioning
+
+ResilientSession is a drop-in requests.Session that adds:
+- a default per-call timeout, so no request can hang forever
+- jittered exponential retry (via tenacity) for transient failures
+- an AIMD concurrency limiter that backs off when latency or errors rise
+- a circuit breaker per endpoint that fails fast while it is down
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeout in seconds applied when a call does not set its own
+DEFAULT_TIMEOUT = (5, 30)
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+# Idempotent calls retry on any of these; others only when the server
+# rejected the request without processing it
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+REJECTED_STATUSES = frozenset({429, 503})
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request while an endpoint's circuit is open"""
+
+
+class RetryableStatus(Exception):
+    """Internal signal that a response status should be retried"""
+
+    def __init__(self, response: requests.Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail immediately. Once reset_timeout has passed a single trial call is
+    let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self, name: str):
+        """Raise CircuitOpenError unless a call may be made now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return
+            if state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+            raise CircuitOpenError(f"Circuit open for {name}; failing fast")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class AIMDLimiter:
+    """Adaptive concurrency limit using additive increase, multiplicative decrease
+
+    Each fast, successful call grows the limit by 1/limit (about +1 per full
+    window of calls). A failure or a call slower than latency_target shrinks
+    it by decrease_factor, at most once per cooldown period.
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 64,
+                 latency_target: float = 2.0, decrease_factor: float = 0.5, cooldown: float = 1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, ok: bool):
+        with self._cond:
+            self.in_flight -= 1
+            if ok and latency <= self.latency_target:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            else:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            self._cond.notify_all()
+
+
+class ResilientSession(requests.Session):
+    """requests.Session with timeouts, retry, adaptive concurrency and circuit breaking
+
+    Args:
+        timeout: Default timeout for calls that do not pass one
+        max_attempts: Attempts per call, including the first
+        backoff_max: Upper bound in seconds for a single retry wait
+        max_concurrency: Upper bound for the adaptive limiter of each endpoint
+        failure_threshold: Consecutive failures that open an endpoint's circuit
+        reset_timeout: Seconds an open circuit waits before a trial call
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_attempts: int = 4, backoff_max: float = 20.0,
+                 max_concurrency: int = 16, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        super().__init__()
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._endpoints: Dict[str, Tuple[CircuitBreaker, AIMDLimiter]] = {}
+        self._endpoints_lock = threading.Lock()
+        # Callables invoked as listener(method, url, exception) before each retry
+        self.retry_listeners: List[Callable[[str, str, BaseException], None]] = []
+
+    def endpoint(self, url: str) -> Tuple[CircuitBreaker, AIMDLimiter]:
+        """Return the circuit breaker and limiter for the origin of url"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._endpoints_lock:
+            if origin not in self._endpoints:
+                self._endpoints[origin] = (
+                    CircuitBreaker(self.failure_threshold, self.reset_timeout),
+                    AIMDLimiter(initial=self.max_concurrency, maximum=self.max_concurrency),
+                )
+            return self._endpoints[origin]
+
+    def request(self, method, url, *args, idempotent: Optional[bool] = None, **kwargs):
+        """Send a request through the breaker, limiter and retry policy
+
+        idempotent overrides the method-based default, e.g. for read-only POSTs.
+        Once retries are exhausted the last response is returned (or the last
+        exception raised) so callers keep their existing status handling.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else REJECTED_STATUSES
+        breaker, limiter = self.endpoint(url)
+
+        def should_retry(exc: BaseException) -> bool:
+            if isinstance(exc, CircuitOpenError):
+                return False
+            if isinstance(exc, RetryableStatus):
+                return True
+            if idempotent:
+                return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+            # A connect timeout means the request never reached the server
+            return isinstance(exc, requests.exceptions.ConnectTimeout)
+
+        def attempt():
+            breaker.before_call(url)
+            limiter.acquire()
+            started = time.monotonic()
+            ok = False
+            try:
+                response = super(ResilientSession, self).request(method, url, *args, **kwargs)
+                ok = response.status_code < 500 and response.status_code != 429
+            finally:
+                limiter.release(time.monotonic() - started, ok)
+                if ok:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+            if response.status_code in retry_statuses:
+                raise RetryableStatus(response)
+            return response
+
+        retrying = Retrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=self._wait,
+            retry=retry_if_exception(should_retry),
+            before_sleep=lambda state: self._before_retry(method, url, state),
+            reraise=True,
+        )
+        try:
+            return retrying(attempt)
+        except RetryableStatus as e:
+            return e.response
+
+    def _before_retry(self, method: str, url: str, retry_state):
+        exc = retry_state.outcome.exception()
+        logger.warning(f"Retrying {method} {url} after {exc!r} "
+                       f"(attempt {retry_state.attempt_number}/{self.max_attempts})")
+        for listener in self.retry_listeners:
+            listener(method, url, exc)
+
+    def _wait(self, retry_state) -> float:
+        """Full-jitter exponential backoff that honours Retry-After on 429/503"""
+        jittered = wait_random_exponential(multiplier=0.5, max=self.backoff_max)(retry_state)
+        exc = retry_state.outcome.exception()
+        if isinstance(exc, RetryableStatus):
+            retry_after = exc.response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max) + random.uniform(0, 0.5)
+        return jittered
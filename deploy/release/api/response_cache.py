@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Conditional-request response cache for the Release.com API client
+
+ResponseCache is an LRU of decoded GET responses bounded by entry count.
+Entries younger than the TTL are served without a request; older entries
+are revalidated with If-None-Match / If-Modified-Since, so a 304 answer
+refreshes them without downloading the body again. Bodies are copied in
+and out, so callers may modify what they get. Writes invalidate the
+cached resource, everything below it and its parent. The cache can be
+persisted to a JSON file so repeated CLI invocations share it.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 60.0
+DEFAULT_CACHE_FILE = os.getenv(
+    'RELEASE_API_CACHE_FILE', os.path.join(os.path.expanduser('~'), '.cache', 'redstone', 'release-api.json'))
+
+
+def cache_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Return the cache key of a GET request: its URL with sorted query parameters"""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()), doseq=True)}"
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of GET responses with TTL and revalidation
+
+    Args:
+        max_entries: Entries kept before the least recently used are evicted
+        ttl: Seconds an entry is served without asking the server
+        path: JSON file the cache is loaded from and saved to (None keeps it in memory)
+        owner: Identifies the API token; a persisted cache of another token is ignored
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 path: Optional[str] = None, owner: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.owner = hashlib.sha256(owner.encode('utf-8')).hexdigest()[:16] if owner else None
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: str):
+        """Return (body, conditional headers) for key
+
+        body is the cached response when the entry is fresh (a hit). Otherwise
+        it is None and the headers hold the validators to revalidate with.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, {}
+            self._entries.move_to_end(key)
+            if time.time() - entry['stored_at'] < self.ttl:
+                self.hits += 1
+                return copy.deepcopy(entry['body']), {}
+            headers = {}
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            return None, headers
+
+    def revalidated(self, key: str) -> Any:
+        """Mark the entry for key as confirmed by a 304 and return its body
+
+        Returns None if the entry was evicted since lookup(); the request must
+        then be repeated without conditional headers.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry['stored_at'] = time.time()
+            self._entries.move_to_end(key)
+            self.revalidations += 1
+            return copy.deepcopy(entry['body'])
+
+    def store(self, key: str, body: Any, headers) -> None:
+        """Remember a 200 response unless the server forbids storing it"""
+        with self._lock:
+            self.misses += 1
+            if 'no-store' in headers.get('Cache-Control', ''):
+                self._entries.pop(key, None)
+                return
+            self._entries[key] = {
+                'body': copy.deepcopy(body),
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'stored_at': time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url: str) -> int:
+        """Drop entries for url, anything below it and its parent resource; return how many"""
+        path = urlsplit(url).path.rstrip('/')
+        parent = path.rsplit('/', 1)[0]
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if urlsplit(key).path.rstrip('/') in (path, parent)
+                or urlsplit(key).path.startswith(f"{path}/")
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit, miss, revalidation and invalidation counters"""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'invalidations': self.invalidations,
+        }
+
+    def load(self) -> None:
+        """Load persisted entries; a missing, corrupt or foreign cache file is ignored"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable response cache {self.path}: {e}")
+            return
+        if data.get('version') != CACHE_VERSION or data.get('owner') != self.owner:
+            return
+        with self._lock:
+            self._entries = OrderedDict(data.get('entries', []))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        """Persist the entries atomically, readable only by the current user"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {'version': CACHE_VERSION, 'owner': self.owner, 'entries': list(self._entries.items())}
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.release-api-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save response cache {self.path}: {e}")
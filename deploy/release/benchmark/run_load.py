@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Offline load benchmark for the Release.com API clients
+Drives ReleaseAPIClient (and the async client) against stand_in.py
+
+The stand-in runs in its own process so the client under test has the
+interpreter to itself. Each scenario runs in a fresh interpreter, so peak
+RSS is per scenario:
+    sweep         list every application and its environments
+    history       find the newest successful deployment of every environment
+    poll          deploy to 200 environments and poll until all are deployed
+    revalidate    fetch every application and its environments twice through
+                  the response cache, revalidating with ETags the second time
+    async_status  latest deployment status of every environment, async client
+
+Per scenario it reports wall time, requests per second, client-side p50/p99
+latency, TCP connections opened (and so connection reuse), 304 answers and
+peak RSS. As with the LDAP benchmarks, results can be saved as JSON and a
+later run fails when a scenario regressed beyond --max-regression:
+
+    python run_load.py --output load.json
+    python run_load.py --baseline load.json --max-regression 0.25
+    python run_load.py --latency-ms 30 --error-rate 0.01 --scenarios poll
+
+`run_load.py record` captures real API responses for stand_in.py --replay.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+from urllib.request import Request, urlopen
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+API_DIR = BENCHMARK_DIR.parent / 'api'
+sys.path.insert(0, str(API_DIR))
+
+RESULTS_VERSION = 1
+SCENARIOS = ('sweep', 'history', 'poll', 'revalidate', 'async_status')
+DEFAULT_MAX_REGRESSION = 0.25
+TOKEN = 'benchmark-token'
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def sync_client(url: str, latencies: List[float], cache=None):
+    from client import ReleaseAPIClient
+
+    client = ReleaseAPIClient(api_token=TOKEN, base_url=url, cache=cache)
+    client.session.hooks['response'].append(lambda r, *args, **kwargs: latencies.append(r.elapsed.total_seconds()))
+    return client
+
+
+def environments(client) -> List[tuple]:
+    return [(app['id'], env['id']) for app in client.iter_applications() for env in client.iter_environments(app['id'])]
+
+
+def bench_sweep(args, latencies):
+    client = sync_client(args.url, latencies)
+    return len(environments(client))
+
+
+def bench_history(args, latencies):
+    client = sync_client(args.url, latencies)
+    found = 0
+    for app_id, env_id in environments(client):
+        # Pages stop downloading at the first successful deployment
+        for deployment in client.iter_deployments(app_id, env_id, page_size=args.page_size):
+            if deployment.get('status') == 'deployed':
+                found += 1
+                break
+    return found
+
+
+def bench_poll(args, latencies):
+    client = sync_client(args.url, latencies)
+    targets = environments(client)
+    targets = [targets[i % len(targets)] for i in range(args.deployments)]
+
+    def deploy_and_poll(target):
+        app_id, env_id = target
+        deployment = client.deploy(app_id, env_id, branch='main')
+        while True:
+            status = client.get_deployment_status(app_id, env_id, deployment['id'])['status']
+            if status in ('deployed', 'failed'):
+                return status
+            time.sleep(args.poll_interval)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        return sum(1 for status in pool.map(deploy_and_poll, targets) if status == 'deployed')
+
+
+def bench_revalidate(args, latencies):
+    from response_cache import ResponseCache
+
+    # A zero TTL makes every repeat a conditional request
+    client = sync_client(args.url, latencies, ResponseCache(ttl=0))
+    app_ids = [app['id'] for app in client.iter_applications()]
+    fetched = 0
+    for _ in range(2):
+        for app_id in app_ids:
+            client.get_application(app_id)
+            client.get_environments(app_id)
+            fetched += 2
+    return fetched
+
+
+def bench_async_status(args, latencies):
+    from async_client import AsyncReleaseAPIClient
+
+    async def run():
+        async def started(request):
+            request.extensions['started'] = time.perf_counter()
+
+        async def finished(response):
+            latencies.append(time.perf_counter() - response.request.extensions['started'])
+
+        async with AsyncReleaseAPIClient(api_token=TOKEN, base_url=args.url,
+                                         max_concurrency=args.concurrency) as client:
+            client.client.event_hooks = {'request': [started], 'response': [finished]}
+            return len(await client.latest_deployment_statuses())
+
+    return asyncio.run(run())
+
+
+def run_child(args):
+    """Run one scenario in this process and print its result as JSON"""
+    import logging
+    logging.disable(logging.WARNING)
+    latencies: List[float] = []
+    bench = globals()[f'bench_{args.child}']
+    started = time.perf_counter()
+    try:
+        items = bench(args, latencies)
+        ok = True
+    except Exception as e:
+        print(f'{args.child} failed: {e}', file=sys.stderr)
+        items, ok = 0, False
+    wall = time.perf_counter() - started
+    print(json.dumps({
+        'ok': ok,
+        'wall_seconds': wall,
+        'items': items,
+        'client_requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }))
+    return 0
+
+
+def stand_in_call(url: str, path: str, method: str = 'GET') -> Dict[str, Any]:
+    with urlopen(Request(f'{url}{path}', method=method, data=b'' if method == 'POST' else None), timeout=10) as resp:
+        return json.load(resp)
+
+
+def start_stand_in(args):
+    cmd = [
+        sys.executable, str(BENCHMARK_DIR / 'stand_in.py'), '--port', '0',
+        '--apps', str(args.apps), '--envs-per-app', str(args.envs_per_app), '--history', str(args.history),
+        '--page-size', str(args.page_size), '--latency-ms', str(args.latency_ms),
+        '--jitter-ms', str(args.jitter_ms), '--error-rate', str(args.error_rate), '--seed', str(args.seed),
+    ]
+    if args.replay:
+        cmd += ['--replay', args.replay]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    url = proc.stdout.readline().strip()
+    if not url:
+        proc.kill()
+        raise RuntimeError('stand-in server did not start')
+    return proc, url
+
+
+def spawn(scenario: str, url: str, args) -> Dict[str, Any]:
+    """Run a scenario in a fresh interpreter and return its result"""
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()), '--child', scenario, '--url', url,
+        '--page-size', str(args.page_size), '--deployments', str(args.deployments),
+        '--concurrency', str(args.concurrency), '--poll-interval', str(args.poll_interval),
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f'{scenario} benchmark crashed:\n{proc.stderr[-2000:]}')
+    return json.loads(lines[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args) -> Dict[str, Any]:
+    results = []
+    server, url = start_stand_in(args)
+    try:
+        for scenario in args.scenarios.split(','):
+            print(f'⏱️  {scenario}...', flush=True)
+            stand_in_call(url, '/__reset', 'POST')
+            result = spawn(scenario, url, args)
+            stats = stand_in_call(url, '/__stats')
+            wall = result['wall_seconds']
+            results.append({
+                'scenario': scenario,
+                **result,
+                **stats,
+                'wall_seconds': round(wall, 4),
+                'requests_per_second': round(stats['requests'] / wall, 1) if wall else None,
+            })
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        'version': RESULTS_VERSION,
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'settings': {key: getattr(args, key) for key in (
+            'apps', 'envs_per_app', 'history', 'page_size', 'latency_ms', 'jitter_ms', 'error_rate',
+            'deployments', 'concurrency', 'poll_interval', 'seed', 'replay')},
+        'results': results,
+    }
+
+
+def print_results(report):
+    print(f"\n📊 Load benchmark results ({report['commit'] or 'unknown commit'}, Python {report['python']})")
+    print(f"  {'scenario':<13} {'wall s':>8} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'conns':>6} {'req/conn':>9} {'304s':>6} {'RSS MB':>7}")
+    for r in report['results']:
+        marker = '' if r['ok'] else '  ✗ failed'
+        print(f"  {r['scenario']:<13} {r['wall_seconds']:>8.3f} {r['requests']:>9} "
+              f"{r['requests_per_second'] or 0:>8.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['connections']:>6} {r['requests_per_connection'] or 0:>9} {r['not_modified']:>6} "
+              f"{r['peak_rss_mb']:>7.1f}{marker}")
+
+
+def compare(report, baseline, max_regression) -> List[str]:
+    """Return a description of every result that regressed against the baseline"""
+    previous = {r['scenario']: r for r in baseline.get('results', [])}
+    regressions = []
+    for r in report['results']:
+        base = previous.get(r['scenario'])
+        if base is None:
+            continue
+        for metric in ('wall_seconds', 'p99_ms', 'peak_rss_mb', 'connections'):
+            if base[metric] and r[metric] > base[metric] * (1 + max_regression):
+                regressions.append(f"{r['scenario']}: {metric} {base[metric]} -> {r[metric]} "
+                                   f"(+{r[metric] / base[metric] - 1:.0%})")
+    return regressions
+
+
+def record(args) -> int:
+    """Capture GET responses of a sweep against a real API for stand_in.py --replay"""
+    from urllib.parse import urlsplit
+
+    from client import ReleaseAPIClient
+
+    responses = []
+
+    def capture(response, *_, **__):
+        if response.request.method == 'GET' and response.content:
+            parts = urlsplit(response.request.url)
+            responses.append({'method': 'GET', 'path': parts.path, 'query': parts.query,
+                              'status': response.status_code, 'body': response.json()})
+
+    client = ReleaseAPIClient(api_token=args.token, base_url=args.base_url)
+    client.session.hooks['response'].append(capture)
+    for app_id, env_id in environments(client):
+        # The newest page of history is enough to replay status sweeps
+        next(iter(client.iter_deployments(app_id, env_id, page_size=args.page_size)), None)
+
+    # Recordings hold real application data, so keep them private
+    fd = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'version': RESULTS_VERSION, 'base_url': args.base_url, 'responses': responses}, f, indent=2)
+    print(f'💾 Recorded {len(responses)} responses to {args.output}')
+    return 0
+
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['record']:
+        parser = argparse.ArgumentParser(prog='run_load.py record',
+                                         description='Record real API responses for stand_in.py --replay')
+        parser.add_argument('record')
+        parser.add_argument('--token', default=os.getenv('RELEASE_API_TOKEN'),
+                            help='API token (or set RELEASE_API_TOKEN env var)')
+        parser.add_argument('--base-url', default='https://api.release.com', help='API to record')
+        parser.add_argument('--page-size', type=int, default=50, help='Records per page (default: 50)')
+        parser.add_argument('--output', required=True, help='Recording file to write')
+        return parser.parse_args(argv)
+
+    parser = argparse.ArgumentParser(description='Benchmark the Release.com API clients against a local stand-in')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument('--apps', type=int, default=20, help='Stand-in applications (default: 20)')
+    parser.add_argument('--envs-per-app', type=int, default=5, help='Environments per application (default: 5)')
+    parser.add_argument('--history', type=int, default=200, help='Past deployments per environment (default: 200)')
+    parser.add_argument('--page-size', type=int, default=50, help='Page size of list routes (default: 50)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Stand-in latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Stand-in random extra latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of a stand-in 503 response')
+    parser.add_argument('--deployments', type=int, default=200, help='Deployments in the poll scenario (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Concurrent pollers and async calls in flight (default: 16)')
+    parser.add_argument('--poll-interval', type=float, default=0.05,
+                        help='Seconds between status polls in the poll scenario (default: 0.05)')
+    parser.add_argument('--seed', type=int, default=0, help='Stand-in data seed (default: 0)')
+    parser.add_argument('--replay', help='Recording to serve from the stand-in')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Results JSON of an earlier run to compare against')
+    parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+                        help=f'Allowed regression as a fraction (default: {DEFAULT_MAX_REGRESSION})')
+    # Internal: run a single scenario in this process
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios.split(',')) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if getattr(args, 'record', None):
+        if not args.token:
+            print('--token or RELEASE_API_TOKEN is required to record')
+            return 1
+        return record(args)
+    if args.child:
+        return run_child(args)
+
+    report = run_suite(args)
+    print_results(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\n💾 Results written to {args.output}')
+
+    failed = [r for r in report['results'] if not r['ok']]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print(f'\n❌ {len(regressions)} regressions beyond {args.max_regression:.0%}:')
+            for line in regressions:
+                print(f'  {line}')
+        else:
+            print(f'\n✅ No regressions beyond {args.max_regression:.0%} against {args.baseline}')
+    return 1 if failed or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Release.com API
+Serves the routes ReleaseAPIClient uses so its performance can be measured offline
+
+Synthetic applications, environments and deployment histories are
+generated from a seed; a recording made with `run_load.py record` can be
+replayed on top of them. List routes paginate with per_page/page (capped
+by --page-size) and report total_pages. GET responses carry an ETag and
+answer If-None-Match with 304. Deployments created with POST progress
+queued -> deploying -> deployed as they are polled.
+
+Latency and 503 error injection are configurable. The server counts
+requests and TCP connections; GET /__stats returns the counters and
+POST /__reset clears them.
+
+    python stand_in.py --port 18080 --latency-ms 20 --error-rate 0.01
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_APPS = 20
+DEFAULT_ENVS_PER_APP = 5
+DEFAULT_HISTORY = 200
+DEFAULT_PAGE_SIZE = 50
+# Status polls a created deployment answers before it is deployed
+DEFAULT_POLLS_TO_FINISH = 4
+
+APP_ROUTE = re.compile(r'^/applications/([^/]+)$')
+ENVS_ROUTE = re.compile(r'^/applications/([^/]+)/environments$')
+DEPLOYMENTS_ROUTE = re.compile(r'^/applications/([^/]+)/environments/([^/]+)/deployments$')
+DEPLOYMENT_ROUTE = re.compile(r'^/applications/([^/]+)/environments/([^/]+)/deployments/([^/]+)$')
+
+
+class StandInAPI:
+    """Thread-safe in-memory Release.com API served on a background thread
+
+    Args:
+        apps: Number of synthetic applications
+        envs_per_app: Environments per application
+        history: Past deployments per environment, newest first
+        page_size: Largest page a list route returns
+        latency: Seconds added to every response
+        jitter: Upper bound of extra random latency in seconds
+        error_rate: Probability that a request is answered with 503 before it is processed
+        polls_to_finish: Status polls of a created deployment before it is deployed
+        seed: Seed for the data, latency and error injection
+        recording: Recorded responses replayed before the synthetic routes
+    """
+
+    def __init__(self, apps: int = DEFAULT_APPS, envs_per_app: int = DEFAULT_ENVS_PER_APP,
+                 history: int = DEFAULT_HISTORY, page_size: int = DEFAULT_PAGE_SIZE, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, polls_to_finish: int = DEFAULT_POLLS_TO_FINISH,
+                 seed: int = 0, recording: Optional[List[Dict[str, Any]]] = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.polls_to_finish = polls_to_finish
+        self.host = host
+        self.port = port
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._ids = itertools.count(1)
+        self.replay = {}
+        for record in recording or []:
+            self.replay[(record['method'], record['path'], record.get('query', ''))] = record
+        self.reset_stats()
+
+        self.apps = [{'id': f'app-{a:03d}', 'name': f'Application {a}'} for a in range(apps)]
+        self.environments = {
+            app['id']: [{'id': f'env-{a:03d}-{e}', 'name': f'env-{e}', 'application_id': app['id']}
+                        for e in range(envs_per_app)]
+            for a, app in enumerate(self.apps)
+        }
+        self.deployments: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        started = time.time() - history * 3600
+        for app_id, envs in self.environments.items():
+            for env in envs:
+                self.deployments[(app_id, env['id'])] = [
+                    {'id': f'{env["id"]}-d{n}', 'status': 'failed' if self._rng.random() < 0.1 else 'deployed',
+                     'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(started + n * 3600))}
+                    for n in range(history, 0, -1)
+                ]
+        self.by_id = {d['id']: d for history in self.deployments.values() for d in history}
+        # Deployment id -> [deployment, status polls answered]
+        self.created: Dict[str, List[Any]] = {}
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self._server.server_address[1]}'
+
+    def start(self) -> str:
+        """Start serving and return the base URL"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+            self.not_modified = 0
+            self.injected_errors = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'requests_per_connection': round(self.requests / self.connections, 1) if self.connections else None,
+                'not_modified': self.not_modified,
+                'injected_errors': self.injected_errors,
+            }
+
+    def _delay(self) -> bool:
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = bool(self.error_rate) and self._rng.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def _page(self, records: List[Dict[str, Any]], key: str, query: Dict[str, str]) -> Dict[str, Any]:
+        per_page = max(1, min(int(query.get('per_page', self.page_size)), self.page_size))
+        page = max(1, int(query.get('page', 1)))
+        total_pages = max(1, -(-len(records) // per_page))
+        return {key: records[(page - 1) * per_page:page * per_page],
+                'meta': {'page': page, 'per_page': per_page, 'total_pages': total_pages}}
+
+    def handle(self, method: str, path: str, query: Dict[str, str], body: Dict[str, Any]) -> Tuple[int, Any]:
+        """Answer one API request with (status, response body)"""
+        with self._lock:
+            if method == 'GET':
+                if path == '/applications':
+                    return 200, self._page(self.apps, 'applications', query)
+                match = APP_ROUTE.match(path)
+                if match:
+                    app = next((a for a in self.apps if a['id'] == match.group(1)), None)
+                    return (200, app) if app else (404, {'error': 'application not found'})
+                match = ENVS_ROUTE.match(path)
+                if match:
+                    if match.group(1) not in self.environments:
+                        return 404, {'error': 'application not found'}
+                    return 200, self._page(self.environments[match.group(1)], 'environments', query)
+                match = DEPLOYMENTS_ROUTE.match(path)
+                if match:
+                    history = self.deployments.get((match.group(1), match.group(2)))
+                    if history is None:
+                        return 404, {'error': 'environment not found'}
+                    return 200, self._page(history, 'deployments', query)
+                match = DEPLOYMENT_ROUTE.match(path)
+                if match:
+                    return self._deployment_status(match.group(3))
+            elif method == 'POST':
+                match = DEPLOYMENTS_ROUTE.match(path)
+                if match and (match.group(1), match.group(2)) in self.deployments:
+                    deployment = {'id': f'{match.group(2)}-new{next(self._ids)}', 'status': 'queued',
+                                  'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), **body}
+                    self.created[deployment['id']] = [deployment, 0]
+                    self.by_id[deployment['id']] = deployment
+                    self.deployments[(match.group(1), match.group(2))].insert(0, deployment)
+                    return 201, deployment
+            return 404, {'error': 'not found'}
+
+    def _deployment_status(self, deployment_id: str) -> Tuple[int, Any]:
+        created = self.created.get(deployment_id)
+        if created is not None:
+            deployment, polls = created
+            created[1] = polls + 1
+            if polls + 1 >= self.polls_to_finish:
+                deployment['status'] = 'deployed'
+            elif polls + 1 >= self.polls_to_finish // 2:
+                deployment['status'] = 'deploying'
+            return 200, deployment
+        deployment = self.by_id.get(deployment_id)
+        return (200, deployment) if deployment else (404, {'error': 'deployment not found'})
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections open so client connection pooling behaves as in production
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; avoid Nagle/delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                # Counted on the first API request, so /__stats and /__reset calls are left out
+                self.counted = False
+
+            def _respond(self, status: int, body: Any, etag: Optional[str] = None):
+                data = b'' if body is None else json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if etag:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _dispatch(self, method: str):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                parts = urlsplit(self.path)
+                if parts.path == '/__stats':
+                    return self._respond(200, api.stats())
+                if parts.path == '/__reset':
+                    api.reset_stats()
+                    return self._respond(200, {})
+
+                with api._lock:
+                    api.requests += 1
+                    if not self.counted:
+                        api.connections += 1
+                        self.counted = True
+                if api._delay():
+                    return self._respond(503, {'error': 'injected failure'})
+                if not self.headers.get('Authorization', '').startswith('Bearer '):
+                    return self._respond(401, {'error': 'missing token'})
+
+                record = api.replay.get((method, parts.path, parts.query)) or api.replay.get((method, parts.path, ''))
+                if record is not None:
+                    status, body = record['status'], record['body']
+                else:
+                    try:
+                        payload = json.loads(raw) if raw else {}
+                    except ValueError:
+                        return self._respond(400, {'error': 'invalid JSON'})
+                    query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                    status, body = api.handle(method, parts.path, query, payload)
+
+                etag = None
+                if method == 'GET' and status == 200:
+                    etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()[:16] + '"'
+                    if self.headers.get('If-None-Match') == etag:
+                        with api._lock:
+                            api.not_modified += 1
+                        return self._respond(304, None, etag)
+                self._respond(status, body, etag)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def load_recording(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return json.load(f)['responses']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the Release.com API')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=18080, help='Port to listen on, 0 for any (default: 18080)')
+    parser.add_argument('--apps', type=int, default=DEFAULT_APPS, help=f'Applications (default: {DEFAULT_APPS})')
+    parser.add_argument('--envs-per-app', type=int, default=DEFAULT_ENVS_PER_APP,
+                        help=f'Environments per application (default: {DEFAULT_ENVS_PER_APP})')
+    parser.add_argument('--history', type=int, default=DEFAULT_HISTORY,
+                        help=f'Past deployments per environment (default: {DEFAULT_HISTORY})')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f'Largest page a list route returns (default: {DEFAULT_PAGE_SIZE})')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latency added to every response')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Upper bound of extra random latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of answering 503')
+    parser.add_argument('--polls-to-finish', type=int, default=DEFAULT_POLLS_TO_FINISH,
+                        help=f'Status polls before a created deployment is deployed (default: {DEFAULT_POLLS_TO_FINISH})')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic data seed (default: 0)')
+    parser.add_argument('--replay', help='Recording from run_load.py record to serve before the synthetic data')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    api = StandInAPI(args.apps, args.envs_per_app, args.history, args.page_size, args.latency_ms / 1000,
+                     args.jitter_ms / 1000, args.error_rate, args.polls_to_finish, args.seed,
+                     load_recording(args.replay) if args.replay else None, args.host, args.port)
+    # The first line is read by run_load.py to find the port
+    print(api.start(), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+# The API modules import their siblings directly, as they do when run as scripts
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+
+class FakeAPI:
+    """Local HTTP server answering every request with respond(method, path, query, headers)
+
+    respond returns (status, body) or (status, body, headers). Requests are
+    recorded as (method, path, query) tuples.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _dispatch(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                parts = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                api.requests.append((method, parts.path, query))
+                status, body, *extra = api.respond(method, parts.path, query, self.headers)
+                data = b'' if body is None else json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for name, value in (extra[0] if extra else {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_api():
+    servers = []
+
+    def start(respond):
+        server = FakeAPI(respond)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
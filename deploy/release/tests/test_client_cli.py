@@ -0,0 +1,25 @@
+import client
+
+
+def run_cli(monkeypatch, *argv):
+    monkeypatch.setattr('sys.argv', ['client.py', *argv])
+    return client.main()
+
+
+def test_deploy_wait_without_deployment_id(monkeypatch, capsys):
+    monkeypatch.setattr(client.ReleaseAPIClient, 'deploy', lambda self, app_id, env_id, **kw: {'status': 'queued'})
+    watched = []
+    monkeypatch.setattr(client, 'watch', lambda targets, args: watched.append(targets) or 0)
+
+    assert run_cli(monkeypatch, 'deploy', '--token', 't', '--app-id', 'app', '--env-id', 'env', '--wait') == 1
+    assert 'no deployment id' in capsys.readouterr().out
+    assert watched == []
+
+
+def test_deploy_wait_watches_created_deployment(monkeypatch):
+    monkeypatch.setattr(client.ReleaseAPIClient, 'deploy', lambda self, app_id, env_id, **kw: {'id': 42})
+    watched = []
+    monkeypatch.setattr(client, 'watch', lambda targets, args: watched.append(targets) or 0)
+
+    assert run_cli(monkeypatch, 'deploy', '--token', 't', '--app-id', 'app', '--env-id', 'env', '--wait') == 0
+    assert watched == [[('app', 'env', '42')]]
@@ -0,0 +1,93 @@
+import asyncio
+import re
+
+from async_client import AsyncReleaseAPIClient
+from deployment_watch import DeploymentWatcher, parse_target
+
+DEPLOYMENT = re.compile(r'^/applications/[^/]+/environments/[^/]+/deployments/([^/]+)$')
+
+
+def progressing(statuses):
+    """Answer each deployment's polls with its next status, repeating the last one"""
+    polls = {}
+
+    def respond(method, path, query, headers):
+        deployment_id = DEPLOYMENT.match(path).group(1)
+        remaining = statuses.get(deployment_id)
+        if remaining is None:
+            return 404, {'error': 'not found'}
+        index = polls[deployment_id] = polls.get(deployment_id, -1) + 1
+        status = remaining[min(index, len(remaining) - 1)]
+        if isinstance(status, int):
+            return status, {'error': 'unavailable'}
+        return 200, {'id': deployment_id, 'status': status}
+    return respond
+
+
+def watch(url, targets, timeout=None, **options):
+    async def run():
+        async with AsyncReleaseAPIClient(api_token='token', base_url=url, max_attempts=1) as client:
+            watcher = DeploymentWatcher(client, min_interval=0.01, active_max_interval=0.02,
+                                        max_interval=0.02, **options)
+            return await watcher.watch(targets, timeout), watcher
+    return asyncio.run(run())
+
+
+def test_deployments_are_watched_until_terminal(fake_api):
+    api = fake_api(progressing({'d1': ['queued', 'deploying', 'deployed'], 'd2': ['deploying', 'failed']}))
+    changes = []
+
+    results, watcher = watch(api.url, [('app', 'env', 'd1'), ('app', 'env', 'd2')],
+                             on_change=lambda target, old, new: changes.append((target[2], new)))
+
+    assert [(r['deployment_id'], r['status'], r['succeeded']) for r in results] == [
+        ('d1', 'deployed', True), ('d2', 'failed', False)]
+    assert ('d1', 'deploying') in changes
+    assert watcher.polls == 5
+
+
+def test_missing_deployment_stops_only_itself(fake_api):
+    api = fake_api(progressing({'d1': ['deploying', 'deployed']}))
+
+    results, _ = watch(api.url, [('app', 'env', 'd1'), ('app', 'env', 'gone')])
+
+    assert [r['status'] for r in results] == ['deployed', 'error']
+
+
+def test_consecutive_failures_give_up_with_an_error(fake_api):
+    api = fake_api(progressing({'d1': [503]}))
+
+    results, watcher = watch(api.url, [('app', 'env', 'd1')], max_failures=3)
+
+    assert results[0]['status'] == 'error'
+    assert not results[0]['succeeded']
+    assert watcher.polls == 3
+
+
+def test_transient_failures_are_retried(fake_api):
+    api = fake_api(progressing({'d1': [503, 503, 'deploying', 'deployed']}))
+
+    results, _ = watch(api.url, [('app', 'env', 'd1')], max_failures=3)
+
+    assert results[0]['status'] == 'deployed'
+
+
+def test_unfinished_deployments_time_out(fake_api):
+    api = fake_api(progressing({'d1': ['deploying']}))
+
+    results, _ = watch(api.url, [('app', 'env', 'd1')], timeout=0.1)
+
+    assert results[0]['status'] == 'timeout'
+
+
+def test_interval_resets_on_change_and_backs_off_when_idle():
+    watcher = DeploymentWatcher(None, min_interval=1, active_max_interval=4, max_interval=10, backoff=2)
+
+    assert watcher.next_interval(8, 'deploying', changed=True) == 1
+    assert watcher.next_interval(3, 'deploying', changed=False) == 4
+    assert watcher.next_interval(8, 'queued', changed=False) == 10
+    assert 0.5 <= watcher.jittered(1) <= 1
+
+
+def test_parse_target():
+    assert parse_target('app:env:42') == ('app', 'env', '42')
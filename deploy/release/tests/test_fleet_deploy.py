@@ -0,0 +1,102 @@
+import asyncio
+import itertools
+
+import pytest
+
+from async_client import AsyncReleaseAPIClient
+from fleet_deploy import FleetDeployer, FleetTarget, load_targets, plan_waves
+
+
+def targets(count):
+    return [FleetTarget(f'customer-{i}', 'app', f'env-{i}', {}) for i in range(count)]
+
+
+class FleetAPI:
+    """Deployments to environments in failing end up failed, those in broken get no id"""
+
+    def __init__(self, failing=(), broken=()):
+        self.failing = set(failing)
+        self.broken = set(broken)
+        self.deployments = {}
+        self.ids = itertools.count(1)
+
+    def __call__(self, method, path, query, headers):
+        env_id = path.split('/')[4]
+        if method == 'POST':
+            if env_id in self.broken:
+                return 201, {'status': 'queued'}
+            deployment_id = f'd{next(self.ids)}'
+            self.deployments[deployment_id] = 'failed' if env_id in self.failing else 'deployed'
+            return 201, {'id': deployment_id}
+        return 200, {'status': self.deployments[path.rsplit('/', 1)[1]]}
+
+
+def roll_out(url, waves, **options):
+    async def run():
+        async with AsyncReleaseAPIClient(api_token='token', base_url=url, max_attempts=1) as client:
+            deployer = FleetDeployer(client, min_interval=0.01, max_interval=0.02, **options)
+            return await deployer.run(waves)
+    return asyncio.run(run())
+
+
+def test_plan_waves():
+    waves = plan_waves(targets(25), '1,10%,rest')
+    assert [len(wave) for wave in waves] == [1, 3, 21]
+    assert [len(wave) for wave in plan_waves(targets(5), '2,2')] == [2, 2, 1]
+    with pytest.raises(ValueError):
+        plan_waves(targets(5), '0')
+
+
+def test_all_waves_succeed(fake_api):
+    api = fake_api(FleetAPI())
+
+    report = roll_out(api.url, plan_waves(targets(6), '1,rest'))
+
+    assert (report['halted_at_wave'], report['succeeded'], report['failed'], report['skipped']) == (None, 6, 0, 0)
+
+
+def test_failed_canary_halts_the_rollout(fake_api):
+    fleet = FleetAPI(failing={'env-0'})
+    api = fake_api(fleet)
+
+    report = roll_out(api.url, plan_waves(targets(6), '1,rest'))
+
+    assert (report['halted_at_wave'], report['failed'], report['skipped']) == (1, 1, 5)
+    assert len(fleet.deployments) == 1
+
+
+def test_deploy_response_without_id_fails_only_its_target(fake_api):
+    api = fake_api(FleetAPI(broken={'env-3'}))
+
+    report = roll_out(api.url, plan_waves(targets(10), '1,rest'), max_failure_rate=0.2)
+
+    failed = [r for r in report['results'] if not r['succeeded']]
+    assert [r['name'] for r in failed] == ['customer-3']
+    assert 'no deployment id' in failed[0]['error']
+    assert (report['halted_at_wave'], report['succeeded']) == (None, 9)
+
+
+def test_load_targets(tmp_path):
+    values = tmp_path / 'customer-values.yaml'
+    values.write_text('global:\n  customerIdentifier: acme\n')
+    path = tmp_path / 'targets.yaml'
+    path.write_text(
+        'defaults:\n'
+        '  params: {branch: main}\n'
+        'targets:\n'
+        '  - {app_id: app, env_id: env-1, values: customer-values.yaml}\n'
+        '  - {name: other, app_id: app, env_id: env-2, params: {branch: hotfix}}\n'
+    )
+
+    assert load_targets(str(path)) == [
+        FleetTarget('acme', 'app', 'env-1', {'branch': 'main'}),
+        FleetTarget('other', 'app', 'env-2', {'branch': 'hotfix'}),
+    ]
+
+
+def test_duplicate_targets_are_rejected(tmp_path):
+    path = tmp_path / 'targets.yaml'
+    path.write_text('targets:\n  - {name: a, app_id: app, env_id: e1}\n  - {name: a, app_id: app, env_id: e2}\n')
+
+    with pytest.raises(ValueError, match='Duplicate'):
+        load_targets(str(path))
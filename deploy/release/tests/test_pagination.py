@@ -0,0 +1,82 @@
+import asyncio
+
+from async_client import AsyncReleaseAPIClient
+from client import ReleaseAPIClient
+from pagination import Paginator
+
+DEPLOYMENTS = [{'id': f'd{i}', 'status': 'deployed'} for i in range(120, 0, -1)]
+PATH = '/applications/app/environments/env/deployments'
+
+
+def ignores_page_params(records):
+    """A server that always returns the first page_size records, bare or wrapped"""
+    def respond(method, path, query, headers):
+        return 200, records
+    return respond
+
+
+def paged(method, path, query, headers):
+    size = int(query.get('per_page', 50))
+    page = int(query.get('page', 1))
+    return 200, {'deployments': DEPLOYMENTS[(page - 1) * size:page * size],
+                 'meta': {'total_pages': -(-len(DEPLOYMENTS) // size)}}
+
+
+def sync_ids(url, page_size):
+    client = ReleaseAPIClient(api_token='token', base_url=url)
+    return [d['id'] for d in client.iter_deployments('app', 'env', page_size=page_size)]
+
+
+def async_ids(url, page_size):
+    async def run():
+        async with AsyncReleaseAPIClient(api_token='token', base_url=url) as client:
+            return [d['id'] async for d in client.iter_deployments('app', 'env', page_size=page_size)]
+    return asyncio.run(run())
+
+
+def test_bare_list_ends_the_listing():
+    pager = Paginator('http://api', PATH, 50)
+    assert not pager.advance(DEPLOYMENTS[:50], DEPLOYMENTS[:50])
+
+
+def test_oversized_page_ends_the_listing():
+    pager = Paginator('http://api', PATH, 10)
+    assert not pager.advance({'deployments': DEPLOYMENTS}, DEPLOYMENTS)
+
+
+def test_repeated_page_is_detected_before_use():
+    pager = Paginator('http://api', PATH, 50)
+    page = DEPLOYMENTS[:50]
+    assert not pager.repeated(page)
+    assert pager.advance({'deployments': page}, page)
+    assert pager.repeated(page)
+
+
+def test_server_ignoring_page_params_with_bare_list(fake_api):
+    api = fake_api(ignores_page_params(DEPLOYMENTS[:50]))
+    for ids in (sync_ids(api.url, 50), async_ids(api.url, 50)):
+        assert ids == [d['id'] for d in DEPLOYMENTS[:50]]
+    assert len(api.requests) == 2
+
+
+def test_server_ignoring_page_params_with_wrapped_page(fake_api):
+    api = fake_api(ignores_page_params({'deployments': DEPLOYMENTS[:50]}))
+    for ids in (sync_ids(api.url, 50), async_ids(api.url, 50)):
+        # The repeated second page is never yielded
+        assert ids == [d['id'] for d in DEPLOYMENTS[:50]]
+    assert len(api.requests) == 4
+
+
+def test_paged_server_is_read_to_the_end(fake_api):
+    api = fake_api(paged)
+    for ids in (sync_ids(api.url, 50), async_ids(api.url, 50)):
+        assert ids == [d['id'] for d in DEPLOYMENTS]
+    assert len(api.requests) == 6
+
+
+def test_stopping_early_fetches_one_page(fake_api):
+    api = fake_api(paged)
+    client = ReleaseAPIClient(api_token='token', base_url=api.url)
+    first = next(iter(client.iter_deployments('app', 'env', page_size=10)))
+    assert first['id'] == 'd120'
+    assert len(api.requests) == 1
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from resilience import AIMDLimiter, CircuitBreaker, CircuitOpenError, ResilientSession
+
+
+def replies(*statuses):
+    """Answer requests with statuses in turn, repeating the last one"""
+    remaining = list(statuses)
+
+    def respond(method, path, query, headers):
+        status = remaining.pop(0) if len(remaining) > 1 else remaining[0]
+        return status, {'status': status}
+    return respond
+
+
+def session(**kwargs):
+    return ResilientSession(backoff_max=0.01, **kwargs)
+
+
+def test_idempotent_calls_retry_transient_errors(fake_api):
+    api = fake_api(replies(503, 502, 200))
+
+    response = session().get(f'{api.url}/applications')
+
+    assert response.status_code == 200
+    assert len(api.requests) == 3
+
+
+def test_retries_stop_after_max_attempts_and_return_the_last_response(fake_api):
+    api = fake_api(replies(500))
+
+    response = session(max_attempts=3).get(f'{api.url}/applications')
+
+    assert response.status_code == 500
+    assert len(api.requests) == 3
+
+
+def test_post_is_only_retried_when_the_server_rejected_it(fake_api):
+    api = fake_api(replies(500))
+    assert session().post(f'{api.url}/deploy').status_code == 500
+    assert len(api.requests) == 1
+
+    api = fake_api(replies(503, 201))
+    assert session().post(f'{api.url}/deploy').status_code == 201
+    assert len(api.requests) == 2
+
+
+def test_client_errors_are_not_retried(fake_api):
+    api = fake_api(replies(404))
+
+    assert session().get(f'{api.url}/missing').status_code == 404
+    assert len(api.requests) == 1
+
+
+def test_open_circuit_fails_fast(fake_api):
+    api = fake_api(replies(500))
+    client = session(max_attempts=1, failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        client.get(f'{api.url}/applications')
+
+    with pytest.raises(CircuitOpenError):
+        client.get(f'{api.url}/applications')
+    assert len(api.requests) == 2
+
+
+def test_circuit_half_opens_after_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    time.sleep(0.06)
+    breaker.before_call('trial')
+    # Only one trial call is let through while half-open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call('second')
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call('trial')
+
+    breaker.record_failure()
+
+    assert breaker.state == 'open'
+
+
+def test_aimd_limit_grows_additively_and_halves_on_failure():
+    limiter = AIMDLimiter(initial=4, maximum=8, latency_target=1.0, cooldown=0)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(0.01, ok=True)
+    grown = limiter.limit
+    assert 4.9 < grown < 5.0
+
+    limiter.acquire()
+    limiter.release(0.01, ok=False)
+    assert limiter.limit == pytest.approx(grown / 2)
+
+
+def test_aimd_slow_calls_shrink_the_limit_once_per_cooldown():
+    limiter = AIMDLimiter(initial=8, latency_target=0.5, cooldown=60)
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(1.0, ok=True)
+
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_aimd_limit_stays_within_bounds():
+    limiter = AIMDLimiter(initial=2, minimum=1, maximum=2, cooldown=0)
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(0.0, ok=False)
+    assert limiter.limit == 1
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release(0.0, ok=True)
+    assert limiter.limit == 2
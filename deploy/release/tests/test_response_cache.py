@@ -0,0 +1,111 @@
+import os
+import stat
+
+from client import ReleaseAPIClient
+from response_cache import ResponseCache, cache_key
+
+
+class EnvironmentsAPI:
+    """Environments of one application with ETags; POST adds an environment"""
+
+    def __init__(self):
+        self.environments = [{'id': 'env-1'}]
+
+    def __call__(self, method, path, query, headers):
+        if method == 'POST':
+            self.environments.append({'id': f'env-{len(self.environments) + 1}'})
+            return 201, self.environments[-1]
+        if path == '/applications/app':
+            return 200, {'id': 'app'}, {'ETag': '"app"'}
+        etag = f'"{len(self.environments)}"'
+        if headers.get('If-None-Match') == etag:
+            return 304, None, {'ETag': etag}
+        return 200, list(self.environments), {'ETag': etag}
+
+
+def client_for(fake_api, cache):
+    api = fake_api(EnvironmentsAPI())
+    return api, ReleaseAPIClient(api_token='token', base_url=api.url, cache=cache)
+
+
+def test_fresh_entries_are_served_without_a_request(fake_api):
+    api, client = client_for(fake_api, ResponseCache(ttl=60))
+
+    first = client.get_environments('app')
+    second = client.get_environments('app')
+
+    assert first == second == [{'id': 'env-1'}]
+    assert len(api.requests) == 1
+    assert client.cache.stats()['hits'] == 1
+
+
+def test_stale_entries_are_revalidated_with_etags(fake_api):
+    api, client = client_for(fake_api, ResponseCache(ttl=0))
+
+    client.get_environments('app')
+    assert client.get_environments('app') == [{'id': 'env-1'}]
+
+    assert len(api.requests) == 2
+    assert client.cache.stats()['revalidations'] == 1
+
+
+def test_writes_invalidate_the_resource_and_its_parent(fake_api):
+    api, client = client_for(fake_api, ResponseCache(ttl=60))
+    client.get_application('app')
+    client.get_environments('app')
+
+    client.create_environment('app', 'staging')
+
+    assert client.get_environments('app') == [{'id': 'env-1'}, {'id': 'env-2'}]
+    assert client.cache.stats()['invalidations'] == 2
+
+
+def test_entry_evicted_before_a_304_is_fetched_again(fake_api):
+    api, client = client_for(fake_api, ResponseCache(ttl=0))
+    client.get_environments('app')
+    lookup = client.cache.lookup
+
+    def lookup_then_evict(key):
+        result = lookup(key)
+        client.cache.clear()
+        return result
+    client.cache.lookup = lookup_then_evict
+
+    assert client.get_environments('app') == [{'id': 'env-1'}]
+    # The 304 is followed by an unconditional request
+    assert len(api.requests) == 3
+
+
+def test_returned_bodies_do_not_alias_the_cache(fake_api):
+    api, client = client_for(fake_api, ResponseCache(ttl=60))
+
+    client.get_environments('app').append({'id': 'bogus'})
+
+    assert client.get_environments('app') == [{'id': 'env-1'}]
+
+
+def test_lru_eviction_and_no_store():
+    cache = ResponseCache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.store(key, {'key': key}, {})
+    cache.store('d', {'key': 'd'}, {'Cache-Control': 'no-store'})
+
+    assert cache.lookup('a') == (None, {})
+    assert cache.lookup('c')[0] == {'key': 'c'}
+    assert cache.lookup('d') == (None, {})
+    assert len(cache) == 2
+
+
+def test_cache_key_ignores_parameter_order():
+    assert cache_key('http://api/x', {'b': 2, 'a': 1}) == cache_key('http://api/x', {'a': 1, 'b': 2})
+
+
+def test_persisted_cache_is_private_and_bound_to_its_owner(tmp_path):
+    path = str(tmp_path / 'cache' / 'release-api.json')
+    cache = ResponseCache(path=path, owner='token-a')
+    cache.store('http://api/applications', [{'id': 'app'}], {'ETag': '"1"'})
+    cache.save()
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert ResponseCache(path=path, owner='token-a').lookup('http://api/applications')[0] == [{'id': 'app'}]
+    assert len(ResponseCache(path=path, owner='token-b')) == 0